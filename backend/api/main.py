@@ -8,7 +8,9 @@ from fastapi.staticfiles import StaticFiles
 import os
 from pathlib import Path
 
-from api.routes import upload, process, knowledge, simplify, translate
+from api.routes import upload, process, knowledge, simplify, translate, trends
+from services.blob_store import blob_store_dir
+from services.registry import preload_from_env, registry
 
 app = FastAPI(
     title="MediExplain AI",
@@ -28,11 +30,15 @@ app.add_middleware(
 )
 
 # Create uploads directory
-uploads_dir = Path("uploads")
+uploads_dir = Path(os.environ.get("UPLOADS_DIR", "uploads"))
 uploads_dir.mkdir(exist_ok=True)
 
+# The blob index names every stored file; serving it would expose all uploads
+if blob_store_dir().resolve().is_relative_to(uploads_dir.resolve()):
+    raise RuntimeError("BLOB_STORE_DIR must not be inside UPLOADS_DIR, which is served at /uploads")
+
 # Mount static files
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
 
 # Include routers
 app.include_router(upload.router, prefix="/upload", tags=["Upload"])
@@ -40,6 +46,18 @@ app.include_router(process.router, prefix="/process", tags=["Process"])
 app.include_router(knowledge.router, prefix="/knowledge", tags=["Knowledge"])
 app.include_router(simplify.router, prefix="/simplify", tags=["Simplify"])
 app.include_router(translate.router, prefix="/translate", tags=["Translate"])
+app.include_router(trends.router, prefix="/trends", tags=["Trends"])
+
+
+@app.on_event("startup")
+async def warm_services():
+    # No-op unless SERVICES_PRELOAD is set; services are created on first use
+    preload_from_env()
+
+
+@app.on_event("shutdown")
+async def close_services():
+    registry.close()
 
 
 @app.get("/")
@@ -54,3 +72,9 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "MediExplain AI"}
+
+
+@app.get("/health/services")
+async def services_health():
+    """Which services have been initialized in this worker, and how long each took"""
+    return registry.stats()
@@ -3,7 +3,7 @@ Pydantic Models for MediExplain AI API
 """
 
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 
@@ -12,6 +12,8 @@ class ReportUploadResponse(BaseModel):
     file_path: str
     file_name: str
     file_size: int
+    content_hash: str  # SHA-256 of the file bytes
+    deduplicated: bool = False  # same bytes were already stored
     message: str
 
 
@@ -24,6 +26,11 @@ class AbnormalValue(BaseModel):
     normal_range: str
 
 
+class OCRPageInfo(BaseModel):
+    page: int
+    source: str  # text_layer, ocr, ocr_failed, ocr_unavailable
+
+
 class ProcessReportResponse(BaseModel):
     report_id: str
     status: str
@@ -34,6 +41,25 @@ class ProcessReportResponse(BaseModel):
     questions_to_ask_doctor: List[str]
     extracted_text: Optional[str] = None
     language: str = "en"
+    ocr_pages: List[OCRPageInfo] = []
+
+
+class JobHandle(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    events_url: str
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str  # queued, running, completed, failed
+    stage: Optional[str] = None  # ocr, entities, risk, simplify, translate, done
+    progress: Dict[str, Any] = {}
+    result: Optional[ProcessReportResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
 
 
 class SimplifyTextRequest(BaseModel):
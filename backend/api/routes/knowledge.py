@@ -4,13 +4,13 @@ Knowledge Route - Lab tests and medication information
 
 from fastapi import APIRouter, HTTPException
 import json
-from pathlib import Path
 
 from api.models.schemas import LabTestInfo, MedicationInfo
+from services.lexicon_compiler import knowledge_base_dir
 
 router = APIRouter()
 
-KB_DIR = Path("knowledge_base")
+KB_DIR = knowledge_base_dir()
 
 
 def load_json(filename: str) -> dict:
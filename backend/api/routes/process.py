@@ -4,22 +4,39 @@ FIXED: Returns actual OCR content, never fake data.
 Shows clear error if OCR fails or no lab values found.
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+import asyncio
+import copy
+import json
+import os
+import threading
+from datetime import date
+
+from fastapi import APIRouter, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
-from api.models.schemas import ProcessReportResponse, AbnormalValue
-from services.ocr_service import OCRService
-from services.ner_service import NERService
-from services.simplification_service import SimplificationService
-from services.risk_assessment import RiskAssessmentService
+from api.models.schemas import (
+    ProcessReportResponse, AbnormalValue, OCRPageInfo, JobHandle, JobStatus,
+)
+from api.routes.upload import find_report_file, save_upload
+from services.batch_pipeline import BatchPipeline, Stage, parse_stage_workers
+from services.job_queue import FINISHED_STATES, JobFailed, job_handler
+from services.ocr_service import is_degraded
+from services.pipeline_executor import ExecutorBusy
+from services.registry import registry
+from services.report_store import parse_report_date
 
 router = APIRouter()
 
-ocr_service = OCRService()
-ner_service = NERService()
-simplification_service = SimplificationService()
-risk_service = RiskAssessmentService()
+BATCH_MAX_REPORTS = int(os.environ.get("BATCH_MAX_REPORTS", "500"))
+BATCH_STAGE_WORKERS = parse_stage_workers(os.environ.get("BATCH_STAGE_WORKERS", "ocr=2,ner=1,risk=1,simplify=1,translate=1"))
+_batch_slots = threading.BoundedSemaphore(int(os.environ.get("BATCH_MAX_CONCURRENT", "1")))
+
+# Part of every analysis cache key; bump when analysis output changes so
+# stored results from older code are not served
+ANALYSIS_CACHE_VERSION = 4
 
 
 @router.post("/report/{report_id}", response_model=ProcessReportResponse)
@@ -28,40 +45,311 @@ async def process_report(
     file_path: str = Query(...),
     patient_age: Optional[int] = Query(None),
     patient_gender: str = Query("male"),
-    language: str = Query("en")
+    language: str = Query("en"),
+    user_id: Optional[str] = Query(None),
+    mode: str = Query("sync", pattern="^(sync|job)$"),
+    request: Request = None,
 ):
-    """Process and analyze a medical report"""
+    """
+    Process and analyze a medical report.
+    mode=job returns 202 with a job handle right away; follow progress at
+    GET /process/jobs/{job_id} or its /events stream. The result is stored
+    (under user_id, if given) and can be fetched again with GET
+    /process/report/{report_id}.
+    """
 
     if not Path(file_path).exists():
         raise HTTPException(status_code=404, detail="Report file not found")
 
-    # ── Step 1: OCR ───────────────────────────────────────────
+    params = {
+        "report_id": report_id,
+        "file_path": file_path,
+        "patient_age": patient_age,
+        "patient_gender": patient_gender,
+        "language": language,
+        "user_id": user_id,
+    }
+    try:
+        if mode == "job":
+            job = registry.jobs.submit("process_report", params)
+            handle = JobHandle(
+                job_id=job["job_id"],
+                status=job["status"],
+                status_url=request.url_for("job_status", job_id=job["job_id"]).path,
+                events_url=request.url_for("job_events", job_id=job["job_id"]).path,
+            )
+            return JSONResponse(status_code=202, content=handle.model_dump())
+
+        # The same bytes and patient context were analyzed before
+        cached = await asyncio.to_thread(_cached_analysis, params)
+        if cached is not None:
+            return cached
+
+        # OCR and analysis block for seconds; keep them off the event loop
+        return await registry.pipeline.run(_analyze_report, **params)
+    except ExecutorBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+@job_handler("process_report")
+def _process_report_job(params: Dict[str, Any], progress: Callable[..., None]) -> Dict[str, Any]:
     try:
-        extracted_text = ocr_service.extract_text(file_path)
+        cached = _cached_analysis(params)
+        if cached is not None:
+            return cached.model_dump()
+        # Jobs have their own threads but share the pipeline's analysis slots
+        return registry.pipeline.call(_analyze_report, **params, progress=progress).model_dump()
+    except HTTPException as e:
+        raise JobFailed(e.detail)
+
+
+@router.get("/report/{report_id}", response_model=ProcessReportResponse)
+def get_report(report_id: str):
+    """A previously processed report, from the report store (nothing is re-run)"""
+    response = registry.reports.get(report_id)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Report not processed yet")
+    return response
+
+
+@router.get("/reports")
+def list_reports(
+    user_id: Optional[str] = Query(None),
+    test: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Stored reports with their lab values, newest report date first"""
+    return {"reports": registry.reports.list_reports(user_id, test, date_from, date_to, limit)}
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+def job_status(job_id: str):
+    """Status, per-stage progress and (once completed) the result of a job"""
+    job = registry.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events: a progress event per change, then one done event"""
+    if await asyncio.to_thread(registry.jobs.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        _job_event_stream(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _job_event_stream(job_id: str, poll_interval: float = 0.5):
+    last_update = None
+    while True:
+        job = await asyncio.to_thread(registry.jobs.get, job_id)
+        if job is None:
+            return
+        if job["updated_at"] != last_update:
+            last_update = job["updated_at"]
+            event = "done" if job["status"] in FINISHED_STATES else "progress"
+            yield f"event: {event}\ndata: {JobStatus(**job).model_dump_json()}\n\n"
+            if event == "done":
+                return
+        await asyncio.sleep(poll_interval)
+
+
+def _analyze_report(
+    report_id: str,
+    file_path: str,
+    patient_age: Optional[int],
+    patient_gender: str,
+    language: str,
+    user_id: Optional[str] = None,
+    progress: Optional[Callable[..., None]] = None,
+) -> ProcessReportResponse:
+    """
+    The blocking OCR -> NER -> risk -> simplify -> translate run (in a
+    pipeline or job worker). progress(stage, **data) is called as each stage
+    advances.
+    """
+    params = {
+        "report_id": report_id,
+        "file_path": file_path,
+        "patient_age": patient_age,
+        "patient_gender": patient_gender,
+        "language": language,
+        "user_id": user_id,
+    }
+    content_hash = registry.uploads.content_hash(report_id, file_path)
+    cached = _cached_analysis(params, content_hash)
+    if cached is not None:
+        return cached
+
+    run = {**params, "content_hash": content_hash}
+    report = progress or (lambda stage, **data: None)
+    for _, stage in ANALYSIS_STAGES:
+        stage(run, report)
+    return _finish_analysis(run)
+
+
+def _finish_analysis(run: Dict[str, Any]) -> ProcessReportResponse:
+    """Build the response for a completed run and keep it (analysis cache and report store)"""
+    response = _build_response(run)
+    analysis = {
+        "response": response.model_dump(),
+        "lab_values": _lab_records(run),
+        "report_date": run["entities"].get("patient_info", {}).get("report_date"),
+    }
+    if not run.get("degraded"):
+        registry.uploads.put_analysis(run["content_hash"], _analysis_context(run), analysis)
+    _save_report(run, run["content_hash"], analysis)
+    return response
+
+
+def _analysis_context(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "patient_age": params["patient_age"],
+        "patient_gender": params["patient_gender"],
+        "language": params["language"],
+        "version": ANALYSIS_CACHE_VERSION,
+        "lexicon": registry.ner.lexicon_version,
+    }
+
+
+def _cached_analysis(params: Dict[str, Any], content_hash: Optional[str] = None) -> Optional[ProcessReportResponse]:
+    """Stored result for the same file bytes and patient context (saved under this report), if any"""
+    content_hash = content_hash or registry.uploads.content_hash(params["report_id"], params["file_path"])
+    analysis = registry.uploads.get_analysis(content_hash, _analysis_context(params))
+    if analysis is None:
+        return None
+    print(f"[Process] Reusing stored analysis of {content_hash[:12]} for report {params['report_id']}")
+    analysis["response"]["report_id"] = params["report_id"]
+    _save_report(params, content_hash, analysis)
+    return ProcessReportResponse(**analysis["response"])
+
+
+def _lab_records(run: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Lab values with their in/out of range status, for the report store"""
+    abnormal = {
+        item["test"]: item["status"]
+        for item in (run["risk_result"] or {}).get("abnormal_values", [])
+    }
+    return [
+        {**lab, "status": abnormal.get(lab["test"], "normal")}
+        for lab in run["entities"].get("lab_values", [])
+    ]
+
+
+def _save_report(params: Dict[str, Any], content_hash: str, analysis: Dict[str, Any]) -> None:
+    registry.reports.save(
+        params["report_id"],
+        analysis["response"],
+        analysis["lab_values"],
+        user_id=params.get("user_id"),
+        report_date=parse_report_date(analysis["report_date"]),
+        content_hash=content_hash,
+    )
+
+
+# Each stage reads and extends the run dict; the batch endpoint runs them
+# as separate pipelined stages, single reports run them back to back.
+
+def _ocr_stage(run: Dict[str, Any], report: Callable[..., None]) -> None:
+    # NER and risk flags run on each page as soon as OCR finishes it, while the
+    # remaining pages are still being read; _entities_stage picks up the result
+    stream = registry.ner.entity_stream()
+    progress: Dict[str, Any] = {}
+    partial: Dict[str, List[Any]] = {"lab_values": [], "medications": [], "diagnoses": [], "abnormal_values": []}
+
+    def update(**data: Any) -> None:
+        progress.update(data)
+        report("ocr", **progress)
+
+    def on_page_text(page: Dict[str, Any]) -> None:
+        found = stream.feed(page["text"])
+        if not any(found.values()):
+            return
+        for field, values in found.items():
+            partial[field].extend(values)
+        if found["lab_values"]:
+            flags = registry.risk.assess(
+                {"lab_values": found["lab_values"]},
+                patient_gender=run["patient_gender"],
+                patient_age=run["patient_age"],
+            )
+            partial["abnormal_values"].extend(flags["abnormal_values"])
+        update(partial=partial)
+
+    try:
+        run["document"] = registry.ocr.extract_document(
+            run["file_path"],
+            on_page=lambda done, total: update(pages_done=done, pages_total=total),
+            on_page_text=on_page_text,
+        )
     except RuntimeError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    run["entity_stream"] = stream
+    # Pages OCR could not read: keep this run's results out of every cache
+    run["degraded"] = is_degraded(run["document"])
+
+
+def _entities_stage(run: Dict[str, Any], report: Callable[..., None]) -> None:
+    stream = run.pop("entity_stream", None)
+    text = run["document"]["text"]
+    if stream is not None and stream.lexicon_version == registry.ner.lexicon_version and stream.text == text:
+        entities = stream.finish()
+    else:
+        entities = registry.ner.extract_entities(text)
+    run["entities"] = entities
+    report(
+        "entities",
+        lab_values=len(entities.get("lab_values", [])),
+        medications=len(entities.get("medications", [])),
+        diagnoses=len(entities.get("diagnoses", [])),
+    )
+
+
+def _risk_stage(run: Dict[str, Any], report: Callable[..., None]) -> None:
+    # Only lab reports with numerical values get a risk assessment
+    if not run["entities"].get("lab_values"):
+        run["risk_result"] = None
+        return
+    risk_result = registry.risk.assess(
+        run["entities"],
+        patient_gender=run["patient_gender"],
+        patient_age=run["patient_age"]
+    )
+    run["risk_result"] = risk_result
+    report(
+        "risk",
+        risk_level=risk_result.get("risk_level", "LOW"),
+        abnormal_values=len(risk_result.get("abnormal_values", [])),
+    )
+
 
-    # ── Step 2: Extract medical entities ─────────────────────
-    entities = ner_service.extract_entities(extracted_text)
-    lab_values = entities.get("lab_values", [])
+def _simplify_stage(run: Dict[str, Any], report: Callable[..., None]) -> None:
+    extracted_text = run["document"]["text"]
+    ocr_pages = [OCRPageInfo(page=p["page"], source=p["source"]) for p in run["document"]["pages"]]
+    risk_result = run["risk_result"]
 
-    # ── Step 3: Build response depending on report type ──────
     # Case A: Lab report with numerical values
-    if lab_values:
-        risk_result = risk_service.assess(
-            entities,
-            patient_gender=patient_gender,
-            patient_age=patient_age
-        )
-        explanation = simplification_service.simplify(
+    if risk_result is not None:
+        explanation = registry.simplification.simplify(
             extracted_text=extracted_text,
-            entities=entities,
+            entities=run["entities"],
             risk_result=risk_result,
-            patient_age=patient_age,
-            patient_gender=patient_gender
+            patient_age=run["patient_age"],
+            patient_gender=run["patient_gender"]
         )
+        risk_level = risk_result.get("risk_level", "LOW")
         abnormal_values = [
             AbnormalValue(
                 test=item["test"],
@@ -73,32 +361,201 @@ async def process_report(
             )
             for item in risk_result.get("abnormal_values", [])
         ]
-        return ProcessReportResponse(
-            report_id=report_id,
-            status="completed",
-            risk_level=risk_result.get("risk_level", "LOW"),
-            simplified_explanation=explanation["explanation"],
-            abnormal_values=abnormal_values,
-            recommendations=explanation["recommendations"],
-            questions_to_ask_doctor=explanation["questions"],
-            extracted_text=extracted_text[:1000] + "..." if len(extracted_text) > 1000 else extracted_text,
-            language=language
-        )
 
     # Case B: Clinical/narrative report (no lab numbers found)
     else:
-        explanation = _summarize_clinical_report(extracted_text, entities)
-        return ProcessReportResponse(
-            report_id=report_id,
-            status="completed",
-            risk_level="INFO",
-            simplified_explanation=explanation["explanation"],
-            abnormal_values=[],
-            recommendations=explanation["recommendations"],
-            questions_to_ask_doctor=explanation["questions"],
-            extracted_text=extracted_text[:1000] + "..." if len(extracted_text) > 1000 else extracted_text,
-            language=language
+        explanation = _summarize_clinical_report(extracted_text, run["entities"])
+        risk_level = "INFO"
+        abnormal_values = []
+
+    report("simplify", recommendations=len(explanation["recommendations"]))
+    # English, language-independent output; translation happens in the next stage
+    run["result"] = {
+        "risk_level": risk_level,
+        "simplified_explanation": explanation["explanation"],
+        "abnormal_values": [item.model_dump() for item in abnormal_values],
+        "recommendations": explanation["recommendations"],
+        "questions_to_ask_doctor": explanation["questions"],
+        "extracted_text": extracted_text[:1000] + "..." if len(extracted_text) > 1000 else extracted_text,
+        "ocr_pages": [page.model_dump() for page in ocr_pages],
+    }
+
+
+def _translate_stage(run: Dict[str, Any], report: Callable[..., None]) -> None:
+    run["translated"] = registry.translation.translate_report_output(
+        copy.deepcopy(run["result"]), run["language"]
+    )
+    report("translate", language=run["language"])
+
+
+def _build_response(run: Dict[str, Any]) -> ProcessReportResponse:
+    return ProcessReportResponse(
+        report_id=run["report_id"],
+        status="completed",
+        language=run["language"],
+        **run["translated"],
+    )
+
+
+def _memoized(
+    name: str,
+    stage: Callable[[Dict[str, Any], Callable[..., None]], None],
+    inputs: Tuple[str, ...],
+    outputs: Tuple[str, ...],
+    version: Optional[Callable[[], str]] = None,
+) -> Callable[[Dict[str, Any], Callable[..., None]], None]:
+    """
+    Reuse a stage's outputs when its inputs are unchanged. The key chains the
+    previous stage's key with the run fields this stage reads, so any change
+    upstream also invalidates every later stage. version() covers state the
+    stage reads outside the run, such as the NER lexicon. Runs whose OCR was
+    degraded neither read nor fill the cache.
+    """
+    def run_stage(run: Dict[str, Any], report: Callable[..., None]) -> None:
+        if run.get("degraded"):
+            stage(run, report)
+            return
+        cache = registry.stage_cache
+        stage_inputs = {field: run[field] for field in inputs}
+        if version is not None:
+            stage_inputs["version"] = version()
+        key = cache.key(run.get("stage_key"), stage_inputs)
+        cached = cache.get(name, key)
+        if cached is not None:
+            run.update(cached)
+        else:
+            stage(run, report)
+            if not run.get("degraded"):
+                cache.put(name, key, {field: run[field] for field in outputs})
+        run["stage_key"] = key
+    return run_stage
+
+
+def _in_pipeline_slot(stage: Callable[[Dict[str, Any], Callable[..., None]], None]):
+    """Run a stage in one of the pipeline's analysis slots (batch threads are not pipeline workers)"""
+    def run_stage(run: Dict[str, Any], report: Callable[..., None]) -> None:
+        registry.pipeline.call(stage, run, report)
+    return run_stage
+
+
+ANALYSIS_STAGES = [
+    ("ocr", _memoized("ocr", _ocr_stage, ("content_hash",), ("document",))),
+    ("ner", _memoized("ner", _entities_stage, (), ("entities",), version=lambda: registry.ner.lexicon_version)),
+    ("risk", _memoized("risk", _risk_stage, ("patient_gender", "patient_age"), ("risk_result",))),
+    ("simplify", _memoized("simplify", _simplify_stage, ("patient_gender", "patient_age"), ("result",))),
+    ("translate", _memoized("translate", _translate_stage, ("language",), ("translated",))),
+]
+
+# Batch stages have their own threads; OCR still counts against PIPELINE_WORKERS
+BATCH_STAGES = [
+    ("ocr", _memoized("ocr", _in_pipeline_slot(_ocr_stage), ("content_hash",), ("document",))),
+    *ANALYSIS_STAGES[1:],
+]
+
+
+@router.post("/batch")
+async def process_batch(
+    files: List[UploadFile] = File(default=[]),
+    report_ids: List[str] = Form(default=[]),
+    patient_age: Optional[int] = Form(None),
+    patient_gender: str = Form("male"),
+    language: str = Form("en"),
+    user_id: Optional[str] = Form(None),
+):
+    """
+    Analyze many reports at once: uploaded files and/or IDs of reports
+    already uploaded via /upload/report (repeat the field or comma-separate).
+    Streams NDJSON, one line per report as it finishes (in completion order,
+    with its index in the request), then a final stats line.
+    """
+    patient = {"patient_age": patient_age, "patient_gender": patient_gender, "language": language, "user_id": user_id}
+    items = []
+    for report_id in (r.strip() for value in report_ids for r in value.split(",")):
+        if not report_id:
+            continue
+        path = find_report_file(report_id)
+        item = {"index": len(items), "report_id": report_id, "file_path": str(path) if path else None, **patient}
+        if path is None:
+            item["error"] = "Report not found"
+        else:
+            item["content_hash"] = await asyncio.to_thread(registry.uploads.content_hash, report_id, path)
+        items.append(item)
+    for file in files:
+        item = {"index": len(items), "report_id": None, "file_name": file.filename, **patient}
+        try:
+            upload = await save_upload(file)
+            item.update(report_id=upload.report_id, file_path=upload.file_path, content_hash=upload.content_hash)
+        except HTTPException as e:
+            item["error"] = e.detail
+        items.append(item)
+
+    if not items:
+        raise HTTPException(status_code=400, detail="No files or report_ids given")
+    if len(items) > BATCH_MAX_REPORTS:
+        raise HTTPException(status_code=413, detail=f"Too many reports; max {BATCH_MAX_REPORTS} per batch")
+    if not _batch_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Another batch is running",
+            headers={"Retry-After": "30"},
         )
+    # The background task runs once the stream ends, even if the client left
+    return StreamingResponse(
+        _batch_stream(items),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(_batch_slots.release),
+    )
+
+
+def _batch_stream(items: List[Dict[str, Any]]) -> Iterator[str]:
+    pipeline = BatchPipeline([
+        Stage(name, _batch_stage(stage), BATCH_STAGE_WORKERS.get(name, 1))
+        for name, stage in BATCH_STAGES
+    ])
+    for item in pipeline.run(items):
+        line = {"type": "report", "index": item["index"], "report_id": item["report_id"]}
+        if item.get("file_name"):
+            line["file_name"] = item["file_name"]
+        if "error" in item:
+            line.update(status="failed", error=item["error"], failed_stage=item.get("failed_stage"))
+        else:
+            line.update(status="completed", result=_finish_analysis(item).model_dump())
+        yield json.dumps(line) + "\n"
+    yield json.dumps({"type": "stats", **pipeline.stats()}) + "\n"
+
+
+def _batch_stage(stage: Callable[..., None]) -> Callable[[Dict[str, Any]], None]:
+    def run_stage(item: Dict[str, Any]) -> None:
+        try:
+            stage(item, lambda stage_name, **data: None)
+        except HTTPException as e:
+            raise RuntimeError(e.detail)
+    return run_stage
+
+
+@router.get("/queue")
+async def pipeline_queue_stats():
+    """Analysis queue depth, wait times and rejections"""
+    return registry.pipeline.stats()
+
+
+@router.get("/stages/cache")
+async def stage_cache_stats():
+    """Per-stage memoization hit rates (OCR, NER, risk, simplify, translate)"""
+    return registry.stage_cache.stats()
+
+
+@router.get("/ocr/cache")
+async def ocr_cache_stats():
+    """OCR cache hit/miss/eviction counters"""
+    return registry.ocr.cache_stats()
+
+
+@router.get("/ocr/engine")
+def ocr_engine_health():
+    """OCR engine health (persistent worker liveness and restarts)"""
+    # Plain def: pinging pool workers blocks, so FastAPI runs this in a thread
+    return registry.ocr.engine_health()
 
 
 def _summarize_clinical_report(extracted_text: str, entities: dict) -> dict:
@@ -4,17 +4,16 @@ Translate Route - Multilingual support for medical explanations
 
 from fastapi import APIRouter
 from api.models.schemas import TranslateRequest, TranslateResponse
-from services.translation_service import TranslationService
+from services.registry import registry
 
 router = APIRouter()
-translation_service = TranslationService()
 
 
 @router.post("/", response_model=TranslateResponse)
 async def translate_text(request: TranslateRequest):
     """Translate medical explanation to another language"""
 
-    translated = translation_service.translate(
+    translated = registry.translation.translate(
         text=request.text,
         target_language=request.target_language,
         source_language=request.source_language
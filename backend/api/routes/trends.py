@@ -0,0 +1,26 @@
+"""
+Trends Route - Longitudinal lab value trends per user
+Answers dashboard queries from the incremental aggregates kept by the
+report store; history is never rescanned on read.
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+
+from services.registry import registry
+
+router = APIRouter()
+
+
+@router.get("/")
+def user_trends(user_id: str = Query(...)):
+    """Last value, rolling mean, min/max, slope and time out of range for every test of a user"""
+    return {"user_id": user_id, "trends": registry.reports.trends(user_id)}
+
+
+@router.get("/{test}")
+def test_trend(test: str, user_id: str = Query(...)):
+    """Trend for one test (normalized name, e.g. Hemoglobin, FBS, HbA1c)"""
+    trends = registry.reports.trends(user_id, test)
+    if not trends:
+        raise HTTPException(status_code=404, detail=f"No {test} values for this user")
+    return trends[0]
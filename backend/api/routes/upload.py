@@ -1,56 +1,204 @@
 """
 Upload Route - Handles medical report file uploads
+The multipart body is parsed as it arrives and the file part is streamed to
+disk (see services.upload_storage), so uploads never sit in memory whole and
+oversized files are rejected without reading the rest of the request.
+Stored files are deduplicated by content hash (see services.blob_store).
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, HTTPException, Request
 from pathlib import Path
+from typing import Optional
 import uuid
-import shutil
-from datetime import datetime
+
+from multipart.multipart import MultipartParser, parse_options_header
 
 from api.models.schemas import ReportUploadResponse
+from services.registry import registry
+from services.upload_storage import CHUNK_SIZE, HashingWriter, UploadTooLarge
 
 router = APIRouter()
 
 ALLOWED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Room for multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Where uploads were stored (one file per upload) before the blob store
+LEGACY_UPLOADS_DIR = Path("uploads")
+
+_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+@router.post("/report", response_model=ReportUploadResponse, openapi_extra=_UPLOAD_OPENAPI)
+async def upload_report(request: Request):
+    """Upload a medical report (PDF, JPG, PNG) as multipart field "file" """
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+        raise _too_large()
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    upload = _MultipartFileReceiver(boundary)
+    try:
+        async for chunk in request.stream():
+            upload.feed(chunk)
+        upload.finish()
+    except UploadTooLarge:
+        upload.abort()
+        raise _too_large()
+    except HTTPException:
+        upload.abort()
+        raise
+    except Exception as e:
+        upload.abort()
+        raise HTTPException(status_code=400, detail=f"Malformed upload: {e}")
+
+    if upload.writer is None:
+        raise HTTPException(status_code=400, detail='No file uploaded in field "file"')
+    return _store(upload.writer, upload.filename)
+
+
+async def save_upload(file: UploadFile) -> ReportUploadResponse:
+    """Validate and store an already-parsed upload (e.g. from /process/batch)"""
+    _validate_extension(file.filename)
+    writer = registry.uploads.writer(MAX_FILE_SIZE)
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            writer.write(chunk)
+    except UploadTooLarge:
+        writer.abort()
+        raise _too_large()
+    except Exception:
+        writer.abort()
+        raise
+    return _store(writer, file.filename)
+
+
+@router.delete("/report/{report_id}")
+def delete_report(report_id: str):
+    """Release an upload; the stored file is removed once no upload references it"""
+    blob_deleted = registry.uploads.release(report_id)
+    if blob_deleted is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return {"report_id": report_id, "deleted": True, "file_deleted": blob_deleted}
+
+
+@router.get("/stats")
+def upload_stats():
+    """Blob count, references, bytes saved by deduplication and analysis cache hits"""
+    return registry.uploads.stats()
+
+
+def find_report_file(report_id: str) -> Optional[Path]:
+    """Stored file for a report id returned by /upload/report, if it exists"""
+    try:
+        report_id = str(uuid.UUID(report_id))
+    except ValueError:
+        return None
+    report = registry.uploads.get(report_id)
+    if report is not None:
+        return Path(report["file_path"])
+    matches = sorted(LEGACY_UPLOADS_DIR.glob(f"*_{report_id}.*"))
+    return matches[0] if matches else None
 
-@router.post("/report", response_model=ReportUploadResponse)
-async def upload_report(file: UploadFile = File(...)):
-    """Upload a medical report (PDF, JPG, PNG)"""
 
-    # Validate file extension
-    file_ext = Path(file.filename).suffix.lower()
+def _store(writer: HashingWriter, filename: str) -> ReportUploadResponse:
+    stored = registry.uploads.add(writer, filename)
+    if stored["deduplicated"]:
+        print(f"[Upload] {filename} matches stored blob {stored['content_hash'][:12]}; not stored again")
+    return ReportUploadResponse(
+        **stored,
+        message="File uploaded successfully. Use /process/report/{report_id} to analyze."
+    )
+
+
+def _validate_extension(filename: Optional[str]) -> str:
+    file_ext = Path(filename or "").suffix.lower()
     if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
         )
+    return file_ext
 
-    # Read file
-    file_content = await file.read()
 
-    # Check file size
-    if len(file_content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File too large. Max size: 10MB")
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=400, detail="File too large. Max size: 10MB")
 
-    # Generate unique ID and save file
-    report_id = str(uuid.uuid4())
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    saved_filename = f"{timestamp}_{report_id}{file_ext}"
 
-    uploads_dir = Path("uploads")
-    uploads_dir.mkdir(exist_ok=True)
-    file_path = uploads_dir / saved_filename
+class _MultipartFileReceiver:
+    """Feeds request chunks to python-multipart and streams the "file" part to disk"""
 
-    with open(file_path, "wb") as f:
-        f.write(file_content)
+    def __init__(self, boundary: bytes):
+        self.writer: Optional[HashingWriter] = None
+        self.filename: Optional[str] = None
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file_part = False
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+        })
 
-    return ReportUploadResponse(
-        report_id=report_id,
-        file_path=str(file_path),
-        file_name=file.filename,
-        file_size=len(file_content),
-        message="File uploaded successfully. Use /process/report/{report_id} to analyze."
-    )
+    def feed(self, chunk: bytes) -> None:
+        self._parser.write(chunk)
+
+    def finish(self) -> None:
+        self._parser.finalize()
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._in_file_part = False
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name") != b"file" or self.writer is not None:
+            return  # other form fields (and repeated files) are ignored
+        self.filename = options.get(b"filename", b"").decode("utf-8", "replace")
+        _validate_extension(self.filename)
+        self.writer = registry.uploads.writer(MAX_FILE_SIZE)
+        self._in_file_part = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file_part:
+            self.writer.write(data[start:end])
@@ -0,0 +1,4 @@
+"""
+MediExplain AI - Benchmarks
+Run from the backend directory, e.g.: python -m benchmarks.pdf_backends
+"""
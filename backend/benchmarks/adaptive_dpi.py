@@ -0,0 +1,86 @@
+"""
+Adaptive DPI Benchmark - fixed 300 DPI vs two-pass adaptive OCR
+
+Usage (from backend/):
+    python -m benchmarks.adaptive_dpi [pdf ...] [--low-dpi 150] [--min-confidence 85]
+
+Every page of each PDF is OCR'd (text layers are ignored for routing) in
+both modes. Reports pages/sec, how many pages needed the high-DPI pass, and
+the similarity of the OCR text to the PDF's own text layer where it has one.
+Defaults to the sample PDFs in uploads/. Needs Tesseract.
+"""
+
+import argparse
+import difflib
+import time
+from pathlib import Path
+
+from services.ocr_cache import OCRCache
+from services.ocr_service import OCRService
+from services.pdf_backends import open_pdf
+
+UPLOADS_DIR = Path(__file__).resolve().parent.parent / "uploads"
+
+
+def _reference_text(path: str):
+    with open_pdf(path) as doc:
+        return [doc.page_text(n) for n in range(1, doc.page_count() + 1)]
+
+
+def _similarity(reference: str, text: str) -> float:
+    return difflib.SequenceMatcher(None, " ".join(reference.split()), " ".join(text.split())).ratio()
+
+
+def run_mode(ocr: OCRService, pdfs, mode: str):
+    ocr.dpi_mode = mode
+    pages, seconds, reocr, scores = 0, 0.0, 0, []
+    for path in pdfs:
+        reference = _reference_text(str(path))
+        start = time.perf_counter()
+        result = ocr._extract_from_pdf(str(path))
+        seconds += time.perf_counter() - start
+        pages += len(result)
+        reocr += sum(1 for p in result if p.get("dpi") == ocr.dpi) if mode == "adaptive" else 0
+        scores += [_similarity(ref, p["text"]) for ref, p in zip(reference, result) if ref.strip()]
+    return {
+        "pages": pages,
+        "pages_per_sec": pages / seconds if seconds else 0.0,
+        "high_dpi_pages": reocr if mode == "adaptive" else pages,
+        "similarity": sum(scores) / len(scores) if scores else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", type=Path)
+    parser.add_argument("--low-dpi", type=int, default=150)
+    parser.add_argument("--min-confidence", type=float, default=85)
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(UPLOADS_DIR.glob("*.pdf"))
+    if not pdfs:
+        print("No PDFs to benchmark")
+        return
+
+    ocr = OCRService(cache=OCRCache(cache_dir=None, memory_items=0))
+    if not ocr._tesseract_available:
+        print("Tesseract not installed - nothing to benchmark")
+        return
+    ocr.dpi = 300
+    ocr.low_dpi = args.low_dpi
+    ocr.min_confidence = args.min_confidence
+    ocr._has_usable_text_layer = lambda text: False  # force OCR on every page
+
+    try:
+        print(f"{'mode':<10}{'pages':>7}{'pages/s':>10}{'300dpi pages':>14}{'similarity':>12}")
+        for mode in ("fixed", "adaptive"):
+            stats = run_mode(ocr, pdfs, mode)
+            similarity = f"{stats['similarity']:.3f}" if stats["similarity"] is not None else "n/a"
+            print(f"{mode:<10}{stats['pages']:>7}{stats['pages_per_sec']:>10.2f}"
+                  f"{stats['high_dpi_pages']:>14}{similarity:>12}")
+    finally:
+        ocr.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Image Decode Benchmark - full decode vs reduced-resolution decode_image()
+
+Usage (from backend/):
+    python -m benchmarks.image_decode [--megapixels 12 24 48] [--repeat 3]
+
+Synthesizes phone-photo sized JPEGs of a lab sheet and reports decode time
+and decoded working-set size for both paths. When Tesseract is installed,
+the sample images in uploads/ are also OCR'd both ways and the text
+similarity is reported, to check accuracy is not affected.
+"""
+
+import argparse
+import difflib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from services.image_preprocessing import decode_image
+
+UPLOADS_DIR = Path(__file__).resolve().parent.parent / "uploads"
+
+
+def _synthesize_photo(path: str, megapixels: float) -> None:
+    from PIL import Image, ImageDraw, ImageFont
+    height = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    width = int(height * 3 / 4)
+    img = Image.new("RGB", (width, height), (236, 234, 226))
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.load_default(size=max(height // 60, 12))
+    except TypeError:
+        font = ImageFont.load_default()
+    line_height = max(height // 35, 14)
+    rows = ["Hemoglobin: 11.2 g/dL", "WBC: 6800 /cumm", "Platelet: 250000 /cumm",
+            "FBS: 132 mg/dL", "HbA1c: 6.9 %", "Creatinine: 1.1 mg/dL"]
+    for i in range(30):
+        draw.text((width // 12, height // 15 + i * line_height), rows[i % len(rows)],
+                  fill=(25, 25, 25), font=font)
+    img.save(path, quality=88)
+
+
+def _full_decode(path: str):
+    from PIL import Image
+    img = Image.open(path)
+    img.load()
+    return img
+
+
+def _bytes(img) -> int:
+    return img.size[0] * img.size[1] * len(img.getbands())
+
+
+def bench_decode(megapixels, repeat: int) -> None:
+    print(f"{'MP':>5}{'full ms':>10}{'fast ms':>10}{'full MB':>10}{'fast MB':>10}{'scale':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mp in megapixels:
+            path = os.path.join(tmp, f"photo_{mp}.jpg")
+            _synthesize_photo(path, mp)
+            decode_image(path)  # warm up (OpenCV import, libjpeg init)
+
+            full_seconds = fast_seconds = 0.0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                full = _full_decode(path)
+                full_seconds += time.perf_counter() - start
+
+                start = time.perf_counter()
+                fast, info = decode_image(path)
+                fast_seconds += time.perf_counter() - start
+
+            print(f"{mp:>5}{1000 * full_seconds / repeat:>10.1f}{1000 * fast_seconds / repeat:>10.1f}"
+                  f"{_bytes(full) / 1e6:>10.1f}{_bytes(fast) / 1e6:>10.1f}{info['draft_scale']:>7}")
+
+
+def bench_accuracy() -> None:
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception:
+        print("\nTesseract not installed - skipping OCR accuracy comparison")
+        return
+
+    images = sorted(p for p in UPLOADS_DIR.iterdir() if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+    print(f"\n{'image':<60}{'similarity':>12}")
+    for path in images:
+        full_text = pytesseract.image_to_string(_full_decode(str(path)))
+        fast_text = pytesseract.image_to_string(decode_image(str(path))[0])
+        ratio = difflib.SequenceMatcher(None, full_text, fast_text).ratio()
+        print(f"{path.name:<60}{ratio:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[12, 24, 48])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bench_decode(args.megapixels, args.repeat)
+    bench_accuracy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Lab Extraction Benchmark - per-pattern finditer loop vs single-pass extractor
+
+Usage (from backend/):
+    python -m benchmarks.lab_extraction [--tests 17 100 400] [--reports 200]
+
+For each pattern-set size, synthetic tests are added after NERService's
+knowledge-base patterns and a report text mentioning a sample of them is
+generated.
+Both extractors run over the same reports; their outputs are compared and
+the throughput of each is printed.
+"""
+
+import argparse
+import random
+import re
+import string
+import time
+
+from services.lab_extractor import LabValueExtractor
+from services.ner_service import NERService
+
+
+def _loop_extract(patterns, normalize, text):
+    """The pre-extractor implementation: one re.finditer scan per pattern"""
+    lab_values = []
+    seen_tests = set()
+    for pattern in patterns:
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            groups = match.groups()
+            test_name = groups[0].strip()
+            value_str = groups[1].replace(',', '')
+            unit = groups[2].strip() if len(groups) > 2 and groups[2] else ""
+            normalized = normalize(test_name)
+            if normalized not in seen_tests:
+                try:
+                    value = float(value_str)
+                except ValueError:
+                    continue
+                lab_values.append({"test": normalized, "raw_name": test_name, "value": value, "unit": unit})
+                seen_tests.add(normalized)
+    return lab_values
+
+
+def _synthetic_patterns(count, rng):
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(3, 8))))
+    return [rf'({name}|{name[:2]} {name[2:]})[:\s]+(\d+\.?\d*)\s*(mg/dL|U/L)?' for name in sorted(names)]
+
+
+def _report(patterns, rng, lines=40):
+    rows = []
+    for _ in range(lines):
+        pattern = rng.choice(patterns)
+        alias = pattern[1:pattern.index(")")].split("|")[0].replace("\\+?", "")
+        rows.append(f"{alias}: {rng.uniform(1, 300):.1f} mg/dL   Ref: see lab notes for details")
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tests", type=int, nargs="+", default=[17, 100, 400])
+    parser.add_argument("--reports", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    ner = NERService()
+    normalize, lab_patterns = ner._normalize_test_name, ner.lab_patterns
+    print(f"{'tests':>6}{'loop reports/s':>16}{'single-pass reports/s':>23}{'speedup':>9}")
+    for count in args.tests:
+        patterns = lab_patterns + _synthetic_patterns(max(0, count - len(lab_patterns)), rng)
+        extractor = LabValueExtractor(patterns, normalize)
+        reports = [_report(patterns, rng) for _ in range(args.reports)]
+
+        start = time.perf_counter()
+        expected = [_loop_extract(patterns, normalize, text) for text in reports]
+        loop_s = time.perf_counter() - start
+        start = time.perf_counter()
+        actual = [extractor.extract(text) for text in reports]
+        single_s = time.perf_counter() - start
+
+        assert actual == expected, "single-pass output differs from the loop"
+        print(f"{len(patterns):>6}{len(reports) / loop_s:>16.1f}{len(reports) / single_s:>23.1f}{loop_s / single_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
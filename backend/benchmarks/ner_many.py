@@ -0,0 +1,65 @@
+"""
+Corpus NER Benchmark - extract_entities one text at a time vs extract_entities_many
+
+Usage (from backend/):
+    python -m benchmarks.ner_many [--corpus DIR] [--texts 5000] [--workers 1 2 4] [--chunk 64]
+
+Texts are the *.txt files under --corpus, or generated report texts. Each
+worker count is timed over the same texts, its output compared with the
+single-text path, and the throughput printed.
+"""
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+from services.ner_service import NERService
+
+
+def _report(rng):
+    lines = [f"Patient: {rng.choice(['Mr.', 'Mrs.'])} X, Age: {rng.randint(18, 90)}"]
+    for name, low, high, unit in [
+        ("Hemoglobin", 8, 18, "g/dL"), ("FBS", 70, 250, "mg/dL"), ("SGPT", 10, 120, "U/L"),
+        ("Creatinine", 0.5, 3, "mg/dL"), ("TSH", 0.3, 8, "mIU/L"), ("Sodium", 128, 150, "mEq/L"),
+    ]:
+        if rng.random() < 0.8:
+            lines.append(f"{name}: {rng.uniform(low, high):.1f} {unit}   Ref: see reference ranges")
+    lines.append(rng.choice(["Rx Glycomet 500 BD", "On Telma 40, Ecosprin 75", "No current medication"]))
+    lines.append(rng.choice(["Impression: Type 2 diabetes", "H/o hypertension", "Fatty liver on USG"]))
+    return "\n".join(lines * rng.randint(1, 4))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", type=Path)
+    parser.add_argument("--texts", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk", type=int, default=64)
+    args = parser.parse_args()
+
+    if args.corpus:
+        texts = [p.read_text(errors="replace") for p in sorted(args.corpus.rglob("*.txt"))]
+    else:
+        rng = random.Random(11)
+        texts = [_report(rng) for _ in range(args.texts)]
+
+    ner = NERService()
+    start = time.perf_counter()
+    expected = [ner.extract_entities(text) for text in texts]
+    single_s = time.perf_counter() - start
+    print(f"{'workers':>8}{'texts/s':>12}{'speedup':>9}")
+    print(f"{'single':>8}{len(texts) / single_s:>12.1f}{1:>8.1f}x")
+    try:
+        for workers in args.workers:
+            start = time.perf_counter()
+            actual = list(ner.extract_entities_many(texts, workers=workers, chunk_size=args.chunk))
+            elapsed = time.perf_counter() - start
+            assert actual == expected, "extract_entities_many output differs from the single-text path"
+            print(f"{workers:>8}{len(texts) / elapsed:>12.1f}{single_s / elapsed:>8.1f}x")
+    finally:
+        ner.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+PDF Backend Benchmark - text extraction and render time/memory per page
+
+Usage (from backend/):
+    python -m benchmarks.pdf_backends [PDF ...] [--repeat 5] [--dpi 150]
+
+Defaults to the sample PDFs in uploads/. Each backend runs in a fresh
+subprocess so peak RSS growth is attributed to that backend alone.
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from services.pdf_backends import PDF_BACKENDS, available_backends, open_pdf
+
+UPLOADS_DIR = Path(__file__).resolve().parent.parent / "uploads"
+
+
+def _peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_backend(backend: str, pdfs, repeat: int, dpi: int) -> dict:
+    """Measure one backend in the current process"""
+    baseline_kb = _peak_rss_kb()
+    pages = 0
+    text_seconds = 0.0
+    render_seconds = 0.0
+    rendered = 0
+    render_error = None
+    chars = 0
+
+    for _ in range(repeat):
+        for pdf in pdfs:
+            start = time.perf_counter()
+            with open_pdf(str(pdf), backend, fallback=False) as doc:
+                count = doc.page_count()
+                for page_number in range(1, count + 1):
+                    chars += len(doc.page_text(page_number))
+                text_seconds += time.perf_counter() - start
+                pages += count
+
+                if dpi and doc.can_render and render_error is None:
+                    start = time.perf_counter()
+                    try:
+                        for page_number in range(1, count + 1):
+                            doc.render_page(page_number, dpi)
+                    except Exception as e:
+                        render_error = f"{type(e).__name__}: {e}"
+                        continue
+                    render_seconds += time.perf_counter() - start
+                    rendered += count
+
+    return {
+        "backend": backend,
+        "pages": pages,
+        "text_ms_per_page": round(1000 * text_seconds / pages, 3) if pages else None,
+        "render_ms_per_page": round(1000 * render_seconds / rendered, 3) if rendered else None,
+        "chars_per_page": round(chars / pages, 1) if pages else 0,
+        "peak_rss_growth_kb_per_page": round((_peak_rss_kb() - baseline_kb) / max(pages, 1), 2),
+        "render_error": render_error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pdfs", nargs="*", help="PDFs to benchmark (default: uploads/*.pdf)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dpi", type=int, default=150, help="render DPI (0 to skip rendering)")
+    parser.add_argument("--backend", help=argparse.SUPPRESS)  # child-process mode
+    args = parser.parse_args()
+
+    pdfs = [Path(p) for p in args.pdfs] or sorted(UPLOADS_DIR.glob("*.pdf"))
+    if not pdfs:
+        sys.exit("No PDFs found")
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, pdfs, args.repeat, args.dpi)))
+        return
+
+    print(f"{len(pdfs)} PDF(s), repeat={args.repeat}, render dpi={args.dpi}")
+    print(f"{'backend':<10}{'pages':>7}{'text ms/pg':>12}{'render ms/pg':>14}{'chars/pg':>10}{'RSS KB/pg':>11}")
+    for backend in PDF_BACKENDS:
+        if backend not in available_backends():
+            print(f"{backend:<10}  (not installed)")
+            continue
+        cmd = [sys.executable, "-m", "benchmarks.pdf_backends", "--backend", backend,
+               "--repeat", str(args.repeat), "--dpi", str(args.dpi)] + [str(p) for p in pdfs]
+        proc = subprocess.run(cmd, capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent.parent)
+        if proc.returncode != 0:
+            error = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+            print(f"{backend:<10}  error: {error}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        fmt = lambda v: "-" if v is None else f"{v:.3f}"
+        print(f"{backend:<10}{r['pages']:>7}{fmt(r['text_ms_per_page']):>12}"
+              f"{fmt(r['render_ms_per_page']):>14}{r['chars_per_page']:>10}"
+              f"{r['peak_rss_growth_kb_per_page']:>11}")
+        if r["render_error"]:
+            print(f"{'':<10}  render skipped: {r['render_error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Batch Risk Assessment Benchmark - assess() per report vs assess_batch()
+
+Usage (from backend/):
+    python -m benchmarks.risk_batch [--reports 1000 10000 100000] [--seed 0]
+
+Lab values are the ground-truth entities of synthetic reports
+(benchmarks.synthetic_reports), so every reference test, both genders and
+low, normal and high values occur. Each size is scored both ways, the results
+compared and the throughput printed.
+"""
+
+import argparse
+import time
+
+from benchmarks.synthetic_reports import SyntheticReportGenerator
+from services.risk_assessment import RiskAssessmentService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reports", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    risk = RiskAssessmentService()
+    risk.assess_batch([])  # imports NumPy outside the timings
+    generator = SyntheticReportGenerator(seed=args.seed, noise=0)
+    print(f"{'reports':>8}{'values':>9}{'assess/s':>12}{'batch/s':>12}{'speedup':>9}")
+    for count in args.reports:
+        entities = [report["entities"] for report in generator.reports(count)]
+        genders = [e["patient_info"]["gender"] for e in entities]
+        values = sum(len(e["lab_values"]) for e in entities)
+
+        start = time.perf_counter()
+        expected = [risk.assess(e, g) for e, g in zip(entities, genders)]
+        loop_s = time.perf_counter() - start
+        start = time.perf_counter()
+        actual = risk.assess_batch(entities, genders)
+        batch_s = time.perf_counter() - start
+
+        assert actual == expected, "assess_batch differs from assess"
+        print(f"{count:>8}{values:>9}{count / loop_s:>12.0f}{count / batch_s:>12.0f}{loop_s / batch_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Startup Benchmark - worker boot time with lazy vs preloaded services
+
+Usage (from backend/):
+    python -m benchmarks.startup [--repeat 5]
+
+Each run starts a fresh interpreter, imports the FastAPI app and runs its
+startup handlers, the way a new uvicorn worker does. "lazy" is the default
+(services built on first use); "preload" sets SERVICES_PRELOAD=all to build
+every service during startup, like the old import-time construction minus
+the capability probes, which now always run on first use. The per-service
+initialization cost paid later by the first request is reported too.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+_CHILD = """
+import asyncio, json, time
+start = time.perf_counter()
+from api.main import app
+asyncio.run(app.router.startup())
+boot_ms = (time.perf_counter() - start) * 1000
+from services.registry import registry
+already = set(registry.initialized())
+registry.preload()
+print(json.dumps({
+    "boot_ms": boot_ms,
+    "first_use_ms": {k: v for k, v in registry.stats()["init_ms"].items() if k not in already},
+}))
+registry.close()
+"""
+
+
+def _run(preload: bool):
+    env = dict(os.environ)
+    env.pop("SERVICES_PRELOAD", None)
+    if preload:
+        env["SERVICES_PRELOAD"] = "all"
+    result = subprocess.run(
+        [sys.executable, "-c", _CHILD], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'boot ms (median)':>18}{'min':>8}{'max':>8}")
+    first_use = {}
+    for mode in ("lazy", "preload"):
+        runs = [_run(mode == "preload") for _ in range(args.repeat)]
+        boots = [r["boot_ms"] for r in runs]
+        print(f"{mode:<10}{statistics.median(boots):>18.1f}{min(boots):>8.1f}{max(boots):>8.1f}")
+        if mode == "lazy":
+            for name in runs[0]["first_use_ms"]:
+                first_use[name] = statistics.median(r["first_use_ms"][name] for r in runs)
+
+    print(f"\n{'service':<16}{'first-use init ms':>18}")
+    for name, ms in first_use.items():
+        print(f"{name:<16}{ms:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,499 @@
+"""
+Synthetic Lab Reports - seeded report corpus with ground-truth entities
+
+Usage (from backend/):
+    python -m benchmarks.synthetic_reports --count 1000 --out /tmp/corpus [--formats txt png pdf]
+    python -m benchmarks.synthetic_reports --count 20000 --evaluate [--source txt|png|pdf]
+
+Every report covers a random subset of RiskAssessmentService's reference
+tests (report i always includes test i mod 17, so any corpus of 17 or more
+covers them all), printed under the knowledge base's aliases in one of
+several layouts. Values are normal, low or high for the patient's gender,
+sometimes in another unit (g/L, mmol/L, umol/L, x10^3/uL) or with Indian
+digit grouping. Medication brand names and diagnosis synonyms come from
+aliases.json; the header and footer vary too. Panel titles avoid diagnosis
+terms, but some test names contain one ("LDL Cholesterol"), so the diagnosis
+labels are every diagnosis printed anywhere in the report, while
+"clinical_history" keeps the ones the history line states.
+
+Report i depends only on (seed, i), so corpora of any size from 1 to 100k
+are streamed and any slice can be regenerated. Formats:
+
+    txt       page texts joined by newlines, with OCR-like character noise
+    png       one image per page, slightly rotated and speckled
+    pdf       the page images as a multi-page, image-only PDF (needs OCR)
+    pdf-text  a multi-page PDF with a text layer (needs PyMuPDF)
+
+labels.jsonl holds one record per report: its files, clinical history and the entities a
+perfect extractor would return (lab values with status, medications,
+diagnoses, patient info). --evaluate runs NER (through
+extract_entities_many) over the texts, or OCR and NER over rendered pages,
+and prints throughput and precision/recall against those labels.
+"""
+
+import argparse
+import json
+import random
+import re
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from services.lexicon_compiler import knowledge_base_dir
+from services.risk_assessment import RiskAssessmentService
+
+LAYOUTS = ("colon", "table", "flagged", "dotted")
+FORMATS = ("txt", "png", "pdf", "pdf-text")
+
+# Printed decimals per test
+DECIMALS = {
+    "Hemoglobin": 1, "WBC": 0, "RBC": 2, "Platelet": 0, "FBS": 0, "HbA1c": 1, "SGPT": 0, "SGOT": 0,
+    "Cholesterol": 0, "LDL": 0, "HDL": 0, "Triglycerides": 0, "Creatinine": 2, "Urea": 0, "TSH": 2,
+    "Sodium": 0, "Potassium": 1,
+}
+
+# Other units labs print, with the factor from the reference unit
+ALT_UNITS = {
+    "Hemoglobin": ("g/L", 10.0, 0),
+    "WBC": ("x10^3/uL", 0.001, 1),
+    "Platelet": ("x10^3/uL", 0.001, 0),
+    "FBS": ("mmol/L", 1 / 18.016, 1),
+    "Cholesterol": ("mmol/L", 1 / 38.67, 2),
+    "LDL": ("mmol/L", 1 / 38.67, 2),
+    "HDL": ("mmol/L", 1 / 38.67, 2),
+    "Triglycerides": ("mmol/L", 1 / 88.57, 2),
+    "Creatinine": ("umol/L", 88.4, 0),
+    "Urea": ("mmol/L", 0.1665, 1),
+}
+
+# Report order, the way lab reports group tests into panels
+PANELS = [
+    ("COMPLETE BLOOD COUNT", ["Hemoglobin", "WBC", "RBC", "Platelet"]),
+    ("GLUCOSE PROFILE", ["FBS", "HbA1c"]),
+    ("LIVER FUNCTION TEST", ["SGPT", "SGOT"]),
+    ("LIPID PROFILE", ["Cholesterol", "LDL", "HDL", "Triglycerides"]),
+    ("KIDNEY FUNCTION TEST", ["Creatinine", "Urea"]),
+    ("ENDOCRINE PROFILE", ["TSH"]),
+    ("ELECTROLYTES", ["Sodium", "Potassium"]),
+]
+
+LAB_NAMES = ["City Diagnostics", "Sunrise Pathology Lab", "Metro Health Labs", "Lifeline Diagnostic Centre"]
+FIRST_NAMES = ["Asha", "Ravi", "Meena", "Suresh", "Priya", "Arjun", "Kavita", "Imran", "Lakshmi", "John"]
+LAST_NAMES = ["Sharma", "Iyer", "Khan", "Reddy", "Das", "Patel", "Nair", "Singh", "Fernandes", "Rao"]
+DOCTORS = ["Dr. A. Mehta", "Dr. S. Kulkarni", "Dr. R. Banerjee", "Dr. P. Menon"]
+DATE_FORMATS = ["%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%d/%m/%y"]
+FOOTERS = [
+    "*** End of Report ***",
+    "Results relate only to the sample received. Please correlate clinically.",
+    "Reference ranges are for adults. Verified by consultant pathologist.",
+]
+
+# Character confusions typical of OCR output
+_CONFUSIONS = {"0": "O", "O": "0", "1": "l", "l": "1", "5": "S", "S": "5", "8": "B", "B": "8", ".": ",", ":": ";"}
+
+
+def _load_aliases() -> Dict[str, Any]:
+    with open(knowledge_base_dir() / "aliases.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SyntheticReportGenerator:
+    def __init__(
+        self,
+        seed: int = 0,
+        noise: float = 0.01,
+        alt_unit_rate: float = 0.15,
+        indian_grouping_rate: float = 0.1,
+        abnormal_rate: float = 0.3,
+        layouts: Sequence[str] = LAYOUTS,
+        max_pages: int = 3,
+    ):
+        self.seed = seed
+        self.noise = noise
+        self.alt_unit_rate = alt_unit_rate
+        self.indian_grouping_rate = indian_grouping_rate
+        self.abnormal_rate = abnormal_rate
+        self.layouts = list(layouts)
+        self.max_pages = max(1, max_pages)
+
+        self.risk = RiskAssessmentService()
+        self.tests = list(self.risk.reference_ranges)
+        aliases = _load_aliases()
+        self.lab_aliases = aliases.get("lab_tests", {})
+        self.medications = aliases.get("medications", {})
+        self.diagnoses = aliases.get("diagnoses", {})
+        # Whole-word, case-insensitive like the NER lexicon, one pattern per diagnosis
+        self._diagnosis_patterns = {
+            name: re.compile(r"(?<!\w)(?:" + "|".join(
+                re.escape(term) for term in sorted({name, *synonyms}, key=len, reverse=True)
+            ) + r")(?!\w)", re.IGNORECASE)
+            for name, synonyms in self.diagnoses.items()
+        }
+
+    def reports(self, count: int, start: int = 0) -> Iterator[Dict[str, Any]]:
+        for index in range(start, start + count):
+            yield self.report(index)
+
+    def report(self, index: int) -> Dict[str, Any]:
+        """Report `index` of this seed: {"report_id", "layout", "pages", "text", "clinical_history", "entities"}"""
+        rng = random.Random(f"{self.seed}:{index}")
+        gender = rng.choice(["male", "female"])
+        age = rng.randint(18, 90)
+        report_date = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2019, 2025)}"
+        report_date = time.strftime(rng.choice(DATE_FORMATS), time.strptime(report_date, "%d/%m/%Y"))
+        layout = rng.choice(self.layouts)
+
+        wanted = {self.tests[index % len(self.tests)]}
+        wanted.update(t for t in self.tests if rng.random() < 0.45)
+        lab_values, sections = [], []
+        for title, panel in PANELS:
+            rows = [self._lab_row(rng, test, gender, layout) for test in panel if test in wanted]
+            if rows:
+                lines = [title] + (["Test Name                   Result      Unit          Reference"]
+                                   if layout == "table" else [])
+                sections.append(lines + [line for line, _ in rows])
+                lab_values += [label for _, label in rows]
+
+        medications = rng.sample(list(self.medications), rng.randint(0, 3))
+        history = rng.sample(list(self.diagnoses), rng.randint(0, 2))
+        notes = []
+        if medications:
+            notes.append("Current medication: " + ", ".join(
+                f"{self._surface(rng, name, self.medications)} {rng.choice([5, 10, 40, 75, 500])} mg"
+                for name in medications
+            ))
+        if history:
+            notes.append("Clinical history: " + ", ".join(self._surface(rng, n, self.diagnoses) for n in history))
+        notes.append(rng.choice(FOOTERS))
+
+        name = f"{'Mr.' if gender == 'male' else rng.choice(['Mrs.', 'Miss'])} " \
+               f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        header = [
+            rng.choice(LAB_NAMES).upper(),
+            f"Patient Name: {name}",
+            f"Age: {age} Years    Sex: {gender.title()}",
+            f"Referred By: {rng.choice(DOCTORS)}    Date: {report_date}",
+            f"Sample ID: {rng.randint(100000, 999999)}",
+        ]
+        pages = self._paginate(rng, header, sections, notes)
+        text = "\n".join(self._add_noise(rng, page) for page in pages)
+        printed = "\n".join(pages)
+        diagnoses = [name for name, pattern in self._diagnosis_patterns.items() if pattern.search(printed)]
+        return {
+            "report_id": f"synthetic-{self.seed}-{index:06d}",
+            "index": index,
+            "layout": layout,
+            "pages": pages,
+            "text": text,
+            "clinical_history": history,
+            "entities": {
+                "lab_values": lab_values,
+                "medications": medications,
+                "diagnoses": diagnoses,
+                "patient_info": {"age": age, "gender": gender, "report_date": report_date},
+            },
+        }
+
+    def _lab_row(self, rng: random.Random, test: str, gender: str, layout: str):
+        ranges = self.risk.reference_ranges[test]
+        ref = ranges.get(gender) or ranges["all"]
+        low, high = ref["min"], ref["max"]
+        top = min(high, low * 1.8 if low > 0 else high)
+        roll = rng.random()
+        if roll < self.abnormal_rate / 2 and low > 0:
+            value = rng.uniform(low * 0.5, low * 0.98)
+        elif roll < self.abnormal_rate and high < 999:
+            value = rng.uniform(high * 1.02, high * 1.8)
+        else:
+            value = rng.uniform(low if low > 0 else top * 0.3, top)
+        value = round(value, DECIMALS[test]) if DECIMALS[test] else float(round(value))
+        if test == "Platelet":
+            value = float(round(value, -3))
+        status = self.risk._check_value(test, value, gender)["status"]
+
+        entry = self.lab_aliases.get(test, {})
+        raw_name = rng.choice(entry.get("aliases") or [test])
+        unit = rng.choice(entry.get("units") or [ref["unit"]])
+        printed_value, decimals = value, DECIMALS[test]
+        if test in ALT_UNITS and rng.random() < self.alt_unit_rate:
+            unit, factor, decimals = ALT_UNITS[test]
+            printed_value = round(value * factor, decimals)
+        printed = f"{printed_value:.{decimals}f}"
+        if decimals == 0 and printed_value >= 100000 and rng.random() < self.indian_grouping_rate:
+            printed = _indian_grouping(int(printed_value))
+        elif decimals == 0 and printed_value >= 10000 and rng.random() < 0.5:
+            printed = f"{int(printed_value):,}"
+
+        reference = f"{low} - {high}" if high < 999 else f"> {low}"
+        flag = {"low": "L", "high": "H"}.get(status, "")
+        if layout == "table":
+            line = f"{raw_name:<28}{printed:<12}{unit:<14}{reference}"
+        elif layout == "flagged":
+            line = f"{raw_name}: {printed} {unit} {'(' + flag + ')' if flag else ''}".rstrip()
+        elif layout == "dotted":
+            line = f"{raw_name} {'.' * rng.randint(3, 12)} {printed} {unit}"
+        else:
+            line = f"{raw_name}: {printed} {unit}"
+        label = {
+            "test": test,
+            "raw_name": raw_name,
+            "value": float(printed_value),
+            "unit": unit,
+            "status": status,
+            "reference_value": value,
+        }
+        return line, label
+
+    @staticmethod
+    def _surface(rng: random.Random, canonical: str, synonyms: Dict[str, List[str]]) -> str:
+        """The canonical name or one of its synonyms, as printed"""
+        form = rng.choice([canonical] + list(synonyms.get(canonical, [])))
+        return form if form != form.lower() else form.title() if len(form) > 4 else form.upper()
+
+    def _paginate(self, rng: random.Random, header: List[str], sections: List[List[str]], notes: List[str]) -> List[str]:
+        page_count = min(rng.randint(1, self.max_pages), max(1, len(sections)))
+        per_page = -(-len(sections) // page_count) if sections else 1
+        chunks = [sections[i:i + per_page] for i in range(0, len(sections), per_page)] or [[]]
+        pages = []
+        for number, chunk in enumerate(chunks, start=1):
+            lines = list(header) if number == 1 else [header[0], header[1]]
+            for section in chunk:
+                lines += [""] + section
+            if number == len(chunks):
+                lines += [""] + notes
+            if len(chunks) > 1:
+                lines += ["", f"Page {number} of {len(chunks)}"]
+            pages.append("\n".join(lines))
+        return pages
+
+    def _add_noise(self, rng: random.Random, text: str) -> str:
+        if self.noise <= 0:
+            return text
+        out = []
+        for ch in text:
+            roll = rng.random()
+            if roll < self.noise / 2 and ch in _CONFUSIONS:
+                out.append(_CONFUSIONS[ch])
+            elif roll < self.noise * 0.6 and ch == " ":
+                out.append("  ")
+            elif roll < self.noise * 0.7 and ch.isalpha():
+                continue
+            else:
+                out.append(ch)
+        return "".join(out)
+
+
+def _indian_grouping(number: int) -> str:
+    """2,50,000 rather than 250,000"""
+    digits = str(number)
+    head, tail = digits[:-3], digits[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    return ",".join(([head] if head else []) + groups + [tail])
+
+
+# ===== Rendering =====
+
+def render_page(text: str, noise: float = 0.0, rng: Optional[random.Random] = None, dpi: int = 150):
+    """An A4 page image of the text, rotated and speckled by `noise` like a scan"""
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = rng or random.Random(0)
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    img = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(img)
+    size = max(dpi // 9, 12)
+    try:
+        font = ImageFont.load_default(size=size)
+    except TypeError:
+        font = ImageFont.load_default()
+    for i, line in enumerate(text.splitlines()):
+        draw.text((dpi // 2, dpi // 2 + i * int(size * 1.5)), line, fill=20, font=font)
+    if noise > 0:
+        for _ in range(int(width * height * noise / 50)):
+            img.putpixel((rng.randrange(width), rng.randrange(height)), rng.randint(0, 160))
+        img = img.rotate(rng.uniform(-noise * 60, noise * 60), fillcolor=255, resample=Image.BICUBIC)
+    return img
+
+
+def write_report(report: Dict[str, Any], out_dir: Path, formats: Iterable[str], noise: float = 0.0) -> Dict[str, Any]:
+    """Write a report in the given formats under out_dir; returns its relative file paths"""
+    shard = f"{report['index'] // 1000:04d}"
+    (out_dir / shard).mkdir(parents=True, exist_ok=True)
+    base = f"{shard}/{report['report_id']}"
+    files: Dict[str, Any] = {}
+    formats = set(formats)
+    if "txt" in formats:
+        (out_dir / f"{base}.txt").write_text(report["text"], encoding="utf-8")
+        files["txt"] = f"{base}.txt"
+    if formats & {"png", "pdf"}:
+        rng = random.Random(report["report_id"])
+        images = [render_page(page, noise, rng) for page in report["pages"]]
+        if "png" in formats:
+            files["png"] = []
+            for number, img in enumerate(images, start=1):
+                img.save(out_dir / f"{base}-p{number}.png")
+                files["png"].append(f"{base}-p{number}.png")
+        if "pdf" in formats:
+            images[0].save(out_dir / f"{base}.pdf", save_all=True, append_images=images[1:], resolution=150)
+            files["pdf"] = f"{base}.pdf"
+    if "pdf-text" in formats:
+        import fitz  # PyMuPDF
+
+        with fitz.open() as doc:
+            for page_text in report["pages"]:
+                page = doc.new_page()
+                page.insert_text((50, 60), page_text, fontsize=10)
+            doc.save(out_dir / f"{base}-text.pdf")
+        files["pdf-text"] = f"{base}-text.pdf"
+    return files
+
+
+def write_corpus(generator: SyntheticReportGenerator, count: int, out_dir: Path, formats: Iterable[str]) -> int:
+    """Stream `count` reports to out_dir with labels.jsonl; returns the number written"""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    formats = list(formats)
+    written = 0
+    with open(out_dir / "labels.jsonl", "w", encoding="utf-8") as labels:
+        for report in generator.reports(count):
+            files = write_report(report, out_dir, formats, generator.noise)
+            labels.write(json.dumps({
+                "report_id": report["report_id"],
+                "index": report["index"],
+                "seed": generator.seed,
+                "layout": report["layout"],
+                "pages": len(report["pages"]),
+                "files": files,
+                "clinical_history": report["clinical_history"],
+                "entities": report["entities"],
+            }) + "\n")
+            written += 1
+    return written
+
+
+# ===== Scoring =====
+
+def score_entities(predicted: Dict[str, Any], truth: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """True/false positives and false negatives per entity kind for one report"""
+    def counts(found: set, expected: set) -> Dict[str, int]:
+        return {"tp": len(found & expected), "fp": len(found - expected), "fn": len(expected - found)}
+
+    predicted_info, true_info = predicted.get("patient_info", {}), truth["patient_info"]
+    return {
+        "lab_values": counts(
+            {(lab["test"], round(lab["value"], 4)) for lab in predicted.get("lab_values", [])},
+            {(lab["test"], round(lab["value"], 4)) for lab in truth["lab_values"]},
+        ),
+        "medications": counts(set(predicted.get("medications", [])), set(truth["medications"])),
+        "diagnoses": counts(set(predicted.get("diagnoses", [])), set(truth["diagnoses"])),
+        "patient_info": counts(
+            {(k, v) for k, v in predicted_info.items() if k in true_info},
+            set(true_info.items()),
+        ),
+    }
+
+
+def summarize_scores(totals: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for kind, c in totals.items():
+        precision = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else 1.0
+        recall = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else 1.0
+        summary[kind] = {"precision": round(precision, 4), "recall": round(recall, 4), **c}
+    return summary
+
+
+def evaluate(
+    reports: Iterable[Dict[str, Any]],
+    extract_many: Callable[[Iterable[str]], Iterator[Dict[str, Any]]],
+    to_text: Callable[[Dict[str, Any]], str] = lambda report: report["text"],
+) -> Dict[str, Any]:
+    """
+    Run extract_many over the reports' texts (to_text may OCR a rendered
+    report) and score every result against the labels. Reports are generated
+    as the extractor asks for texts, so memory stays flat for any corpus size.
+    """
+    pending = deque()
+
+    def texts():
+        for report in reports:
+            pending.append(report["entities"])
+            yield to_text(report)
+
+    totals: Dict[str, Dict[str, int]] = {}
+    start = time.perf_counter()
+    count = 0
+    for predicted in extract_many(texts()):
+        for kind, c in score_entities(predicted, pending.popleft()).items():
+            total = totals.setdefault(kind, {"tp": 0, "fp": 0, "fn": 0})
+            for key, value in c.items():
+                total[key] += value
+        count += 1
+    elapsed = time.perf_counter() - start
+    return {"reports": count, "seconds": round(elapsed, 3), "reports_per_sec": round(count / elapsed, 1) if elapsed else None,
+            "scores": summarize_scores(totals)}
+
+
+def _ocr_text(ocr, formats: str, scratch: Path, noise: float) -> Callable[[Dict[str, Any]], str]:
+    def to_text(report: Dict[str, Any]) -> str:
+        files = write_report(report, scratch, [formats], noise)
+        paths = files[formats] if isinstance(files[formats], list) else [files[formats]]
+        return "\n".join(ocr.extract_text(str(scratch / path)) for path in paths)
+    return to_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise", type=float, default=0.01)
+    parser.add_argument("--max-pages", type=int, default=3)
+    parser.add_argument("--out", type=Path)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["txt"])
+    parser.add_argument("--evaluate", action="store_true", help="score NER (or OCR + NER) against the labels")
+    parser.add_argument("--source", choices=["txt", "png", "pdf", "pdf-text"], default="txt")
+    parser.add_argument("--workers", type=int, help="NER processes for --evaluate (default NER_WORKERS)")
+    args = parser.parse_args()
+
+    generator = SyntheticReportGenerator(seed=args.seed, noise=args.noise, max_pages=args.max_pages)
+    if args.out:
+        start = time.perf_counter()
+        written = write_corpus(generator, args.count, args.out, args.formats)
+        elapsed = time.perf_counter() - start
+        print(f"[Synthetic] Wrote {written} reports ({', '.join(args.formats)}) to {args.out} "
+              f"in {elapsed:.1f}s ({written / elapsed:.1f} reports/s)")
+    if not args.evaluate:
+        return
+
+    from services.ner_service import NERService
+
+    ner = NERService()
+    try:
+        if args.source == "txt":
+            result = evaluate(generator.reports(args.count),
+                              lambda texts: ner.extract_entities_many(texts, workers=args.workers))
+        else:
+            from services.ocr_cache import OCRCache
+            from services.ocr_service import OCRService
+
+            ocr = OCRService(cache=OCRCache(cache_dir=None))
+            with tempfile.TemporaryDirectory() as scratch:
+                result = evaluate(generator.reports(args.count),
+                                  lambda texts: ner.extract_entities_many(texts, workers=1),
+                                  _ocr_text(ocr, args.source, Path(scratch), args.noise))
+            ocr.close()
+    finally:
+        ner.close()
+
+    print(f"[Synthetic] {result['reports']} reports from {args.source} in {result['seconds']}s "
+          f"({result['reports_per_sec']} reports/s)")
+    print(f"{'entity':<14}{'precision':>10}{'recall':>8}{'tp':>8}{'fp':>8}{'fn':>8}")
+    for kind, s in result["scores"].items():
+        print(f"{kind:<14}{s['precision']:>10.3f}{s['recall']:>8.3f}{s['tp']:>8}{s['fp']:>8}{s['fn']:>8}")
+
+
+if __name__ == "__main__":
+    main()
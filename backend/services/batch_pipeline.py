@@ -0,0 +1,148 @@
+"""
+Batch Pipeline - Staged, pipelined processing for bulk report imports
+Each stage (OCR -> NER -> risk -> simplify for reports) has its own worker
+threads and a bounded input queue, so OCR on report N+1 overlaps NER and
+simplification of report N, and a slow stage only holds back as many items
+as its queue allows. Items come out in completion order.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# Sentinel telling a stage worker to exit
+_STOP = object()
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any]], None], workers: int = 1):
+        """fn updates the item dict in place; raising marks the item failed"""
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+
+def parse_stage_workers(value: str) -> Dict[str, int]:
+    """Parse e.g. "ocr=3,ner=1" (BATCH_STAGE_WORKERS)"""
+    workers = {}
+    for part in (value or "").split(","):
+        name, _, count = part.partition("=")
+        if name.strip() and count.strip():
+            workers[name.strip()] = int(count)
+    return workers
+
+
+class BatchPipeline:
+    def __init__(self, stages: List[Stage], queue_factor: int = 2):
+        self.stages = stages
+        self.queue_factor = max(1, queue_factor)
+        self._busy = {stage.name: 0.0 for stage in stages}
+        self._processed = {stage.name: 0 for stage in stages}
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._completed = 0
+        self._failed = 0
+
+    def run(self, items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield each item once it has passed every stage (or failed in one;
+        failed items carry "error" and "failed_stage"). Closing the iterator
+        early cancels the remaining work.
+        """
+        items = list(items)
+        cancel = threading.Event()
+        queues = [queue.Queue(maxsize=stage.workers * self.queue_factor) for stage in self.stages]
+        done: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+
+        for i, stage in enumerate(self.stages):
+            out = queues[i + 1] if i + 1 < len(self.stages) else done
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work, args=(stage, queues[i], out, cancel),
+                    name=f"batch-{stage.name}-{n}", daemon=True,
+                )
+                thread.start()
+
+        feeder = threading.Thread(target=self._feed, args=(items, queues[0], cancel), daemon=True)
+        self._started = time.perf_counter()
+        feeder.start()
+
+        try:
+            for _ in range(len(items)):
+                item = done.get()
+                if "error" in item:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                yield item
+        finally:
+            self._finished = time.perf_counter()
+            cancel.set()
+            # Wake workers blocked on an empty queue; the rest see cancel
+            for i, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    try:
+                        queues[i].put_nowait(_STOP)
+                    except queue.Full:
+                        break
+
+    def _feed(self, items, first: queue.Queue, cancel: threading.Event) -> None:
+        for item in items:
+            if not self._put(first, item, cancel):
+                return
+
+    @staticmethod
+    def _put(q: queue.Queue, item, cancel: threading.Event) -> bool:
+        """Blocking put that gives up once cancelled (backpressure with an exit)"""
+        while not cancel.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _work(self, stage: Stage, inbox: queue.Queue, out: queue.Queue, cancel: threading.Event) -> None:
+        while True:
+            item = inbox.get()
+            if item is _STOP or cancel.is_set():
+                return
+            if "error" not in item:
+                start = time.perf_counter()
+                try:
+                    stage.fn(item)
+                except Exception as e:
+                    item["error"] = str(e)
+                    item["failed_stage"] = stage.name
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._busy[stage.name] += elapsed
+                    self._processed[stage.name] += 1
+            if not self._put(out, item, cancel):
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput and per-stage utilization (busy time / worker time)"""
+        if self._started is None:
+            return {}
+        end = self._finished or time.perf_counter()
+        wall = max(end - self._started, 1e-9)
+        with self._lock:
+            stages = {
+                stage.name: {
+                    "workers": stage.workers,
+                    "processed": self._processed[stage.name],
+                    "busy_seconds": round(self._busy[stage.name], 3),
+                    "utilization": round(self._busy[stage.name] / (wall * stage.workers), 3),
+                }
+                for stage in self.stages
+            }
+        return {
+            "elapsed_seconds": round(wall, 3),
+            "completed": self._completed,
+            "failed": self._failed,
+            "reports_per_minute": round(60 * self._completed / wall, 2),
+            "stages": stages,
+        }
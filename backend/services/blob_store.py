@@ -0,0 +1,233 @@
+"""
+Blob Store - Content-addressed upload storage with reference counts
+The same report is often uploaded many times (retries, family members,
+clinic re-scans). Identical bytes are stored once under their SHA-256 and
+every upload becomes a reference to that blob; the blob is deleted when its
+last reference is released. Finished analyses are kept per blob and patient
+context so a repeat request is answered without re-running the pipeline.
+
+The index lives in SQLite next to the blobs, so every worker on the host
+shares it and it survives restarts. Both stay outside the publicly served
+uploads directory: the index holds every content hash and the stored
+analyses, and a hash is enough to name a blob.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+from services.upload_storage import CHUNK_SIZE, HashingWriter
+
+DEFAULT_BLOB_DIR = Path(__file__).resolve().parent.parent / "blob_store"
+
+
+def blob_store_dir() -> Path:
+    return Path(os.environ.get("BLOB_STORE_DIR") or DEFAULT_BLOB_DIR)
+
+
+def file_sha256(file_path: Union[str, Path]) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    def __init__(self, root: Union[str, Path] = DEFAULT_BLOB_DIR):
+        self.root = Path(root).resolve()
+        self.blob_dir = self.root / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.root / "blobs.db"
+        self._counters = {"analysis_hits": 0, "analysis_misses": 0}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    content_hash TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    refcount INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS reports (
+                    report_id TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL REFERENCES blobs (content_hash),
+                    file_name TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS analyses (
+                    cache_key TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL REFERENCES blobs (content_hash),
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS analyses_hash ON analyses (content_hash);
+                """
+            )
+
+    @classmethod
+    def from_env(cls) -> "BlobStore":
+        return cls(blob_store_dir())
+
+    @contextmanager
+    def _connect(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call keeps this safe across threads
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:  # commit or roll back
+                if immediate:
+                    # Take the write lock up front so refcount changes and
+                    # blob file moves/deletes happen as one step
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+        finally:
+            conn.close()
+
+    def blob_path(self, content_hash: str, file_name: str) -> Path:
+        return self.blob_dir / f"{content_hash}{Path(file_name).suffix.lower()}"
+
+    def writer(self, max_bytes: int) -> HashingWriter:
+        """Temp-file writer for a new upload; hand it to add() when complete"""
+        return HashingWriter(self.blob_dir, max_bytes)
+
+    def add(self, writer: HashingWriter, file_name: str) -> Dict[str, Any]:
+        """
+        Register a finished upload as a new report. The bytes are kept only
+        if no blob with the same hash exists; otherwise the temp file is
+        dropped and the existing blob gains a reference.
+        """
+        content_hash = writer.sha256
+        report_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            blob = conn.execute(
+                "SELECT file_name FROM blobs WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+            if blob is not None:
+                writer.abort()
+                conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE content_hash = ?", (content_hash,))
+                path = self.blob_path(content_hash, blob["file_name"])
+            else:
+                path = writer.commit(self.blob_path(content_hash, file_name))
+                conn.execute(
+                    "INSERT INTO blobs (content_hash, file_name, size, refcount, created_at) VALUES (?, ?, ?, 1, ?)",
+                    (content_hash, file_name, writer.size, now),
+                )
+            conn.execute(
+                "INSERT INTO reports (report_id, content_hash, file_name, created_at) VALUES (?, ?, ?, ?)",
+                (report_id, content_hash, file_name, now),
+            )
+        return {
+            "report_id": report_id,
+            "file_path": str(path),
+            "file_name": file_name,
+            "file_size": writer.size,
+            "content_hash": content_hash,
+            "deduplicated": blob is not None,
+        }
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                """
+                SELECT r.report_id, r.content_hash, r.file_name, b.file_name AS blob_name, b.size
+                FROM reports r JOIN blobs b ON b.content_hash = r.content_hash
+                WHERE r.report_id = ?
+                """,
+                (report_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        report = dict(row)
+        report["file_path"] = str(self.blob_path(report["content_hash"], report.pop("blob_name")))
+        return report
+
+    def release(self, report_id: str) -> Optional[bool]:
+        """
+        Drop a report's reference. Returns True if that deleted the blob
+        (and its cached analyses), False if other reports still use it, and
+        None if the report is unknown.
+        """
+        with self._connect(immediate=True) as conn:
+            row = conn.execute(
+                """
+                SELECT b.content_hash, b.file_name, b.refcount
+                FROM reports r JOIN blobs b ON b.content_hash = r.content_hash
+                WHERE r.report_id = ?
+                """,
+                (report_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM reports WHERE report_id = ?", (report_id,))
+            if row["refcount"] > 1:
+                conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE content_hash = ?", (row["content_hash"],))
+                return False
+            conn.execute("DELETE FROM analyses WHERE content_hash = ?", (row["content_hash"],))
+            conn.execute("DELETE FROM blobs WHERE content_hash = ?", (row["content_hash"],))
+            self.blob_path(row["content_hash"], row["file_name"]).unlink(missing_ok=True)
+            return True
+
+    def content_hash(self, report_id: str, file_path: Union[str, Path]) -> str:
+        """Hash of a report's bytes, from the index when the report is known"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content_hash FROM reports WHERE report_id = ?", (report_id,)
+            ).fetchone()
+        return row["content_hash"] if row is not None else file_sha256(file_path)
+
+    # ── Analysis results ─────────────────────────────────────
+
+    @staticmethod
+    def _analysis_key(content_hash: str, context: Dict[str, Any]) -> str:
+        return content_hash + ":" + json.dumps(context, sort_keys=True)
+
+    def get_analysis(self, content_hash: str, context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Stored analysis of these bytes for the same patient context, if any"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result FROM analyses WHERE cache_key = ?", (self._analysis_key(content_hash, context),)
+            ).fetchone()
+        self._counters["analysis_hits" if row is not None else "analysis_misses"] += 1
+        return json.loads(row["result"]) if row is not None else None
+
+    def put_analysis(self, content_hash: str, context: Dict[str, Any], result: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            # Only cache analyses of blobs we hold; ad-hoc file paths are not tracked
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO analyses (cache_key, content_hash, result, created_at)
+                SELECT ?, content_hash, ?, ? FROM blobs WHERE content_hash = ?
+                """,
+                (self._analysis_key(content_hash, context), json.dumps(result), time.time(), content_hash),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            blobs = conn.execute(
+                """
+                SELECT COUNT(*) AS blobs, COALESCE(SUM(refcount), 0) AS refs,
+                       COALESCE(SUM(size), 0) AS stored, COALESCE(SUM(size * (refcount - 1)), 0) AS saved
+                FROM blobs
+                """
+            ).fetchone()
+            analyses = conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        lookups = self._counters["analysis_hits"] + self._counters["analysis_misses"]
+        return {
+            "blobs": blobs["blobs"],
+            "reports": blobs["refs"],
+            "bytes_stored": blobs["stored"],
+            "bytes_saved": blobs["saved"],
+            "analyses": analyses,
+            **self._counters,
+            "analysis_hit_rate": round(self._counters["analysis_hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,355 @@
+"""
+Job Queue - Background report processing with per-stage progress
+POST /process/report/{id}?mode=job returns a job id at once instead of
+holding the request open (long PDFs hit proxy timeouts). A local thread
+pool runs the job and records progress in a JobStore, which clients read
+by polling or over Server-Sent Events.
+
+Stores are pluggable: MemoryJobStore for a single worker, SQLiteJobStore
+when jobs must be visible to every worker on the host and survive a
+restart (queued and interrupted jobs are resumed on startup).
+"""
+
+import copy
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from services.pipeline_executor import ExecutorBusy
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+FINISHED_STATES = (COMPLETED, FAILED)
+
+# kind -> fn(params, progress) returning a JSON-serializable result.
+# Handlers register at import time so a durable store can resume jobs.
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any], Callable[..., None]], Any]] = {}
+
+
+def job_handler(kind: str):
+    def register(fn):
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+class JobFailed(Exception):
+    """Raised by handlers for expected failures; the message is shown to the user"""
+
+
+# host:pid of this worker, recorded on jobs it runs
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """True if owner is a live process on this host (jobs from other hosts count as alive)"""
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ── Stores ──────────────────────────────────────────────────
+
+class JobStore:
+    name = "base"
+
+    def create(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """Atomically move a queued job to running; False if someone else has it"""
+        raise NotImplementedError
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Queued or running jobs, oldest first"""
+        raise NotImplementedError
+
+    def purge(self, finished_before: float) -> int:
+        """Drop finished jobs last updated before the given time"""
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    name = "memory"
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["job_id"]] = copy.deepcopy(job)
+
+    def update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(copy.deepcopy(fields))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job is not None else None
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != QUEUED:
+                return False
+            job.update(status=RUNNING, owner=owner, updated_at=time.time())
+            return True
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = [j for j in self._jobs.values() if j["status"] not in FINISHED_STATES]
+            return copy.deepcopy(sorted(jobs, key=lambda j: j["created_at"]))
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            stale = [
+                job_id for job_id, j in self._jobs.items()
+                if j["status"] in FINISHED_STATES and j["updated_at"] < finished_before
+            ]
+            for job_id in stale:
+                del self._jobs[job_id]
+            return len(stale)
+
+
+class SQLiteJobStore(JobStore):
+    name = "sqlite"
+
+    _JSON_FIELDS = ("params", "progress", "result")
+
+    def __init__(self, path: str = "jobs.db"):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    owner TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per call keeps this safe across threads
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:  # commit or roll back
+                yield conn
+        finally:
+            conn.close()
+
+    def _encode(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            k: json.dumps(v) if k in self._JSON_FIELDS else v
+            for k, v in fields.items()
+        }
+
+    def _decode(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for field in self._JSON_FIELDS:
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def create(self, job: Dict[str, Any]) -> None:
+        fields = self._encode(job)
+        columns = ", ".join(fields)
+        placeholders = ", ".join(f":{k}" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", fields)
+
+    def update(self, job_id: str, **fields) -> None:
+        fields = self._encode(fields)
+        assignments = ", ".join(f"{k} = :{k}" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = :job_id", {**fields, "job_id": job_id})
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (RUNNING, owner, time.time(), job_id, QUEUED),
+            )
+            return cursor.rowcount == 1
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def purge(self, finished_before: float) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (COMPLETED, FAILED, finished_before),
+            )
+            return cursor.rowcount
+
+
+JOB_STORES = {
+    "memory": MemoryJobStore,
+    "sqlite": SQLiteJobStore,
+}
+
+
+# ── Queue ───────────────────────────────────────────────────
+
+class JobQueue:
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        workers: int = 2,
+        max_pending: int = 100,
+        ttl_seconds: float = 3600,
+        resume: bool = True,
+    ):
+        self.store = store if store is not None else MemoryJobStore()
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._pending = 0
+        if resume:
+            self._resume()
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        backend = os.environ.get("JOB_BACKEND", "memory")
+        if backend not in JOB_STORES:
+            raise ValueError(f"Unknown job backend: {backend}")
+        store = SQLiteJobStore(os.environ.get("JOB_DB_PATH", "jobs.db")) if backend == "sqlite" else MemoryJobStore()
+        return cls(
+            store=store,
+            workers=int(os.environ.get("JOB_WORKERS", "2")),
+            max_pending=int(os.environ.get("JOB_MAX_PENDING", "100")),
+            ttl_seconds=float(os.environ.get("JOB_TTL_SECONDS", "3600")),
+        )
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a job and return its initial record; raises ExecutorBusy when full"""
+        if kind not in JOB_HANDLERS:
+            raise KeyError(f"No handler registered for job kind: {kind}")
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise ExecutorBusy(retry_after=max(1, self._pending // self.workers))
+            self._pending += 1
+
+        now = time.time()
+        self.store.purge(now - self.ttl_seconds)
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "params": params,
+            "status": QUEUED,
+            "stage": None,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "owner": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.store.create(job)
+        self._pool.submit(self._run, job["job_id"], kind, params)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def _resume(self) -> None:
+        """Pick up queued jobs and jobs whose worker process died mid-run"""
+        jobs = [
+            j for j in self.store.unfinished()
+            if j["kind"] in JOB_HANDLERS and not (j["status"] == RUNNING and _owner_alive(j.get("owner")))
+        ]
+        if not jobs:
+            return
+        print(f"[Jobs] Resuming {len(jobs)} unfinished job(s) from {self.store.name} store")
+        for job in jobs:
+            with self._lock:
+                self._pending += 1
+            if job["status"] == RUNNING:
+                self.store.update(job["job_id"], status=QUEUED, updated_at=time.time())
+            self._pool.submit(self._run, job["job_id"], job["kind"], job["params"])
+
+    def _run(self, job_id: str, kind: str, params: Dict[str, Any]) -> None:
+        progress: Dict[str, Any] = {}
+
+        def report(stage: str, **data) -> None:
+            progress[stage] = data
+            self.store.update(job_id, stage=stage, progress=progress, updated_at=time.time())
+
+        try:
+            # Several workers may resume the same durable job; one wins
+            if not self.store.claim(job_id, _OWNER):
+                return
+            result = JOB_HANDLERS[kind](params, report)
+            self.store.update(job_id, status=COMPLETED, stage="done", result=result, updated_at=time.time())
+        except JobFailed as e:
+            self.store.update(job_id, status=FAILED, error=str(e), updated_at=time.time())
+        except Exception as e:
+            print(f"[Jobs] Job {job_id} ({kind}) failed: {e}")
+            self.store.update(job_id, status=FAILED, error=f"Processing failed: {e}", updated_at=time.time())
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.store.name,
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+            }
+
+    def close(self) -> None:
+        # Queued jobs stay queued in a durable store and resume on next start
+        self._pool.shutdown(wait=False, cancel_futures=True)
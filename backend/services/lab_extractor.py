@@ -0,0 +1,225 @@
+"""
+Lab Extractor - Single-pass matching of many lab value patterns
+NERService used to run each lab pattern over the whole report with its own
+re.finditer, one full scan per test. LabValueExtractor scans the text once
+with a detector built from every test alias (a trie-factored alternation
+inside a lookahead, so overlapping aliases are all seen). Only the patterns
+whose alias can start at a detected position are tried there, anchored.
+
+The output is identical to the per-pattern loop: matches are replayed per
+pattern with finditer's non-overlapping rule, in pattern order, and the
+first value seen for each normalized test name wins.
+
+LabValueStream runs the same scan over text that arrives in pieces (OCR
+pages). Start positions are tried once `holdback` characters follow them,
+so a test name and its value split by a page break are usually matched
+while pages arrive; a name left waiting for its value at the end of the text
+is tried again on the next piece. finish() rescans the whole text, so the
+final values never depend on where the pieces were cut.
+"""
+
+import re
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+# Under re.IGNORECASE these non-ASCII letters match ASCII ones (documented
+# in the re module); everything else folds with str.lower()
+_REGEX_CASE_FOLDS = {"İ": "i", "ı": "i", "ſ": "s", "K": "k"}
+
+# Characters that end the literal part of an alias, e.g. "Na\+?" -> "Na"
+_REGEX_META = set("\\.^$*+?{}[]()|")
+
+
+def _fold(ch: str) -> str:
+    return _REGEX_CASE_FOLDS.get(ch) or ch.lower()
+
+
+def _alias_alternatives(pattern: str) -> List[str]:
+    """
+    Alternatives of the pattern's leading group, e.g. "(Hb|HGB)[:\\s]+..." ->
+    ["Hb", "HGB"]. Empty when every match need not start with one of them.
+    """
+    if not pattern.startswith("(") or pattern.startswith("(?"):
+        return []
+    depth, end = 0, None
+    for i, ch in enumerate(pattern):
+        if i > 0 and pattern[i - 1] == "\\":
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0 and end is None:
+                end = i
+        elif ch == "|" and depth == 0:
+            return []  # top-level alternation: matches can start elsewhere
+    if end is None or pattern[end + 1:end + 2] in ("?", "*", "{"):
+        return []
+    group = pattern[1:end]
+    return group.split("|") if "(" not in group else []
+
+
+def _literal_prefix(alias: str) -> str:
+    for i, ch in enumerate(alias):
+        if ch in _REGEX_META:
+            # A quantifier makes the preceding character optional
+            return alias[:max(i - 1, 0)] if ch in "?*{" else alias[:i]
+    return alias
+
+
+def _trie_regex(words: List[str]) -> str:
+    """Alternation factored on shared prefixes; stops at the shortest word on a path"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            if "" in node:
+                break
+            node = node.setdefault(ch, {})
+        else:
+            node.clear()
+            node[""] = True
+
+    def render(node: Dict) -> str:
+        if "" in node:
+            return ""
+        parts = [re.escape(ch) + render(child) for ch, child in sorted(node.items())]
+        return parts[0] if len(parts) == 1 else "(?:" + "|".join(parts) + ")"
+
+    return render(trie)
+
+
+class LabValueExtractor:
+    def __init__(self, patterns: List[str], normalize: Callable[[str], str]):
+        self.patterns = list(patterns)
+        self.normalize = normalize
+        self._compiled = [re.compile(p, re.IGNORECASE) for p in self.patterns]
+        # A failed match that is only an alias and separators up to the end of the text may
+        # still succeed when more text arrives
+        self._dangling = [
+            re.compile("(?:" + "|".join(aliases) + r")[:\s]*\Z", re.IGNORECASE) if aliases else None
+            for aliases in (_alias_alternatives(p) for p in self.patterns)
+        ]
+
+        # Patterns to try at a position, by the folded first character there
+        self._by_first_char: Dict[str, List[int]] = defaultdict(list)
+        # Patterns without a usable literal prefix are tried everywhere
+        self._always: List[int] = []
+        prefixes = set()
+        for index, pattern in enumerate(self.patterns):
+            aliases = [_literal_prefix(a) for a in _alias_alternatives(pattern)]
+            if not aliases or not all(aliases) or not all(a[0].isascii() for a in aliases):
+                self._always.append(index)
+                continue
+            for first in {_fold(a[0]) for a in aliases}:
+                self._by_first_char[first].append(index)
+            prefixes.update(a.lower() for a in aliases)
+
+        self._detector = re.compile(
+            "(?=" + _trie_regex(sorted(prefixes)) + ")" if prefixes else "(?!)",
+            re.IGNORECASE,
+        )
+
+    def extract(self, text: str) -> List[Dict]:
+        """Lab values in the same order and form as NERService's per-pattern loop"""
+        stream = self.stream()
+        stream.text = text  # nothing scanned yet; finish() scans it once
+        return stream.finish()
+
+    def stream(self, holdback: int = 256) -> "LabValueStream":
+        return LabValueStream(self, holdback)
+
+
+class LabValueStream:
+    def __init__(self, extractor: LabValueExtractor, holdback: int = 256):
+        self.extractor = extractor
+        self.holdback = max(0, holdback)
+        self.text = ""
+        self._emitted = set()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._scanned = 0  # start positions below this have been tried
+        # finditer never starts a match inside the previous match of the same pattern
+        self._next_start = [0] * len(self.extractor.patterns)
+        self._matches: List[Tuple[int, int, Tuple]] = []  # (pattern index, position, groups)
+        self._retry: List[Tuple[int, int]] = []  # (pattern index, position) waiting for more text
+
+    def feed(self, text: str) -> List[Dict]:
+        """Add the next piece of text; returns lab values for tests not returned before"""
+        self.text += text
+        self._retry_dangling()
+        self._scan(len(self.text) - self.holdback)
+        return self._new_values()
+
+    def finish(self) -> List[Dict]:
+        """Every lab value, exactly as LabValueExtractor.extract would return for the whole text"""
+        # Matches made while pieces arrived may have been cut short; only a full scan is exact
+        self._reset()
+        self._scan(len(self.text) + 1)
+        return self._values()
+
+    def _retry_dangling(self) -> None:
+        retry, self._retry = self._retry, []
+        for index, pos in retry:
+            if pos >= self._next_start[index]:
+                self._try(index, pos)
+
+    def _scan(self, stop: int) -> None:
+        start = self._scanned
+        if stop <= start:
+            return
+        extractor, text = self.extractor, self.text
+
+        def try_at(index: int, pos: int) -> None:
+            if pos >= self._next_start[index]:
+                self._try(index, pos)
+
+        for pos in (m.start() for m in extractor._detector.finditer(text, start)):
+            if pos >= stop:
+                break
+            for index in extractor._by_first_char.get(_fold(text[pos]), ()):
+                try_at(index, pos)
+        # Rare: patterns the detector cannot see get the plain scan
+        for index in extractor._always:
+            for pos in range(start, min(stop, len(text) + 1)):
+                try_at(index, pos)
+        self._scanned = stop
+
+    def _try(self, index: int, pos: int) -> None:
+        match = self.extractor._compiled[index].match(self.text, pos)
+        if match is not None:
+            self._matches.append((index, pos, match.groups()))
+            self._next_start[index] = max(match.end(), pos + 1)
+            return
+        dangling = self.extractor._dangling[index]
+        if dangling is not None and dangling.match(self.text, pos):
+            self._retry.append((index, pos))
+
+    def _new_values(self) -> List[Dict]:
+        new = [lab for lab in self._values() if lab["test"] not in self._emitted]
+        self._emitted.update(lab["test"] for lab in new)
+        return new
+
+    def _values(self) -> List[Dict]:
+        lab_values = []
+        seen_tests = set()
+        for _, _, groups in sorted(self._matches, key=lambda m: (m[0], m[1])):
+            test_name = groups[0].strip()
+            value_str = groups[1].replace(',', '')
+            unit = groups[2].strip() if len(groups) > 2 and groups[2] else ""
+
+            normalized = self.extractor.normalize(test_name)
+            if normalized not in seen_tests:
+                try:
+                    value = float(value_str)
+                except ValueError:
+                    continue
+                lab_values.append({
+                    "test": normalized,
+                    "raw_name": test_name,
+                    "value": value,
+                    "unit": unit,
+                })
+                seen_tests.add(normalized)
+        return lab_values
@@ -0,0 +1,308 @@
+"""
+Lexicon Compiler - NER vocabulary built from the knowledge base
+Lab test aliases, medication names and diagnosis keywords used to be
+hard-coded in NERService, apart from knowledge_base/lab_tests.json and
+medications.json, so a new test or brand name meant a code change and a
+restart. They are now compiled from the knowledge base:
+
+    lab_tests.json    every test gets a value pattern (name + KB units)
+    medications.json  every medication is matched by name
+    aliases.json      aliases and units per lab test, synonyms per
+                      medication and diagnosis
+
+The compiled structures (lab patterns and detector, Aho-Corasick automata)
+are pickled next to the sources, keyed by a hash of their contents, so
+workers load them instead of rebuilding. Build ahead of a deploy with
+(from backend/):
+
+    python -m services.lexicon_compiler
+
+LexiconStore checks the sources every few seconds and swaps in a new
+compiled lexicon when they change; callers that hold the previous one keep
+using it until they ask again.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.lab_extractor import LabValueExtractor
+from services.lexicon_matcher import LexiconMatcher
+
+DEFAULT_KB_DIR = Path(__file__).resolve().parent.parent / "knowledge_base"
+SOURCE_FILES = ("lab_tests.json", "medications.json", "aliases.json")
+
+# Part of the compiled lexicon's fingerprint; bump when compile() output changes
+COMPILER_VERSION = 2
+
+# Value formats for lab patterns; "count" allows a thousands separator (11,500)
+VALUE_PATTERNS = {
+    "decimal": r"(\d+\.?\d*)",
+    "count": r"(\d+[,.]?\d*)",
+}
+
+
+def knowledge_base_dir() -> Path:
+    return Path(os.environ.get("KNOWLEDGE_BASE_DIR") or DEFAULT_KB_DIR)
+
+
+def _escape(literal: str) -> str:
+    """re.escape without escaping spaces, so the lab detector sees whole alias prefixes"""
+    return re.sub(r"([\\.^$*+?{}\[\]()|])", r"\\\1", literal)
+
+
+def lab_pattern(aliases: List[str], units: List[str], value: str = "decimal") -> str:
+    """e.g. "(Sodium|Na\\+|Na)[:\\s]+(\\d+\\.?\\d*)\\s*(mEq/L|mmol/L)?" (aliases are tried in order)"""
+    pattern = "(" + "|".join(_escape(a) for a in aliases) + r")[:\s]+" + VALUE_PATTERNS[value]
+    if units:
+        pattern += r"\s*(" + "|".join(_escape(u) for u in units) + ")?"
+    return pattern
+
+
+class TestNameNormalizer:
+    """Any alias (case-insensitive) -> canonical test name; unknown names are title-cased"""
+
+    def __init__(self, names: Dict[str, str]):
+        self.names = names
+
+    def __call__(self, name: str) -> str:
+        return self.names.get(name.lower().strip(), name.title())
+
+
+class CompiledLexicon:
+    def __init__(
+        self,
+        fingerprint: str,
+        lab_patterns: List[str],
+        test_names: Dict[str, str],
+        medications: Dict[str, List[str]],
+        diagnoses: Dict[str, List[str]],
+    ):
+        self.fingerprint = fingerprint
+        self.compiled_at = time.time()
+        self.lab_patterns = lab_patterns
+        self.normalize_test_name = TestNameNormalizer(test_names)
+        # All lab patterns matched in one pass over the text
+        self.lab_extractor = LabValueExtractor(lab_patterns, self.normalize_test_name)
+        self.medications = LexiconMatcher(medications)
+        self.diagnoses = LexiconMatcher(diagnoses)
+
+    @property
+    def version(self) -> str:
+        return self.fingerprint[:16]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "compiled_at": self.compiled_at,
+            "lab_tests": len(self.lab_patterns),
+            "medications": len(self.medications),
+            "diagnoses": len(self.diagnoses),
+        }
+
+
+def _read_sources(kb_dir: Path) -> Dict[str, bytes]:
+    return {name: (kb_dir / name).read_bytes() if (kb_dir / name).exists() else b"" for name in SOURCE_FILES}
+
+
+def _fingerprint(sources: Dict[str, bytes]) -> str:
+    digest = hashlib.sha256(f"lexicon-compiler-{COMPILER_VERSION}".encode("utf-8"))
+    for name, data in sources.items():
+        digest.update(b"\0" + name.encode("utf-8") + b"\0" + data)
+    return digest.hexdigest()
+
+
+def source_fingerprint(kb_dir: Path) -> str:
+    """Hash of the compiler version and every source file's bytes"""
+    return _fingerprint(_read_sources(kb_dir))
+
+
+def compile_lexicon(kb_dir: Optional[Path] = None) -> CompiledLexicon:
+    kb_dir = Path(kb_dir or knowledge_base_dir())
+    # Hashed and parsed from the same bytes, so the fingerprint always matches the content
+    sources = _read_sources(kb_dir)
+    lab_tests, medications_kb, aliases = (
+        json.loads(sources[name]) if sources[name].strip() else {} for name in SOURCE_FILES
+    )
+
+    # Tests with aliases keep their order; tests only in lab_tests.json follow
+    lab_aliases: Dict[str, Dict[str, Any]] = dict(aliases.get("lab_tests", {}))
+    for name in lab_tests:
+        lab_aliases.setdefault(name, {})
+
+    lab_patterns = []
+    test_names: Dict[str, str] = {}
+    for name, entry in lab_aliases.items():
+        names = entry.get("aliases") or [name]
+        units = entry.get("units")
+        if units is None:
+            ranges = lab_tests.get(name, {})
+            units = list(dict.fromkeys(
+                r["unit"] for r in ranges.values() if isinstance(r, dict) and r.get("unit")
+            ))
+        lab_patterns.append(lab_pattern(names, units, entry.get("value", "decimal")))
+        for alias in [name, *names]:
+            test_names.setdefault(alias.lower().strip(), name)
+
+    medications: Dict[str, List[str]] = dict(aliases.get("medications", {}))
+    for name in medications_kb:
+        medications.setdefault(name, [])
+
+    return CompiledLexicon(
+        fingerprint=_fingerprint(sources),
+        lab_patterns=lab_patterns,
+        test_names=test_names,
+        medications=medications,
+        diagnoses=dict(aliases.get("diagnoses", {})),
+    )
+
+
+def write_compiled(lexicon: CompiledLexicon, path: Path) -> None:
+    """Pickle atomically, so a worker never reads a half-written file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".lexicon-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(lexicon, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_compiled(path: Path, fingerprint: str) -> Optional[CompiledLexicon]:
+    """The pickled lexicon if it was compiled from these exact sources (the file is our own build output)"""
+    try:
+        with open(path, "rb") as f:
+            lexicon = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[Lexicon] Ignoring unreadable compiled lexicon {path}: {e}")
+        return None
+    if not isinstance(lexicon, CompiledLexicon) or lexicon.fingerprint != fingerprint:
+        return None
+    return lexicon
+
+
+class LexiconStore:
+    def __init__(
+        self,
+        kb_dir: Optional[Path] = None,
+        compiled_path: Optional[Path] = None,
+        check_interval: float = 5.0,
+    ):
+        self.kb_dir = Path(kb_dir or knowledge_base_dir())
+        self.compiled_path = Path(compiled_path or self.kb_dir / "lexicon.pkl")
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = self._source_signature()
+        self._lexicon = self._load()
+        self._next_check = time.monotonic() + check_interval
+        self.reloads = 0
+
+    @classmethod
+    def from_env(cls) -> "LexiconStore":
+        compiled_path = os.environ.get("LEXICON_COMPILED_PATH")
+        return cls(
+            compiled_path=Path(compiled_path) if compiled_path else None,
+            check_interval=float(os.environ.get("LEXICON_RELOAD_SECONDS", "5")),
+        )
+
+    def current(self) -> CompiledLexicon:
+        """The lexicon to use for one extraction; reloaded first if the sources changed"""
+        if self.check_interval > 0 and time.monotonic() >= self._next_check:
+            self._reload_if_changed()
+        return self._lexicon
+
+    def reload(self) -> bool:
+        """Recompile or load now if the sources changed; True if a new lexicon was swapped in"""
+        with self._lock:
+            return self._swap()
+
+    def _reload_if_changed(self) -> None:
+        # One thread checks; the others keep serving the current lexicon meanwhile
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            if self._source_signature() != self._signature:
+                self._swap()
+        except Exception as e:
+            print(f"[Lexicon] Reload failed, keeping version {self._lexicon.version}: {e}")
+        finally:
+            self._lock.release()
+
+    def _swap(self) -> bool:
+        # Taken before reading, so an edit made during the load is picked up next time
+        self._signature = self._source_signature()
+        lexicon = self._load()
+        if lexicon.fingerprint == self._lexicon.fingerprint:
+            return False
+        self._lexicon = lexicon
+        self.reloads += 1
+        print(f"[Lexicon] Swapped in version {lexicon.version}")
+        return True
+
+    def _load(self) -> CompiledLexicon:
+        fingerprint = source_fingerprint(self.kb_dir)
+        lexicon = read_compiled(self.compiled_path, fingerprint)
+        if lexicon is not None:
+            return lexicon
+        start = time.perf_counter()
+        lexicon = compile_lexicon(self.kb_dir)
+        print(f"[Lexicon] Compiled version {lexicon.version} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        try:
+            write_compiled(lexicon, self.compiled_path)
+        except OSError as e:
+            print(f"[Lexicon] Could not save compiled lexicon to {self.compiled_path}: {e}")
+        return lexicon
+
+    def _source_signature(self) -> Tuple:
+        signature = []
+        for name in SOURCE_FILES:
+            try:
+                stat = (self.kb_dir / name).stat()
+                signature.append((name, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append((name, None, None))
+        return tuple(signature)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._lexicon.stats(), "reloads": self.reloads, "compiled_path": str(self.compiled_path)}
+
+
+class FixedLexicon:
+    """A LexiconStore stand-in that always serves one build (NER pool workers)"""
+
+    def __init__(self, lexicon: CompiledLexicon):
+        self.lexicon = lexicon
+
+    def current(self) -> CompiledLexicon:
+        return self.lexicon
+
+
+def main() -> None:
+    # Under "python -m" this module is __main__; pickle the classes under their importable name
+    from services.lexicon_compiler import compile_lexicon, write_compiled
+
+    kb_dir = knowledge_base_dir()
+    compiled_path = Path(os.environ.get("LEXICON_COMPILED_PATH") or kb_dir / "lexicon.pkl")
+    lexicon = compile_lexicon(kb_dir)
+    write_compiled(lexicon, compiled_path)
+    stats = lexicon.stats()
+    print(
+        f"[Lexicon] Wrote {compiled_path}: {stats['lab_tests']} lab tests, "
+        f"{stats['medications']} medications, {stats['diagnoses']} diagnoses (version {stats['version']})"
+    )
+
+
+if __name__ == "__main__":
+    main()
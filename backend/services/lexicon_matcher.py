@@ -0,0 +1,139 @@
+"""
+Lexicon Matcher - Dictionary lookup of medication and diagnosis names
+NERService used to test every keyword with a substring check over the
+lowercased report, which costs O(keywords x text), matches inside words
+("insulin" in "insulinoma") and does not scale to a formulary with tens of
+thousands of brand and generic names.
+
+LexiconMatcher compiles every synonym into one Aho-Corasick automaton, so a
+report is scanned once, in time linear in its length whatever the lexicon
+size. A hit counts only on word boundaries, and each synonym maps to its
+canonical name ("Glycomet" -> "Metformin").
+
+Matchers are built by services.lexicon_compiler from the knowledge base.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class LexiconMatcher:
+    def __init__(self, entries: Dict[str, Iterable[str]]):
+        """entries: canonical name -> synonyms (the canonical name always matches itself)"""
+        self.canonical_names: List[str] = list(entries)
+        # Automaton as flat lists indexed by state; state 0 is the root
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (term length, canonical index) for every term ending in a state, including via fail links
+        self._out: List[List[Tuple[int, int]]] = [[]]
+
+        for index, canonical in enumerate(self.canonical_names):
+            for term in {canonical, *entries[canonical]}:
+                self._add(term.lower().strip(), index)
+        self._link()
+
+    def _add(self, term: str, index: int) -> None:
+        if not term:
+            return
+        state = 0
+        for ch in term:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        if (len(term), index) not in self._out[state]:
+            self._out[state].append((len(term), index))
+
+    def _link(self) -> None:
+        """Breadth-first failure links; outputs are merged so matching never walks fail chains"""
+        queue = deque(self._goto[0].values())  # depth 1 fails to the root
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """(start, end, canonical name) of every whole-word hit in the lowercased text, overlaps included"""
+        stream = self.stream()
+        return stream.feed(text) + stream.finish()
+
+    def stream(self) -> "LexiconStream":
+        return LexiconStream(self)
+
+    def match(self, text: str) -> List[str]:
+        """Canonical names mentioned in the text, once each, in lexicon order"""
+        return self.ordered({name for _, _, name in self.find(text)})
+
+    def ordered(self, names: Iterable[str]) -> List[str]:
+        """The given canonical names in lexicon order"""
+        names = set(names)
+        return [name for name in self.canonical_names if name in names]
+
+    def __len__(self) -> int:
+        return len(self.canonical_names)
+
+
+class LexiconStream:
+    """Matches text that arrives in pieces; the automaton state carries over between them"""
+
+    def __init__(self, matcher: LexiconMatcher):
+        self.matcher = matcher
+        self.text = ""  # lowercased text so far
+        self._state = 0
+        # Hits ending at the end of the text so far wait for the next character (word boundary)
+        self._pending: List[Tuple[int, int]] = []
+
+    def feed(self, text: str) -> List[Tuple[int, int, str]]:
+        matcher = self.matcher
+        goto, fail, out = matcher._goto, matcher._fail, matcher._out
+        begin = len(self.text)
+        self.text += text.lower()
+        text = self.text
+        hits = []
+        if self._pending and len(text) > begin:
+            pending, self._pending = self._pending, []
+            if not _is_word_char(text[begin]):
+                hits = self._hits(begin, pending)
+        state = self._state
+        for pos in range(begin, len(text)):
+            ch = text[pos]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = pos + 1
+            if end == len(text):
+                self._pending = out[state]
+                continue
+            if _is_word_char(text[end]):
+                continue
+            hits.extend(self._hits(end, out[state]))
+        self._state = state
+        return hits
+
+    def finish(self) -> List[Tuple[int, int, str]]:
+        """Hits at the very end of the text"""
+        pending, self._pending = self._pending, []
+        return self._hits(len(self.text), pending)
+
+    def _hits(self, end: int, outputs: List[Tuple[int, int]]) -> List[Tuple[int, int, str]]:
+        hits = []
+        for length, index in outputs:
+            start = end - length
+            if start > 0 and _is_word_char(self.text[start - 1]):
+                continue
+            hits.append((start, end, self.matcher.canonical_names[index]))
+        return hits
@@ -3,148 +3,186 @@ NER Service - Medical Named Entity Recognition
 Extracts lab values, medications, diagnoses from medical text
 """
 
+import os
 import re
-from typing import Dict, List, Any
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional
+
+from services.lexicon_compiler import CompiledLexicon, FixedLexicon, LexiconStore
+
+# Per-process NERService in extract_entities_many pool workers
+_worker_ner: Optional["NERService"] = None
+
+
+def _init_ner_worker(lexicon: CompiledLexicon) -> None:
+    global _worker_ner
+    _worker_ner = NERService(FixedLexicon(lexicon))
+
+
+def _extract_chunk(texts: List[str]) -> List[Dict[str, Any]]:
+    """
+    Run in a pool worker. Texts travel in chunks so the pickling and IPC cost
+    is paid per chunk rather than per text.
+    """
+    lexicon = _worker_ner.lexicon_store.current()
+    return [_worker_ner._extract_entities(text, lexicon) for text in texts]
 
 
 class NERService:
-    def __init__(self):
-        # Common lab test patterns with units
-        self.lab_patterns = [
-            # Pattern: Test Name: Value Unit
-            r'(Hemoglobin|Hb|HGB)[:\s]+(\d+\.?\d*)\s*(g/dL|g/dl)?',
-            r'(WBC|White Blood Cell|Leucocytes)[:\s]+(\d+[,.]?\d*)\s*(/cumm|/mm3|cells/cumm)?',
-            r'(RBC|Red Blood Cell)[:\s]+(\d+\.?\d*)\s*(million/cumm|M/uL)?',
-            r'(Platelet|PLT)[:\s]+(\d+[,.]?\d*)\s*(/cumm|thousand/cumm)?',
-            r'(FBS|Fasting Blood Sugar|Fasting Glucose)[:\s]+(\d+\.?\d*)\s*(mg/dL|mg/dl)?',
-            r'(HbA1c|Glycated Hemoglobin)[:\s]+(\d+\.?\d*)\s*(%)?',
-            r'(SGPT|ALT|Alanine)[:\s]+(\d+\.?\d*)\s*(U/L|IU/L)?',
-            r'(SGOT|AST|Aspartate)[:\s]+(\d+\.?\d*)\s*(U/L|IU/L)?',
-            r'(Total Cholesterol|Cholesterol)[:\s]+(\d+\.?\d*)\s*(mg/dL|mg/dl)?',
-            r'(LDL|LDL Cholesterol)[:\s]+(\d+\.?\d*)\s*(mg/dL|mg/dl)?',
-            r'(HDL|HDL Cholesterol)[:\s]+(\d+\.?\d*)\s*(mg/dL|mg/dl)?',
-            r'(Triglycerides|TG)[:\s]+(\d+\.?\d*)\s*(mg/dL|mg/dl)?',
-            r'(Creatinine|Serum Creatinine)[:\s]+(\d+\.?\d*)\s*(mg/dL|mg/dl)?',
-            r'(Urea|Blood Urea)[:\s]+(\d+\.?\d*)\s*(mg/dL|mg/dl)?',
-            r'(TSH)[:\s]+(\d+\.?\d*)\s*(mIU/L|uIU/mL)?',
-            r'(Sodium|Na\+?)[:\s]+(\d+\.?\d*)\s*(mEq/L|mmol/L)?',
-            r'(Potassium|K\+?)[:\s]+(\d+\.?\d*)\s*(mEq/L|mmol/L)?',
-        ]
-
-        # Medication patterns
-        self.medication_keywords = [
-            'metformin', 'aspirin', 'atorvastatin', 'lisinopril', 'amlodipine',
-            'omeprazole', 'pantoprazole', 'paracetamol', 'ibuprofen', 'amoxicillin',
-            'azithromycin', 'ciprofloxacin', 'insulin', 'glipizide', 'ramipril',
-            'telmisartan', 'losartan', 'enalapril', 'warfarin', 'clopidogrel',
-        ]
-
-        # Disease/diagnosis keywords
-        self.disease_keywords = [
-            'diabetes', 'hypertension', 'anemia', 'hepatitis', 'thyroid',
-            'cholesterol', 'infection', 'inflammation', 'fatty liver',
-            'kidney disease', 'heart disease', 'diabetes mellitus',
-        ]
+    def __init__(self, lexicon_store: Optional[LexiconStore] = None):
+        # Lab tests, medications and diagnoses compiled from the knowledge base;
+        # swapped for a new build when the knowledge base files change
+        self.lexicon_store = lexicon_store or LexiconStore.from_env()
+        # Characters of a streamed text held back before lab matches starting there are decided
+        self.stream_holdback = int(os.environ.get("NER_STREAM_HOLDBACK", "64"))
+
+        # extract_entities_many: texts per pool task and worker processes
+        self.batch_workers = int(os.environ.get("NER_WORKERS", min(4, os.cpu_count() or 1)))
+        self.batch_chunk_size = int(os.environ.get("NER_BATCH_CHUNK", "64"))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_key = None  # (lexicon version, workers) the pool was started with
+        self._pool_lock = threading.Lock()
+
+    @property
+    def lexicon_version(self) -> str:
+        return self.lexicon_store.current().version
+
+    @property
+    def lab_patterns(self) -> List[str]:
+        return self.lexicon_store.current().lab_patterns
+
+    def close(self) -> None:
+        """Shut down the extract_entities_many worker pool"""
+        with self._pool_lock:
+            self._shutdown_pool()
+
+    def _shutdown_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
 
     def extract_entities(self, text: str) -> Dict[str, Any]:
         """Extract all medical entities from text"""
+        # One lexicon for the whole extraction, even if a reload happens meanwhile
+        return self._extract_entities(text, self.lexicon_store.current())
+
+    def extract_entities_many(
+        self,
+        texts: Iterable[str],
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        on_progress: Optional[Callable[[int, float], None]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        extract_entities for each text, yielded in input order, for corpus-scale
+        runs. Chunks of texts are spread over a process pool, with at most two
+        chunks per worker in flight, so any iterable (e.g. a file reader) is
+        consumed lazily. on_progress(texts_done, texts_per_second) is called
+        after each chunk.
+        """
+        workers = self.batch_workers if workers is None else workers
+        chunk_size = max(1, chunk_size or self.batch_chunk_size)
+        # Every text of the run uses the same lexicon, here and in the workers
+        lexicon = self.lexicon_store.current()
+        texts = iter(texts)
+        chunks = iter(lambda: list(islice(texts, chunk_size)), [])
+
+        if workers <= 1:
+            results = ([self._extract_entities(text, lexicon) for text in chunk] for chunk in chunks)
+        else:
+            results = self._extract_chunks_in_pool(chunks, lexicon, workers)
+
+        start = time.perf_counter()
+        done = 0
+        for chunk_results in results:
+            done += len(chunk_results)
+            if on_progress:
+                on_progress(done, done / max(time.perf_counter() - start, 1e-9))
+            yield from chunk_results
+        elapsed = time.perf_counter() - start
+        print(f"[NER] Extracted {done} texts in {elapsed:.2f}s "
+              f"({done / max(elapsed, 1e-9):.1f} texts/s, {max(1, workers)} worker(s))")
+
+    def _extract_chunks_in_pool(
+        self, chunks: Iterator[List[str]], lexicon: CompiledLexicon, workers: int
+    ) -> Iterator[List[Dict[str, Any]]]:
+        pool = self._get_pool(lexicon, workers)
+        in_flight = deque()
+        try:
+            for chunk in chunks:
+                in_flight.append(pool.submit(_extract_chunk, chunk))
+                if len(in_flight) >= workers * 2:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+        except Exception:
+            # A crashed worker breaks the pool; start a fresh one next time
+            with self._pool_lock:
+                if self._pool is pool:
+                    self._shutdown_pool()
+            raise
+        finally:
+            # Also reached when the caller stops iterating early
+            for future in in_flight:
+                future.cancel()
+
+    def _get_pool(self, lexicon: CompiledLexicon, workers: int) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            key = (lexicon.version, workers)
+            if self._pool is not None and self._pool_key != key:
+                # Workers hold the lexicon they were started with
+                self._shutdown_pool()
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=workers, initializer=_init_ner_worker, initargs=(lexicon,)
+                )
+                self._pool_key = key
+            return self._pool
+
+    def _extract_entities(self, text: str, lexicon: CompiledLexicon) -> Dict[str, Any]:
         return {
-            "lab_values": self._extract_lab_values(text),
-            "medications": self._extract_medications(text),
-            "diagnoses": self._extract_diagnoses(text),
+            "lab_values": self._extract_lab_values(text, lexicon),
+            "medications": self._extract_medications(text, lexicon),
+            "diagnoses": self._extract_diagnoses(text, lexicon),
             "patient_info": self._extract_patient_info(text),
         }
 
-    def _extract_lab_values(self, text: str) -> List[Dict]:
+    def extract_entities_stream(self, pages: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Extract entities from text that arrives page by page (e.g. from OCR).
+        Yields {"type": "page", "page": n, "lab_values", "medications",
+        "diagnoses"} with what was first found on each page, then
+        {"type": "final", "entities": ...}, equal to extract_entities on the
+        pages joined the way OCRService joins them.
+        """
+        stream = self.entity_stream()
+        for number, text in enumerate(pages, start=1):
+            yield {"type": "page", "page": number, **stream.feed(text)}
+        yield {"type": "final", "entities": stream.finish()}
+
+    def entity_stream(self) -> "EntityStream":
+        """Push-style form of extract_entities_stream, for callers fed by callbacks"""
+        return EntityStream(self, self.lexicon_store.current(), self.stream_holdback)
+
+    def _extract_lab_values(self, text: str, lexicon: Optional[CompiledLexicon] = None) -> List[Dict]:
         """Extract lab test names and values"""
-        lab_values = []
-        seen_tests = set()
-
-        for pattern in self.lab_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                groups = match.groups()
-                test_name = groups[0].strip()
-                value_str = groups[1].replace(',', '')
-                unit = groups[2].strip() if len(groups) > 2 and groups[2] else ""
-
-                # Normalize test name
-                normalized = self._normalize_test_name(test_name)
-
-                if normalized not in seen_tests:
-                    try:
-                        value = float(value_str)
-                        lab_values.append({
-                            "test": normalized,
-                            "raw_name": test_name,
-                            "value": value,
-                            "unit": unit,
-                        })
-                        seen_tests.add(normalized)
-                    except ValueError:
-                        continue
-
-        return lab_values
+        return (lexicon or self.lexicon_store.current()).lab_extractor.extract(text)
 
     def _normalize_test_name(self, name: str) -> str:
         """Normalize test name to standard format"""
-        name_map = {
-            'hb': 'Hemoglobin',
-            'hgb': 'Hemoglobin',
-            'hemoglobin': 'Hemoglobin',
-            'wbc': 'WBC',
-            'white blood cell': 'WBC',
-            'leucocytes': 'WBC',
-            'rbc': 'RBC',
-            'red blood cell': 'RBC',
-            'platelet': 'Platelet',
-            'plt': 'Platelet',
-            'fbs': 'FBS',
-            'fasting blood sugar': 'FBS',
-            'fasting glucose': 'FBS',
-            'hba1c': 'HbA1c',
-            'glycated hemoglobin': 'HbA1c',
-            'sgpt': 'SGPT',
-            'alt': 'SGPT',
-            'alanine': 'SGPT',
-            'sgot': 'SGOT',
-            'ast': 'SGOT',
-            'aspartate': 'SGOT',
-            'total cholesterol': 'Cholesterol',
-            'cholesterol': 'Cholesterol',
-            'ldl': 'LDL',
-            'ldl cholesterol': 'LDL',
-            'hdl': 'HDL',
-            'hdl cholesterol': 'HDL',
-            'triglycerides': 'Triglycerides',
-            'tg': 'Triglycerides',
-            'creatinine': 'Creatinine',
-            'serum creatinine': 'Creatinine',
-            'urea': 'Urea',
-            'blood urea': 'Urea',
-            'tsh': 'TSH',
-            'sodium': 'Sodium',
-            'potassium': 'Potassium',
-        }
-        return name_map.get(name.lower().strip(), name.title())
+        return self.lexicon_store.current().normalize_test_name(name)
 
-    def _extract_medications(self, text: str) -> List[str]:
+    def _extract_medications(self, text: str, lexicon: Optional[CompiledLexicon] = None) -> List[str]:
         """Extract medication names from text"""
-        found = []
-        text_lower = text.lower()
-        for med in self.medication_keywords:
-            if med in text_lower:
-                found.append(med.title())
-        return found
-
-    def _extract_diagnoses(self, text: str) -> List[str]:
+        return (lexicon or self.lexicon_store.current()).medications.match(text)
+
+    def _extract_diagnoses(self, text: str, lexicon: Optional[CompiledLexicon] = None) -> List[str]:
         """Extract diagnosis/condition mentions"""
-        found = []
-        text_lower = text.lower()
-        for disease in self.disease_keywords:
-            if disease in text_lower:
-                found.append(disease.title())
-        return found
+        return (lexicon or self.lexicon_store.current()).diagnoses.match(text)
 
     def _extract_patient_info(self, text: str) -> Dict:
         """Extract basic patient information"""
@@ -170,3 +208,54 @@ class NERService:
             info['report_date'] = date_match.group(1)
 
         return info
+
+
+class EntityStream:
+    def __init__(self, ner: NERService, lexicon: CompiledLexicon, holdback: int = 64):
+        self.ner = ner
+        self.lexicon_version = lexicon.version
+        self._lexicon = lexicon
+        self._labs = lexicon.lab_extractor.stream(holdback)
+        self._medications = lexicon.medications.stream()
+        self._diagnoses = lexicon.diagnoses.stream()
+        self._found_medications: List[str] = []
+        self._found_diagnoses: List[str] = []
+        self.pages = 0
+
+    @property
+    def text(self) -> str:
+        """The text fed so far, as OCRService joins pages"""
+        return self._labs.text
+
+    def feed(self, page_text: str) -> Dict[str, List]:
+        """Add a page; returns the entities first seen so far in the text (a match across the page break counts)"""
+        self.pages += 1
+        if not page_text:
+            # OCRService leaves empty pages out of the joined text
+            return {"lab_values": [], "medications": [], "diagnoses": []}
+        text = "\n" + page_text if self.text else page_text
+        return {
+            "lab_values": self._labs.feed(text),
+            "medications": self._new_names(self._medications.feed(text), self._found_medications),
+            "diagnoses": self._new_names(self._diagnoses.feed(text), self._found_diagnoses),
+        }
+
+    def finish(self) -> Dict[str, Any]:
+        """All entities, in the same form and order as NERService.extract_entities"""
+        self._new_names(self._medications.finish(), self._found_medications)
+        self._new_names(self._diagnoses.finish(), self._found_diagnoses)
+        return {
+            "lab_values": self._labs.finish(),
+            "medications": self._lexicon.medications.ordered(self._found_medications),
+            "diagnoses": self._lexicon.diagnoses.ordered(self._found_diagnoses),
+            "patient_info": self.ner._extract_patient_info(self.text),
+        }
+
+    @staticmethod
+    def _new_names(hits, found: List[str]) -> List[str]:
+        new = []
+        for _, _, name in hits:
+            if name not in found and name not in new:
+                new.append(name)
+        found.extend(new)
+        return new
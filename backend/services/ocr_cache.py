@@ -0,0 +1,191 @@
+"""
+OCR Cache - Content-addressed cache for OCR results
+A small in-memory LRU sits in front of a size-bounded LRU on disk.
+Keys are a SHA-256 of the file bytes plus the OCR settings, so a re-uploaded
+report is recognised no matter what name it was saved under.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+_CHUNK_SIZE = 1024 * 1024
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_CACHE_DIR = BACKEND_DIR / "ocr_cache"
+
+
+class OCRCache:
+    def __init__(
+        self,
+        cache_dir: Optional[Union[str, Path]] = DEFAULT_CACHE_DIR,
+        max_bytes: int = 256 * 1024 * 1024,
+        memory_items: int = 64,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+
+        if self.disk_enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    @classmethod
+    def from_env(cls) -> "OCRCache":
+        """Build a cache from OCR_CACHE_* environment variables"""
+        # Relative to backend/, not the working directory; empty disables the disk tier
+        cache_dir = os.environ.get("OCR_CACHE_DIR")
+        return cls(
+            cache_dir=DEFAULT_CACHE_DIR if cache_dir is None else cache_dir and BACKEND_DIR / cache_dir,
+            max_bytes=int(float(os.environ.get("OCR_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            memory_items=int(os.environ.get("OCR_CACHE_MEMORY_ITEMS", "64")),
+        )
+
+    @property
+    def disk_enabled(self) -> bool:
+        return self.cache_dir is not None and self.max_bytes > 0
+
+    def make_key(self, file_path: str, settings: Dict[str, Any]) -> str:
+        """SHA-256 over the file contents followed by the canonical settings JSON"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+        digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return self._memory[key]
+
+            value = self._read_disk(key)
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+
+            self._counters["disk_hits"] += 1
+            self._remember(key, value)
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._remember(key, value)
+            self._write_disk(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            for key in list(self._disk_index):
+                self._drop_disk(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "hits": hits,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_capacity": self.memory_items,
+                "disk_entries": len(self._disk_index),
+                "disk_bytes": self._disk_bytes,
+                "disk_capacity_bytes": self.max_bytes if self.disk_enabled else 0,
+            }
+
+    # ── Memory tier ──────────────────────────────────────────
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        if self.memory_items <= 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self._counters["memory_evictions"] += 1
+
+    # ── Disk tier ────────────────────────────────────────────
+
+    def _path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _load_disk_index(self) -> None:
+        """Rebuild LRU order from file mtimes (touched on every hit)"""
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.disk_enabled or key not in self._disk_index:
+            return None
+        path = self._path_for(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError) as e:
+            print(f"[OCR] Dropping unreadable cache entry {key[:12]}: {e}")
+            self._drop_disk(key)
+            return None
+        self._disk_index.move_to_end(key)
+        return value
+
+    def _write_disk(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.disk_enabled:
+            return
+        data = json.dumps(value).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        path = self._path_for(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[OCR] Could not write cache entry {key[:12]}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        self._disk_bytes -= self._disk_index.pop(key, 0)
+        self._disk_index[key] = len(data)
+        self._disk_bytes += len(data)
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        while self._disk_bytes > self.max_bytes and self._disk_index:
+            oldest = next(iter(self._disk_index))
+            self._drop_disk(oldest)
+            self._counters["disk_evictions"] += 1
+
+    def _drop_disk(self, key: str) -> None:
+        self._disk_bytes -= self._disk_index.pop(key, 0)
+        self._path_for(key).unlink(missing_ok=True)
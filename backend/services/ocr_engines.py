@@ -0,0 +1,412 @@
+"""
+OCR Engines - Pluggable Tesseract backends
+pytesseract spawns a tesseract process per call, writes a temp image and
+reloads the language model every time. The pool engine instead keeps
+long-lived worker processes that hold tesserocr API handles (traineddata
+already loaded) and receives images in memory over a pipe.
+"""
+
+import importlib.util
+import multiprocessing
+import os
+import queue
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+class OCREngine:
+    name = "base"
+
+    def image_to_string(self, image, lang: str) -> str:
+        raise NotImplementedError
+
+    def image_to_data(self, image, lang: str) -> Dict[str, Any]:
+        """
+        OCR with word-level confidences:
+        {"text": str, "words": [{"text", "conf", "left", "top", "width", "height"}]}
+        conf is Tesseract's 0-100 word confidence.
+        """
+        raise NotImplementedError
+
+    def detect_script(self, image) -> Dict[str, Any]:
+        """Tesseract OSD: {"script": e.g. "Devanagari", "confidence": float}"""
+        raise NotImplementedError
+
+    def health(self) -> Dict[str, Any]:
+        return {"engine": self.name}
+
+    def close(self) -> None:
+        pass
+
+
+class PytesseractEngine(OCREngine):
+    """One tesseract subprocess per call (the original behaviour)"""
+
+    name = "pytesseract"
+
+    def image_to_string(self, image, lang: str) -> str:
+        return configure_pytesseract().image_to_string(image, lang=lang)
+
+    def image_to_data(self, image, lang: str) -> Dict[str, Any]:
+        pytesseract = configure_pytesseract()
+        data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+        words = []
+        lines: "OrderedDict[tuple, List[str]]" = OrderedDict()
+        for i, text in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if conf < 0 or not text.strip():
+                continue
+            words.append({
+                "text": text,
+                "conf": conf,
+                "left": data["left"][i],
+                "top": data["top"][i],
+                "width": data["width"][i],
+                "height": data["height"][i],
+            })
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(text)
+        return {"text": "\n".join(" ".join(line) for line in lines.values()), "words": words}
+
+    def detect_script(self, image) -> Dict[str, Any]:
+        pytesseract = configure_pytesseract()
+        osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+        return {"script": osd["script"], "confidence": float(osd["script_conf"])}
+
+
+class TesserocrEngine(OCREngine):
+    """
+    In-process Tesseract via tesserocr. Keeps one initialised API handle
+    per language combination (LRU-bounded, since each holds its models),
+    plus one OSD handle for script detection.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, max_languages: Optional[int] = None, tessdata_path: Optional[str] = None):
+        if max_languages is None:
+            max_languages = int(os.environ.get("OCR_MAX_LOADED_LANGS", "4"))
+        self.max_languages = max(1, max_languages)
+        self.tessdata_path = tessdata_path or os.environ.get("TESSDATA_PREFIX")
+        self._apis: "OrderedDict[str, Any]" = OrderedDict()
+        self._osd = None
+        self._lock = threading.Lock()
+        self._loads = 0
+
+    @staticmethod
+    def is_available() -> bool:
+        return importlib.util.find_spec("tesserocr") is not None
+
+    def _api(self, lang: str):
+        if lang in self._apis:
+            self._apis.move_to_end(lang)
+            return self._apis[lang]
+        import tesserocr
+        api = tesserocr.PyTessBaseAPI(**self._api_kwargs(lang))
+        self._loads += 1
+        self._apis[lang] = api
+        while len(self._apis) > self.max_languages:
+            _, evicted = self._apis.popitem(last=False)
+            evicted.End()
+        return api
+
+    def _api_kwargs(self, lang: str) -> Dict[str, Any]:
+        kwargs = {"lang": lang}
+        if self.tessdata_path:
+            kwargs["path"] = self.tessdata_path
+        return kwargs
+
+    def image_to_string(self, image, lang: str) -> str:
+        with self._lock:
+            api = self._api(lang)
+            api.SetImage(image)
+            return api.GetUTF8Text()
+
+    def image_to_data(self, image, lang: str) -> Dict[str, Any]:
+        import tesserocr
+        with self._lock:
+            api = self._api(lang)
+            api.SetImage(image)
+            api.Recognize()
+            words = []
+            iterator = api.GetIterator()
+            level = tesserocr.RIL.WORD
+            for word in tesserocr.iterate_level(iterator, level):
+                text = word.GetUTF8Text(level)
+                if not text or not text.strip():
+                    continue
+                left, top, right, bottom = word.BoundingBox(level)
+                words.append({
+                    "text": text,
+                    "conf": float(word.Confidence(level)),
+                    "left": left,
+                    "top": top,
+                    "width": right - left,
+                    "height": bottom - top,
+                })
+            return {"text": api.GetUTF8Text(), "words": words}
+
+    def detect_script(self, image) -> Dict[str, Any]:
+        import tesserocr
+        with self._lock:
+            if self._osd is None:
+                self._osd = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.OSD_ONLY, **self._api_kwargs("osd"))
+            self._osd.SetImage(image)
+            osd = self._osd.DetectOrientationScript()
+        if not osd:
+            return {}
+        return {"script": osd["script_name"], "confidence": float(osd["script_conf"])}
+
+    def loaded_languages(self) -> List[str]:
+        return list(self._apis)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "engine": self.name,
+            "loaded_languages": self.loaded_languages(),
+            "max_languages": self.max_languages,
+            "language_loads": self._loads,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            for api in self._apis.values():
+                api.End()
+            self._apis.clear()
+            if self._osd is not None:
+                self._osd.End()
+                self._osd = None
+
+
+def configure_pytesseract():
+    import pytesseract
+    if os.name == 'nt':
+        pytesseract.pytesseract.tesseract_cmd = (
+            r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+        )
+    return pytesseract
+
+
+# ── Persistent worker pool ──────────────────────────────────
+
+def _pool_worker_main(conn, engine_factory: Callable[[], OCREngine]) -> None:
+    """Worker loop: keeps one engine alive and serves requests until told to stop"""
+    from PIL import Image
+
+    engine = engine_factory()
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            op = message[0]
+            if op == "stop":
+                break
+            try:
+                if op == "ping":
+                    result = {"pid": os.getpid(), **engine.health()}
+                else:
+                    _, method, lang, (mode, size, data), kwargs = message
+                    image = Image.frombytes(mode, size, data)
+                    args = (image,) if lang is None else (image, lang)
+                    result = getattr(engine, method)(*args, **kwargs)
+                conn.send(("ok", result))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        engine.close()
+
+
+class _PoolWorker:
+    def __init__(self, index: int, context, engine_factory):
+        self.index = index
+        self.restarts = 0
+        self.loaded_languages: List[str] = []
+        self._context = context
+        self._engine_factory = engine_factory
+        self._start()
+
+    def _start(self) -> None:
+        self.conn, child_conn = self._context.Pipe()
+        self.process = self._context.Process(
+            target=_pool_worker_main,
+            args=(child_conn, self._engine_factory),
+            name=f"tesseract-worker-{self.index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def call(self, message, timeout: float):
+        self.conn.send(message)
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"no reply within {timeout}s")
+        return self.conn.recv()
+
+    def restart(self) -> None:
+        self.stop(graceful=False)
+        self.restarts += 1
+        self._start()
+
+    def stop(self, graceful: bool = True) -> None:
+        if graceful and self.process.is_alive():
+            try:
+                self.conn.send(("stop",))
+                self.process.join(timeout=2)
+            except (OSError, EOFError):
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=2)
+        self.conn.close()
+
+
+class TesseractPoolEngine(OCREngine):
+    """
+    Fixed-size pool of long-lived Tesseract worker processes.
+    Workers start lazily on first use, are pinged by health(), and are
+    restarted (with one retry of the request) if they crash or hang.
+    """
+
+    name = "pool"
+
+    def __init__(
+        self,
+        size: int = 2,
+        timeout: float = 120.0,
+        engine_factory: Callable[[], OCREngine] = TesserocrEngine,
+    ):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._engine_factory = engine_factory
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: List[_PoolWorker] = []
+        self._idle: "queue.Queue[_PoolWorker]" = queue.Queue()
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._workers:
+            return
+        with self._start_lock:
+            if self._workers:
+                return
+            workers = [_PoolWorker(i, self._context, self._engine_factory) for i in range(self.size)]
+            for worker in workers:
+                self._idle.put(worker)
+            self._workers = workers
+            print(f"[OCR] Started {self.size} persistent Tesseract worker(s)")
+
+    def _request(self, message):
+        self._ensure_started()
+        worker = self._idle.get()
+        try:
+            for attempt in (1, 2):
+                if not worker.is_alive():
+                    worker.restart()
+                try:
+                    status, result = worker.call(message, self.timeout)
+                except (EOFError, OSError, TimeoutError) as e:
+                    print(f"[OCR] Tesseract worker {worker.index} failed ({e}); restarting")
+                    worker.restart()
+                    if attempt == 2:
+                        raise RuntimeError(f"Tesseract worker failed twice: {e}")
+                    continue
+                if status == "error":
+                    raise RuntimeError(result)
+                return result
+        finally:
+            self._idle.put(worker)
+
+    def image_to_string(self, image, lang: str) -> str:
+        return self._request(("call", "image_to_string", lang, _pack_image(image), {}))
+
+    def image_to_data(self, image, lang: str) -> Dict[str, Any]:
+        return self._request(("call", "image_to_data", lang, _pack_image(image), {}))
+
+    def detect_script(self, image) -> Dict[str, Any]:
+        return self._request(("call", "detect_script", None, _pack_image(image), {}))
+
+    def health(self) -> Dict[str, Any]:
+        """Ping idle workers, restarting any that are dead or unresponsive"""
+        workers = []
+        if self._workers:
+            checked = []
+            while True:
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    status, info = worker.call(("ping",), timeout=5)
+                    healthy = status == "ok"
+                except (EOFError, OSError, TimeoutError):
+                    healthy = False
+                worker.loaded_languages = info.get("loaded_languages", []) if healthy else []
+                if not healthy:
+                    print(f"[OCR] Tesseract worker {worker.index} unhealthy; restarting")
+                    worker.restart()
+                checked.append(worker)
+            for worker in checked:
+                self._idle.put(worker)
+            workers = [
+                {
+                    "index": w.index,
+                    "pid": w.process.pid,
+                    "alive": w.is_alive(),
+                    "restarts": w.restarts,
+                    "loaded_languages": w.loaded_languages,
+                }
+                for w in self._workers
+            ]
+        return {
+            "engine": self.name,
+            "size": self.size,
+            "started": bool(self._workers),
+            "busy": len(self._workers) - self._idle.qsize() if self._workers else 0,
+            "workers": workers,
+        }
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+        self._idle = queue.Queue()
+
+
+def _pack_image(image):
+    if image.mode not in ("1", "L", "RGB"):
+        image = image.convert("RGB")
+    return image.mode, image.size, image.tobytes()
+
+
+def mean_confidence(words: List[Dict[str, Any]]) -> Optional[float]:
+    """Character-weighted mean word confidence, or None if nothing was read"""
+    total = sum(len(w["text"]) for w in words)
+    if not total:
+        return None
+    return round(sum(w["conf"] * len(w["text"]) for w in words) / total, 2)
+
+
+def create_engine(name: str, pool_size: int = 2) -> OCREngine:
+    """
+    Build an OCR engine by name. "pool" needs tesserocr and falls back to
+    pytesseract (with a warning) when it is not installed.
+    """
+    if name == "pool":
+        if TesserocrEngine.is_available():
+            return TesseractPoolEngine(size=pool_size)
+        print("[OCR] tesserocr not installed; falling back to pytesseract engine")
+        return PytesseractEngine()
+    if name == "tesserocr":
+        if TesserocrEngine.is_available():
+            return TesserocrEngine()
+        print("[OCR] tesserocr not installed; falling back to pytesseract engine")
+        return PytesseractEngine()
+    if name == "pytesseract":
+        return PytesseractEngine()
+    raise ValueError(f"Unknown OCR engine: {name}")
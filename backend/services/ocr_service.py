@@ -5,26 +5,155 @@ If OCR fails, raises a clear error so the user knows what went wrong.
 """
 
 import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.image_preprocessing import (
+    DEFAULT_MAX_SIDE, DEFAULT_STEPS, PreprocessingPipeline, decode_image,
+)
+from services.ocr_cache import OCRCache
+from services.ocr_engines import (
+    OCREngine, PytesseractEngine, TesserocrEngine, configure_pytesseract, create_engine,
+    mean_confidence,
+)
+from services.pdf_backends import PDFBackend, open_pdf
+from services.script_detection import choose_languages, parse_languages
+
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".tiff"]
+
+# Bump whenever the preprocessing code changes so stale cache entries are ignored
+PREPROCESS_VERSION = 3
+
+# Bump whenever the shape of extract_document() results changes
+RESULT_FORMAT = 3
+
+# A PDF page whose embedded text layer has at least this many characters
+# (and is mostly real characters, not broken-font garbage) is not OCR'd
+MIN_TEXT_LAYER_CHARS = 50
+
+# Page sources that mean OCR did not run or crashed; such results are never cached
+DEGRADED_SOURCES = ("ocr_failed", "ocr_unavailable")
+
+
+def is_degraded(document: Dict[str, Any]) -> bool:
+    """True if any page of an extract_document() result is missing its OCR text"""
+    return any(page.get("source") in DEGRADED_SOURCES for page in document.get("pages", []))
+
+
+# Document and OCR engine held open by a pool worker between pages
+_worker_pdf: Optional[PDFBackend] = None
+_worker_engine: Optional[OCREngine] = None
+
+
+def _recognize(engine: OCREngine, image, lang: str, with_confidence: bool) -> Dict[str, Any]:
+    if not with_confidence:
+        return {"text": engine.image_to_string(image, lang)}
+    data = engine.image_to_data(image, lang)
+    return {"text": data["text"], "confidence": mean_confidence(data["words"])}
+
+
+def _ocr_pdf_page(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Render, preprocess and OCR a single PDF page.
+    Module-level so it can run in a process pool worker; only the page text
+    and step timings travel back to the parent, never the bitmap.
+    """
+    global _worker_pdf, _worker_engine
+    if _worker_engine is None:
+        # Pool workers are long-lived, so they can keep models loaded too
+        _worker_engine = TesserocrEngine() if task["persistent"] else PytesseractEngine()
+    file_path, backend = task["file_path"], task["backend"]
+    if _worker_pdf is None or (_worker_pdf.file_path, _worker_pdf.name) != (file_path, backend):
+        if _worker_pdf is not None:
+            _worker_pdf.close()
+        _worker_pdf = None
+        _worker_pdf = open_pdf(file_path, backend, fallback=False)
+    image, timings = task["preprocessor"].run(_worker_pdf.render_page(task["page"], task["dpi"]))
+    lang, script = choose_languages(_worker_engine, image, task["languages"])
+    result = _recognize(_worker_engine, image, lang, task["with_confidence"])
+    return {**result, "lang": lang, "script": script, "dpi": task["dpi"], "preprocess_ms": timings}
 
 
 class OCRService:
-    def __init__(self):
-        self._tesseract_available = self._check_tesseract()
-        self._pdf2image_available = self._check_pdf2image()
-        self._pillow_available = self._check_pillow()
+    def __init__(self, cache: Optional[OCRCache] = None):
+        # pytesseract (one process per call) or pool (persistent workers)
+        self.ocr_engine = create_engine(
+            os.environ.get("OCR_ENGINE", "pytesseract"),
+            pool_size=int(os.environ.get("OCR_POOL_SIZE", "2")),
+        )
+        self.engine = self.ocr_engine.name
+        # Enabled Tesseract packs; with more than English, each page gets only
+        # the pack for its detected script (see script_detection)
+        self.languages = parse_languages(os.environ.get("OCR_LANGUAGES", "eng"))
+        self.dpi = int(os.environ.get("OCR_DPI", "300"))
+
+        # "adaptive": OCR scanned pages at low_dpi first and only re-OCR pages
+        # whose mean word confidence is below min_confidence at full dpi
+        self.dpi_mode = os.environ.get("OCR_DPI_MODE", "fixed")
+        self.low_dpi = int(os.environ.get("OCR_LOW_DPI", "150"))
+        self.min_confidence = float(os.environ.get("OCR_MIN_CONFIDENCE", "85"))
+        self.cache = cache if cache is not None else OCRCache.from_env()
+
+        # Page-parallel PDF OCR: each worker rasterizes one page at a time and
+        # at most pdf_workers * pdf_window pages are in flight at once.
+        self.pdf_workers = int(os.environ.get("OCR_PDF_WORKERS", min(4, os.cpu_count() or 1)))
+        self.pdf_window = int(os.environ.get("OCR_PDF_WINDOW", "2"))
+        self._pdf_pool: Optional[ProcessPoolExecutor] = None
+        self._pdf_pool_lock = threading.Lock()  # reports may be OCR'd concurrently
+        self.pdf_backend = os.environ.get("OCR_PDF_BACKEND", "auto")
 
-        print(f"[OCR] Tesseract available: {self._tesseract_available}")
-        print(f"[OCR] pdf2image available: {self._pdf2image_available}")
-        print(f"[OCR] Pillow available:    {self._pillow_available}")
+        steps = os.environ.get("OCR_PREPROCESS_STEPS")
+        self.preprocessor = PreprocessingPipeline(
+            steps=[s.strip() for s in steps.split(",") if s.strip()] if steps else DEFAULT_STEPS,
+            target_text_height=int(os.environ.get("OCR_TARGET_TEXT_HEIGHT", "32")),
+        )
+        self.max_image_side = int(os.environ.get("OCR_MAX_IMAGE_SIDE", DEFAULT_MAX_SIDE))
+
+    # Capability probes run on first use, not at construction: the tesseract
+    # check spawns a subprocess and would slow down every worker boot
+
+    @cached_property
+    def _tesseract_available(self) -> bool:
+        available = self._check_tesseract()
+        print(f"[OCR] Tesseract available: {available}")
+        return available
+
+    @cached_property
+    def _pdf2image_available(self) -> bool:
+        available = self._check_pdf2image()
+        print(f"[OCR] pdf2image available: {available}")
+        return available
+
+    @cached_property
+    def _pillow_available(self) -> bool:
+        available = self._check_pillow()
+        print(f"[OCR] Pillow available:    {available}")
+        return available
+
+    def close(self):
+        """Shut down the PDF OCR worker pool and any persistent Tesseract workers"""
+        self._shutdown_pdf_pool()
+        self.ocr_engine.close()
+
+    def _shutdown_pdf_pool(self):
+        with self._pdf_pool_lock:
+            if self._pdf_pool is not None:
+                self._pdf_pool.shutdown(cancel_futures=True)
+                self._pdf_pool = None
+
+    def engine_health(self) -> Dict[str, Any]:
+        """Health of the OCR engine (worker liveness and restarts for the pool)"""
+        return self.ocr_engine.health()
 
     def _check_tesseract(self) -> bool:
+        if not isinstance(self.ocr_engine, PytesseractEngine):
+            return True  # tesserocr-backed engines were checked in create_engine
         try:
-            import pytesseract
-            if os.name == 'nt':
-                pytesseract.pytesseract.tesseract_cmd = (
-                    r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-                )
+            pytesseract = configure_pytesseract()
             pytesseract.get_tesseract_version()
             return True
         except Exception as e:
@@ -50,20 +179,53 @@ class OCRService:
         Extract text from a medical report file.
         NEVER returns fake sample data - always reads the actual file.
         """
+        return self.extract_document(file_path)["text"]
+
+    def extract_document(
+        self,
+        file_path: str,
+        on_page: Optional[Callable[[int, int], None]] = None,
+        on_page_text: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Extract text plus per-page provenance:
+        {"text": str, "pages": [{"page": 1, "source": "text_layer", "text": str}, ...]}
+        source is one of text_layer, ocr, ocr_failed or ocr_unavailable.
+        on_page(pages_done, pages_total) is called as pages finish.
+        on_page_text(page) is called with each page, in page order, once its
+        text is final, so text consumers can start before the last page.
+        """
         path = Path(file_path)
         ext = path.suffix.lower()
 
         if not path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
 
+        if ext != ".pdf" and ext not in IMAGE_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {ext}")
+
+        cache_key = self.cache.make_key(file_path, self._cache_settings())
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            print(f"[OCR] Cache hit: {file_path}")
+            if on_page:
+                on_page(len(cached["pages"]), len(cached["pages"]))
+            for page in cached["pages"] if on_page_text else ():
+                on_page_text(page)
+            return cached
+
         print(f"[OCR] Processing: {file_path} (type: {ext})")
 
         if ext == ".pdf":
-            text = self._extract_from_pdf(file_path)
-        elif ext in [".jpg", ".jpeg", ".png", ".bmp", ".tiff"]:
-            text = self._extract_from_image(file_path)
+            pages = self._extract_from_pdf(file_path, on_page, on_page_text)
         else:
-            raise ValueError(f"Unsupported file type: {ext}")
+            pages = [{"page": 1, "source": "ocr", **self._extract_from_image(file_path)}]
+            if on_page:
+                on_page(1, 1)
+            if on_page_text:
+                on_page_text(pages[0])
+
+        text = "\n".join(p["text"] for p in pages if p["text"])
 
         if not text or len(text.strip()) < 10:
             raise RuntimeError(
@@ -73,52 +235,195 @@ class OCRService:
             )
 
         print(f"[OCR] Successfully extracted {len(text)} characters")
-        return text
-
-    def _extract_from_pdf(self, file_path: str) -> str:
-        text = self._try_pypdf2(file_path)
-        if text and len(text.strip()) > 50:
-            print("[OCR] PDF text extracted via PyPDF2")
-            return text
-        if self._pdf2image_available and self._tesseract_available:
-            return self._pdf_ocr(file_path)
-        if not self._tesseract_available:
-            raise RuntimeError(
-                "Tesseract OCR not installed. "
-                "Download from: https://github.com/UB-Mannheim/tesseract/wiki"
-            )
-        return ""
+        document = {"text": text, "pages": pages}
+        if is_degraded(document):
+            # A crash or missing Tesseract is not a property of the file; try again next time
+            print(f"[OCR] Not caching {file_path}: some pages were not OCR'd")
+        else:
+            self.cache.put(cache_key, document)
+        return document
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters for sizing the OCR cache"""
+        return self.cache.stats()
 
-    def _try_pypdf2(self, file_path: str) -> str:
+    def _cache_settings(self) -> Dict[str, Any]:
+        """Everything that can change the OCR output for the same file bytes"""
+        return {
+            "engine": self.engine,
+            "languages": self.languages,
+            "dpi": self.dpi,
+            "dpi_mode": self.dpi_mode,
+            "low_dpi": self.low_dpi if self.adaptive_dpi else None,
+            "min_confidence": self.min_confidence if self.adaptive_dpi else None,
+            "pdf_backend": self.pdf_backend,
+            "preprocess": {"version": PREPROCESS_VERSION, **self.preprocessor.fingerprint()},
+            "max_image_side": self.max_image_side,
+            "format": RESULT_FORMAT,
+        }
+
+    @property
+    def adaptive_dpi(self) -> bool:
+        return self.dpi_mode == "adaptive"
+
+    def _extract_from_pdf(
+        self,
+        file_path: str,
+        on_page: Optional[Callable[[int, int], None]] = None,
+        on_page_text: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Route each page separately: keep a usable text layer, OCR the rest"""
         try:
-            import PyPDF2
-            text_parts = []
-            with open(file_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                for page in reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text_parts.append(page_text)
-            return "\n".join(text_parts)
+            doc = open_pdf(file_path, self.pdf_backend)
         except Exception as e:
-            print(f"[OCR] PyPDF2 failed: {e}")
-            return ""
+            print(f"[OCR] Could not read PDF: {e}")
+            return []
+
+        with doc:
+            pages = []
+            for page_number in range(1, doc.page_count() + 1):
+                layer_text = doc.page_text(page_number)
+                if self._has_usable_text_layer(layer_text):
+                    pages.append({"page": page_number, "source": "text_layer", "text": layer_text})
+                else:
+                    pages.append({"page": page_number, "source": "ocr", "text": ""})
+
+            ocr_pages = [p for p in pages if p["source"] == "ocr"]
+            done = len(pages) - len(ocr_pages)
+            if on_page:
+                on_page(done, len(pages))
 
-    def _pdf_ocr(self, file_path: str) -> str:
+            # Pages go to on_page_text in order; text-layer pages are final now, OCR'd
+            # ones when read (in adaptive mode, after the high-DPI pass at the end)
+            final = {p["page"] for p in pages if p["source"] == "text_layer"}
+            released = 0
+
+            def release():
+                nonlocal released
+                while on_page_text and released < len(pages) and pages[released]["page"] in final:
+                    on_page_text(pages[released])
+                    released += 1
+
+            def page_done(page_number: int):
+                nonlocal done
+                done += 1
+                if on_page:
+                    on_page(done, len(pages))
+                if not self.adaptive_dpi:
+                    final.add(page_number)
+                    release()
+
+            release()
+
+            if ocr_pages:
+                if doc.can_render and self._tesseract_available:
+                    self._pdf_ocr(doc, ocr_pages, page_done)
+                elif not self._tesseract_available and len(ocr_pages) == len(pages):
+                    raise RuntimeError(
+                        "Tesseract OCR not installed. "
+                        "Download from: https://github.com/UB-Mannheim/tesseract/wiki"
+                    )
+                else:
+                    for page in ocr_pages:
+                        page["source"] = "ocr_unavailable"
+
+            final.update(p["page"] for p in pages)
+            release()
+
+        print(f"[OCR] PDF routing ({doc.name}): {len(pages) - len(ocr_pages)} text-layer page(s), "
+              f"{len(ocr_pages)} OCR page(s)")
+        return pages
+
+    def _has_usable_text_layer(self, text: str) -> bool:
+        stripped = "".join(text.split())
+        if len(stripped) < MIN_TEXT_LAYER_CHARS:
+            return False
+        readable = sum(1 for c in stripped if c.isalnum())
+        return readable / len(stripped) >= 0.5
+
+    def _pdf_ocr(
+        self, doc: PDFBackend, pages: List[Dict[str, Any]], page_done: Optional[Callable[[int], None]] = None
+    ) -> None:
+        """OCR the given pages in place, in page order"""
+        first_dpi = self.low_dpi if self.adaptive_dpi else self.dpi
+        pending = {p["page"]: p for p in pages}
         try:
-            from pdf2image import convert_from_path
-            import pytesseract
-            pages = convert_from_path(file_path, dpi=300)
-            text_parts = []
-            for i, page in enumerate(pages):
-                print(f"[OCR] Page {i+1}/{len(pages)}...")
-                text_parts.append(pytesseract.image_to_string(page, lang='eng'))
-            return "\n".join(text_parts)
+            for page_number, result in self._ocr_pdf_pages(doc, list(pending), first_dpi, self.adaptive_dpi):
+                print(f"[OCR] Page {page_number} OCR'd at {first_dpi} DPI "
+                      f"({len(pending)} page(s) need OCR)")
+                pending.pop(page_number).update(result)
+                if page_done:
+                    page_done(page_number)
         except Exception as e:
             print(f"[OCR] PDF OCR failed: {e}")
-            return ""
+            self._shutdown_pdf_pool()
+            for page in pending.values():
+                page["source"] = "ocr_failed"
+
+        if self.adaptive_dpi:
+            self._reocr_low_confidence(doc, [p for p in pages if p["source"] == "ocr"])
+
+    def _reocr_low_confidence(self, doc: PDFBackend, pages: List[Dict[str, Any]]) -> None:
+        """Second pass of adaptive mode: re-OCR weak pages at full DPI, keep the better read"""
+        low = {
+            p["page"]: p for p in pages
+            if p.get("confidence") is None or p["confidence"] < self.min_confidence
+        }
+        print(f"[OCR] {len(pages) - len(low)} page(s) accepted at {self.low_dpi} DPI, "
+              f"{len(low)} re-OCR'd at {self.dpi} DPI")
+        if not low:
+            return
+        try:
+            for page_number, result in self._ocr_pdf_pages(doc, list(low), self.dpi, True):
+                page = low[page_number]
+                if page.get("confidence") is None or (result["confidence"] or 0) >= page["confidence"]:
+                    page.update(result)
+        except Exception as e:
+            print(f"[OCR] High-DPI pass failed, keeping low-DPI text: {e}")
+            self._shutdown_pdf_pool()
+
+    def _ocr_pdf_pages(
+        self, doc: PDFBackend, page_numbers: Iterable[int], dpi: int, with_confidence: bool = False
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (page_number, {"text", "dpi", ...}) in page order, one page rendered at a time"""
+        page_numbers = list(page_numbers)
+
+        if self.pdf_workers <= 1 or len(page_numbers) <= 1:
+            # Render from the document we already have open
+            for page_number in page_numbers:
+                result = self._ocr_page(doc.render_page(page_number, dpi), with_confidence)
+                yield page_number, {**result, "dpi": dpi}
+            return
+
+        pool = self._get_pdf_pool()
+        max_in_flight = max(1, self.pdf_workers * self.pdf_window)
+        in_flight = deque()
+        for page_number in page_numbers:
+            task = {
+                "file_path": doc.file_path,
+                "backend": doc.name,
+                "page": page_number,
+                "dpi": dpi,
+                "languages": self.languages,
+                "preprocessor": self.preprocessor,
+                "persistent": not isinstance(self.ocr_engine, PytesseractEngine),
+                "with_confidence": with_confidence,
+            }
+            in_flight.append((page_number, pool.submit(_ocr_pdf_page, task)))
+            if len(in_flight) >= max_in_flight:
+                number, future = in_flight.popleft()
+                yield number, future.result()
+        while in_flight:
+            number, future = in_flight.popleft()
+            yield number, future.result()
 
-    def _extract_from_image(self, file_path: str) -> str:
+    def _get_pdf_pool(self) -> ProcessPoolExecutor:
+        with self._pdf_pool_lock:
+            if self._pdf_pool is None:
+                self._pdf_pool = ProcessPoolExecutor(max_workers=self.pdf_workers)
+            return self._pdf_pool
+
+    def _extract_from_image(self, file_path: str) -> Dict[str, Any]:
         if not self._pillow_available:
             raise RuntimeError("Pillow not installed. Run: pip install Pillow")
         if not self._tesseract_available:
@@ -129,27 +434,39 @@ class OCRService:
                 "Linux: sudo apt install tesseract-ocr"
             )
         try:
-            import pytesseract
-            from PIL import Image, ImageEnhance, ImageFilter
-
-            if os.name == 'nt':
-                pytesseract.pytesseract.tesseract_cmd = (
-                    r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-                )
-
-            img = Image.open(file_path)
-            img = self._preprocess_image(img)
-            text = pytesseract.image_to_string(img, lang='eng')
-            return text
+            img, decode_info = decode_image(
+                file_path, self.preprocessor.target_text_height, self.max_image_side
+            )
+            print(f"[OCR] Decoded {decode_info['original_size']} -> {decode_info['decoded_size']} "
+                  f"in {decode_info['decode_ms']} ms")
+            return {**self._ocr_page(img, self.adaptive_dpi), "decode": decode_info}
         except Exception as e:
             raise RuntimeError(f"OCR failed on image: {str(e)}")
 
+    def _ocr_page(self, img, with_confidence: bool = False) -> Dict[str, Any]:
+        img, timings = self._preprocess_image(img)
+        lang, script = self._choose_languages(img)
+        if with_confidence:
+            data = self._ocr_image_data(img, lang)
+            result = {"text": data["text"], "confidence": mean_confidence(data["words"])}
+        else:
+            result = {"text": self._ocr_image(img, lang)}
+        return {**result, "lang": lang, "script": script, "preprocess_ms": timings}
+
+    def _choose_languages(self, img) -> Tuple[str, Optional[str]]:
+        lang, script = choose_languages(self.ocr_engine, img, self.languages)
+        if script:
+            print(f"[OCR] Detected {script} script; using lang={lang}")
+        return lang, script
+
+    def _ocr_image(self, img, lang: str) -> str:
+        return self.ocr_engine.image_to_string(img, lang)
+
+    def _ocr_image_data(self, img, lang: str) -> Dict[str, Any]:
+        return self.ocr_engine.image_to_data(img, lang)
+
     def _preprocess_image(self, img):
-        """Enhance image for better OCR accuracy"""
-        from PIL import ImageEnhance, ImageFilter
-        if img.mode not in ('RGB', 'L'):
-            img = img.convert('RGB')
-        img = img.convert('L')                          # Grayscale
-        img = ImageEnhance.Contrast(img).enhance(2.0)  # Boost contrast
-        img = img.filter(ImageFilter.SHARPEN)           # Sharpen edges
-        return img
+        """Run the configured preprocessing pipeline; returns (image, {step: ms})"""
+        img, timings = self.preprocessor.run(img)
+        print(f"[OCR] Preprocessing: {sum(timings.values()):.1f} ms {timings}")
+        return img, timings
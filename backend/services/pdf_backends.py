@@ -0,0 +1,198 @@
+"""
+PDF Backends - Pluggable text extraction and page rendering for PDFs
+PyMuPDF is preferred: it extracts text much faster than PyPDF2 and renders
+pages from the same parsed document, so scanned pages are not re-parsed
+by poppler. PyPDF2 (+ pdf2image for rendering) remains the fallback, and
+a poppler-only backend keeps OCR working on PDFs PyPDF2 cannot parse.
+"""
+
+from typing import Dict, List, Optional, Type
+
+
+def _import_fitz():
+    # PyMuPDF >= 1.24.3 ships as "pymupdf"; older releases only as "fitz"
+    try:
+        import pymupdf
+        return pymupdf
+    except ImportError:
+        import fitz
+        return fitz
+
+
+class PDFBackend:
+    """Open PDF document. Page numbers are 1-based throughout."""
+
+    name = "base"
+    can_extract_text = False
+    can_render = False
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    @classmethod
+    def is_available(cls) -> bool:
+        return False
+
+    def page_count(self) -> int:
+        raise NotImplementedError
+
+    def page_text(self, page_number: int) -> str:
+        return ""
+
+    def render_page(self, page_number: int, dpi: int):
+        """Render a page to a grayscale PIL image"""
+        raise NotImplementedError(f"{self.name} backend cannot render pages")
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "PDFBackend":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PyMuPDFBackend(PDFBackend):
+    name = "pymupdf"
+    can_extract_text = True
+    can_render = True
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self._doc = _import_fitz().open(file_path)
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            _import_fitz()
+            return True
+        except ImportError:
+            return False
+
+    def page_count(self) -> int:
+        return self._doc.page_count
+
+    def page_text(self, page_number: int) -> str:
+        try:
+            return self._doc[page_number - 1].get_text() or ""
+        except Exception as e:
+            print(f"[OCR] PyMuPDF could not read text of page {page_number}: {e}")
+            return ""
+
+    def render_page(self, page_number: int, dpi: int):
+        from PIL import Image
+        fitz = _import_fitz()
+        pixmap = self._doc[page_number - 1].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        return Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+
+    def close(self) -> None:
+        self._doc.close()
+
+
+class PopplerBackend(PDFBackend):
+    """No text extraction; renders pages one at a time with pdf2image"""
+
+    name = "poppler"
+    can_render = True
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self._page_count: Optional[int] = None
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            import pdf2image
+            return True
+        except ImportError:
+            return False
+
+    def page_count(self) -> int:
+        if self._page_count is None:
+            from pdf2image import pdfinfo_from_path
+            self._page_count = int(pdfinfo_from_path(self.file_path)["Pages"])
+        return self._page_count
+
+    def render_page(self, page_number: int, dpi: int):
+        from pdf2image import convert_from_path
+        images = convert_from_path(
+            self.file_path, dpi=dpi, first_page=page_number, last_page=page_number,
+            grayscale=True,
+        )
+        if not images:
+            raise RuntimeError(f"poppler returned no image for page {page_number}")
+        return images[0]
+
+
+class PyPDF2Backend(PopplerBackend):
+    name = "pypdf2"
+    can_extract_text = True
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        import PyPDF2
+        self._file = open(file_path, "rb")
+        try:
+            self._reader = PyPDF2.PdfReader(self._file)
+            self._page_count = len(self._reader.pages)
+        except Exception:
+            self._file.close()
+            raise
+        # Rendering goes through pdf2image, which may not be installed
+        self.can_render = PopplerBackend.is_available()
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            import PyPDF2
+            return True
+        except ImportError:
+            return False
+
+    def page_text(self, page_number: int) -> str:
+        try:
+            return self._reader.pages[page_number - 1].extract_text() or ""
+        except Exception as e:
+            print(f"[OCR] PyPDF2 could not read text of page {page_number}: {e}")
+            return ""
+
+    def close(self) -> None:
+        self._file.close()
+
+
+PDF_BACKENDS: Dict[str, Type[PDFBackend]] = {
+    "pymupdf": PyMuPDFBackend,
+    "pypdf2": PyPDF2Backend,
+    "poppler": PopplerBackend,
+}
+
+
+def available_backends() -> List[str]:
+    return [name for name, cls in PDF_BACKENDS.items() if cls.is_available()]
+
+
+def open_pdf(file_path: str, preferred: str = "auto", fallback: bool = True) -> PDFBackend:
+    """
+    Open a PDF with the preferred backend ("auto" = fastest available).
+    With fallback, backends that are missing or fail to parse the file are
+    skipped in order pymupdf -> pypdf2 -> poppler.
+    """
+    if preferred == "auto":
+        order = list(PDF_BACKENDS)
+    elif preferred in PDF_BACKENDS:
+        order = [preferred] + ([n for n in PDF_BACKENDS if n != preferred] if fallback else [])
+    else:
+        raise ValueError(f"Unknown PDF backend: {preferred}")
+
+    errors = []
+    for name in order:
+        backend_cls = PDF_BACKENDS[name]
+        if not backend_cls.is_available():
+            errors.append(f"{name}: not installed")
+            continue
+        try:
+            return backend_cls(file_path)
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+    raise RuntimeError(f"Could not open PDF ({'; '.join(errors)})")
@@ -0,0 +1,117 @@
+"""
+Pipeline Executor - Runs blocking report analysis off the event loop
+OCR, NER, risk and simplification are synchronous and can take seconds on a
+scanned PDF. Running them inside an async route stalls every other request
+on the worker, so they go to a small thread pool instead. Admission control
+caps running + queued jobs; beyond that callers get ExecutorBusy and the
+route answers 503 with a Retry-After estimate.
+
+The workers count is also the host-wide limit on concurrent analyses:
+background jobs and batch OCR, which run on their own threads, take one of
+the same slots through call(), so every path shares one OCR budget.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Analysis queue is full; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PipelineExecutor:
+    def __init__(self, workers: int = 2, max_queue: int = 8):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pipeline")
+        # Held while fn runs, by pool threads and call() alike
+        self._slots = threading.Semaphore(self.workers)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        # Recent queue waits and run times, for stats and Retry-After
+        self._waits = deque(maxlen=200)
+        self._run_times = deque(maxlen=200)
+
+    @classmethod
+    def from_env(cls) -> "PipelineExecutor":
+        return cls(
+            workers=int(os.environ.get("PIPELINE_WORKERS", "2")),
+            max_queue=int(os.environ.get("PIPELINE_MAX_QUEUE", "8")),
+        )
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn in the pool and await its result; raises ExecutorBusy when full"""
+        with self._lock:
+            if self._queued + self._running >= self.workers + self.max_queue:
+                self._counters["rejected"] += 1
+                raise ExecutorBusy(self._retry_after())
+            self._queued += 1
+            self._counters["submitted"] += 1
+        submitted = time.perf_counter()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool, lambda: self._execute(submitted, fn, args, kwargs)
+        )
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn on the calling thread once a slot is free. For work already
+        admitted elsewhere (background jobs, batch OCR): it waits rather than
+        raising ExecutorBusy, and counts as queued meanwhile, so /process
+        callers see the load.
+        """
+        with self._lock:
+            self._queued += 1
+            self._counters["submitted"] += 1
+        return self._execute(time.perf_counter(), fn, args, kwargs)
+
+    def _execute(self, submitted: float, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        self._slots.acquire()
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._waits.append(started - submitted)
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._run_times.append(time.perf_counter() - started)
+                self._counters["completed" if ok else "failed"] += 1
+            self._slots.release()
+
+    def _retry_after(self) -> int:
+        """Seconds until a slot is likely free: queued jobs / workers * mean run time"""
+        mean_run = sum(self._run_times) / len(self._run_times) if self._run_times else 1.0
+        return max(1, math.ceil((self._queued / self.workers + 1) * mean_run))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                **self._counters,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self._queued,
+                "wait_ms_mean": round(1000 * sum(waits) / len(waits), 2) if waits else 0.0,
+                "wait_ms_p95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+                "run_ms_mean": round(1000 * sum(self._run_times) / len(self._run_times), 2)
+                if self._run_times else 0.0,
+            }
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
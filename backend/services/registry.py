@@ -0,0 +1,184 @@
+"""
+Service Registry - One lazily created instance of each service per process
+Routers used to build their own services at import time, so every worker
+paid for OCR engine setup, knowledge-base loading and capability probes
+before serving a request, even for routes that never touch them. Services
+are now created on first use and shared by all routers.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _ocr():
+    from services.ocr_service import OCRService
+    return OCRService()
+
+
+def _ner():
+    from services.ner_service import NERService
+    return NERService()
+
+
+def _risk():
+    from services.risk_assessment import RiskAssessmentService
+    return RiskAssessmentService()
+
+
+def _simplification():
+    from services.simplification_service import SimplificationService
+    return SimplificationService()
+
+
+def _translation():
+    from services.translation_service import TranslationService
+    return TranslationService()
+
+
+def _uploads():
+    from services.blob_store import BlobStore
+    return BlobStore.from_env()
+
+
+def _reports():
+    from services.report_store import ReportStore
+    return ReportStore.from_env()
+
+
+def _stage_cache():
+    from services.stage_cache import StageCache
+    return StageCache.from_env()
+
+
+def _pipeline():
+    from services.pipeline_executor import PipelineExecutor
+    return PipelineExecutor.from_env()
+
+
+def _jobs():
+    from services.job_queue import JobQueue
+    return JobQueue.from_env()
+
+
+DEFAULT_FACTORIES: Dict[str, Callable[[], Any]] = {
+    "ocr": _ocr,
+    "ner": _ner,
+    "risk": _risk,
+    "simplification": _simplification,
+    "translation": _translation,
+    "uploads": _uploads,
+    "stage_cache": _stage_cache,
+    "reports": _reports,
+    "pipeline": _pipeline,
+    "jobs": _jobs,
+}
+
+
+class ServiceRegistry:
+    def __init__(self, factories: Optional[Dict[str, Callable[[], Any]]] = None):
+        self._factories = dict(factories if factories is not None else DEFAULT_FACTORIES)
+        self._instances: Dict[str, Any] = {}
+        self._init_ms: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if name not in self._factories:
+            raise KeyError(f"Unknown service: {name}")
+        with self._lock:
+            # Another thread may have built it while we waited
+            if name not in self._instances:
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self._init_ms[name] = round((time.perf_counter() - start) * 1000, 2)
+                print(f"[Services] Initialized {name} in {self._init_ms[name]} ms")
+            return self._instances[name]
+
+    @property
+    def ocr(self):
+        return self.get("ocr")
+
+    @property
+    def ner(self):
+        return self.get("ner")
+
+    @property
+    def risk(self):
+        return self.get("risk")
+
+    @property
+    def simplification(self):
+        return self.get("simplification")
+
+    @property
+    def translation(self):
+        return self.get("translation")
+
+    @property
+    def uploads(self):
+        return self.get("uploads")
+
+    @property
+    def stage_cache(self):
+        return self.get("stage_cache")
+
+    @property
+    def reports(self):
+        return self.get("reports")
+
+    @property
+    def pipeline(self):
+        return self.get("pipeline")
+
+    @property
+    def jobs(self):
+        return self.get("jobs")
+
+    def preload(self, names: Optional[List[str]] = None) -> None:
+        """Create services up front (all of them if names is None)"""
+        for name in names if names is not None else list(self._factories):
+            self.get(name)
+
+    def initialized(self) -> List[str]:
+        return list(self._instances)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "initialized": self.initialized(),
+            "init_ms": dict(self._init_ms),
+            "available": list(self._factories),
+        }
+
+    def close(self) -> None:
+        """Release worker pools held by services that have them"""
+        with self._lock:
+            for name, instance in self._instances.items():
+                close = getattr(instance, "close", None)
+                if close is not None:
+                    try:
+                        close()
+                    except Exception as e:
+                        print(f"[Services] Error closing {name}: {e}")
+            self._instances.clear()
+            self._init_ms.clear()
+
+
+registry = ServiceRegistry()
+
+
+def preload_from_env() -> None:
+    """
+    SERVICES_PRELOAD=all (or e.g. "ner,risk") warms services at startup for
+    deployments that prefer a slower boot over a slower first request.
+    """
+    value = os.environ.get("SERVICES_PRELOAD", "").strip()
+    names = None if value == "all" else [n.strip() for n in value.split(",") if n.strip()]
+    # A durable job store resumes interrupted jobs as soon as the worker is up
+    if os.environ.get("JOB_BACKEND", "memory") != "memory" and names is not None and "jobs" not in names:
+        names.append("jobs")
+    if names != []:
+        registry.preload(names)
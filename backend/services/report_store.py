@@ -0,0 +1,290 @@
+"""
+Report Store - Server-side history of processed reports
+Results used to live only in the HTTP response and the browser's
+localStorage, so every dashboard view depended on the client and every
+server-side lookup meant re-running the pipeline. Each processed report is
+now saved with its ProcessReportResponse and the structured lab values,
+indexed by report id, user, test name and report date.
+
+Per-user trend aggregates (services.trend_engine) are updated in the same
+transaction as each saved report.
+
+Uses SQLAlchemy (SQLite by default, with a pooled engine); any database URL
+SQLAlchemy supports works through REPORT_DB_URL.
+"""
+
+import os
+import re
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import (
+    JSON, Date, DateTime, Float, ForeignKey, Index, Integer, String, UniqueConstraint, create_engine, event, select,
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship, sessionmaker
+
+from services.trend_engine import TrendState
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d-%m-%y", "%m/%d/%Y", "%m-%d-%Y")
+
+
+def parse_report_date(value: Optional[str]) -> Optional[date]:
+    """
+    Parse the date NERService finds after "Date:". Day-first is tried before
+    month-first, matching how Indian lab reports print dates.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class StoredReport(Base):
+    __tablename__ = "reports"
+
+    report_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[Optional[str]] = mapped_column(String(255), index=True)
+    # Date printed on the report, or the processing date when none was found
+    report_date: Mapped[date] = mapped_column(Date, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+    risk_level: Mapped[str] = mapped_column(String(16))
+    language: Mapped[str] = mapped_column(String(8))
+    response: Mapped[Dict[str, Any]] = mapped_column(JSON)
+
+    lab_values: Mapped[List["StoredLabValue"]] = relationship(
+        back_populates="report", cascade="all, delete-orphan", order_by="StoredLabValue.id"
+    )
+
+    __table_args__ = (Index("reports_user_date", "user_id", "report_date"),)
+
+
+class StoredLabValue(Base):
+    __tablename__ = "lab_values"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    report_id: Mapped[str] = mapped_column(ForeignKey("reports.report_id", ondelete="CASCADE"), index=True)
+    user_id: Mapped[Optional[str]] = mapped_column(String(255))
+    report_date: Mapped[date] = mapped_column(Date)
+    test: Mapped[str] = mapped_column(String(64), index=True)  # NERService normalized name
+    raw_name: Mapped[str] = mapped_column(String(64))
+    value: Mapped[float] = mapped_column(Float)
+    unit: Mapped[str] = mapped_column(String(32))
+    status: Mapped[str] = mapped_column(String(16))  # normal, low, high
+
+    report: Mapped[StoredReport] = relationship(back_populates="lab_values")
+
+    __table_args__ = (Index("lab_values_user_test_date", "user_id", "test", "report_date"),)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "report_id": self.report_id,
+            "report_date": self.report_date.isoformat(),
+            "test": self.test,
+            "raw_name": self.raw_name,
+            "value": self.value,
+            "unit": self.unit,
+            "status": self.status,
+        }
+
+
+class LabTrend(Base):
+    __tablename__ = "lab_trends"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String(255))
+    test: Mapped[str] = mapped_column(String(64))
+    state: Mapped[Dict[str, Any]] = mapped_column(JSON)  # TrendState.to_dict()
+    updated_at: Mapped[datetime] = mapped_column(DateTime)
+
+    __table_args__ = (UniqueConstraint("user_id", "test", name="lab_trends_user_test"),)
+
+
+class ReportStore:
+    def __init__(self, url: str = "sqlite:///reports.db", pool_size: int = 5, max_overflow: int = 10):
+        self.url = url
+        engine_kwargs: Dict[str, Any] = {"pool_pre_ping": True}
+        if url.startswith("sqlite"):
+            # Sessions are used from pipeline, job and batch threads
+            engine_kwargs["connect_args"] = {"check_same_thread": False}
+        if ":memory:" not in url and url != "sqlite://":
+            engine_kwargs.update(pool_size=pool_size, max_overflow=max_overflow)
+        self.engine = create_engine(url, **engine_kwargs)
+        if url.startswith("sqlite"):
+            event.listen(self.engine, "connect", _sqlite_pragmas)
+        Base.metadata.create_all(self.engine)
+        self._sessions = sessionmaker(self.engine, expire_on_commit=False)
+
+    @classmethod
+    def from_env(cls) -> "ReportStore":
+        return cls(
+            url=os.environ.get("REPORT_DB_URL", "sqlite:///reports.db"),
+            pool_size=int(os.environ.get("REPORT_DB_POOL_SIZE", "5")),
+            max_overflow=int(os.environ.get("REPORT_DB_MAX_OVERFLOW", "10")),
+        )
+
+    def save(
+        self,
+        report_id: str,
+        response: Dict[str, Any],
+        lab_values: List[Dict[str, Any]],
+        user_id: Optional[str] = None,
+        report_date: Optional[date] = None,
+        content_hash: Optional[str] = None,
+    ) -> None:
+        """Insert or replace a processed report and its lab values"""
+        now = datetime.now()
+        report_date = report_date or now.date()
+        with self._sessions.begin() as session:
+            report = session.get(StoredReport, report_id)
+            # Re-processing a report replaces its values; those trends are rebuilt
+            stale = set()
+            if report is None:
+                report = StoredReport(report_id=report_id, created_at=now)
+                session.add(report)
+            else:
+                stale = {(lab.user_id, lab.test) for lab in report.lab_values}
+            report.user_id = user_id
+            report.report_date = report_date
+            report.content_hash = content_hash
+            report.risk_level = response.get("risk_level", "")
+            report.language = response.get("language", "en")
+            report.response = response
+            report.lab_values = [
+                StoredLabValue(
+                    user_id=user_id,
+                    report_date=report_date,
+                    test=lab["test"],
+                    raw_name=lab.get("raw_name", lab["test"]),
+                    value=lab["value"],
+                    unit=lab.get("unit", ""),
+                    status=lab.get("status", "normal"),
+                )
+                for lab in lab_values
+            ]
+            session.flush()
+            self._update_trends(session, report, stale, now)
+
+    def _update_trends(self, session: Session, report: StoredReport, stale: set, now: datetime) -> None:
+        """O(1) update per new value; full rebuild only for replaced or out-of-order values"""
+        rebuild = {key for key in stale if key[0] is not None}
+        for lab in report.lab_values:
+            if lab.user_id is None or (lab.user_id, lab.test) in rebuild:
+                continue
+            trend = self._trend_row(session, lab.user_id, lab.test)
+            state = TrendState.from_dict(trend.state) if trend.state else TrendState()
+            if not state.accepts(lab.report_date):
+                rebuild.add((lab.user_id, lab.test))
+                continue
+            state.add(lab.report_date, lab.value, lab.status, lab.unit, lab.report_id)
+            trend.state = state.to_dict()
+            trend.updated_at = now
+
+        for user_id, test in rebuild:
+            history = session.scalars(
+                select(StoredLabValue)
+                .where(StoredLabValue.user_id == user_id, StoredLabValue.test == test)
+                .order_by(StoredLabValue.report_date, StoredLabValue.id)
+            ).all()
+            if not history:
+                trend = self._trend_row(session, user_id, test, create=False)
+                if trend is not None:
+                    session.delete(trend)
+                continue
+            trend = self._trend_row(session, user_id, test)
+            state = TrendState.rebuild(
+                (lab.report_date, lab.value, lab.status, lab.unit, lab.report_id) for lab in history
+            )
+            trend.state = state.to_dict()
+            trend.updated_at = now
+
+    @staticmethod
+    def _trend_row(session: Session, user_id: str, test: str, create: bool = True) -> Optional[LabTrend]:
+        trend = session.scalars(
+            select(LabTrend).where(LabTrend.user_id == user_id, LabTrend.test == test)
+        ).one_or_none()
+        if trend is None and create:
+            trend = LabTrend(user_id=user_id, test=test, state={}, updated_at=datetime.now())
+            session.add(trend)
+        return trend
+
+    def trends(self, user_id: str, test: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Trend summaries for a user (one test, or every test they have values for)"""
+        query = select(LabTrend).where(LabTrend.user_id == user_id).order_by(LabTrend.test)
+        if test is not None:
+            query = query.where(LabTrend.test == test)
+        with self._sessions() as session:
+            return [TrendState.from_dict(t.state).summary(t.test) for t in session.scalars(query)]
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """The stored ProcessReportResponse for a report, exactly as returned"""
+        with self._sessions() as session:
+            report = session.get(StoredReport, report_id)
+            return report.response if report is not None else None
+
+    def list_reports(
+        self,
+        user_id: Optional[str] = None,
+        test: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """Report summaries, newest first, optionally for one user / containing one test"""
+        query = select(StoredReport).order_by(StoredReport.report_date.desc(), StoredReport.created_at.desc())
+        if user_id is not None:
+            query = query.where(StoredReport.user_id == user_id)
+        if test is not None:
+            query = query.where(
+                StoredReport.report_id.in_(select(StoredLabValue.report_id).where(StoredLabValue.test == test))
+            )
+        if date_from is not None:
+            query = query.where(StoredReport.report_date >= date_from)
+        if date_to is not None:
+            query = query.where(StoredReport.report_date <= date_to)
+        with self._sessions() as session:
+            reports = session.scalars(query.limit(limit)).all()
+            return [
+                {
+                    "report_id": r.report_id,
+                    "user_id": r.user_id,
+                    "report_date": r.report_date.isoformat(),
+                    "created_at": r.created_at.isoformat(),
+                    "risk_level": r.risk_level,
+                    "language": r.language,
+                    "lab_values": [lab.to_dict() for lab in r.lab_values],
+                }
+                for r in reports
+            ]
+
+    def lab_history(self, user_id: Optional[str], test: str) -> List[Dict[str, Any]]:
+        """Every stored value of one test for one user, oldest first"""
+        query = (
+            select(StoredLabValue)
+            .where(StoredLabValue.user_id == user_id, StoredLabValue.test == test)
+            .order_by(StoredLabValue.report_date, StoredLabValue.id)
+        )
+        with self._sessions() as session:
+            return [lab.to_dict() for lab in session.scalars(query)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"url": re.sub(r"//[^@/]*@", "//***@", self.url), "pool": self.engine.pool.status()}
+
+    def close(self) -> None:
+        self.engine.dispose()
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
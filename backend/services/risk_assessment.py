@@ -2,10 +2,24 @@
 Risk Assessment Service - Evaluate lab values against reference ranges
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence, Union
 import json
+from itertools import compress
 from pathlib import Path
 
+SEVERITIES = ("mild", "moderate", "severe")
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH")
+
+# Integers up to this size convert to float64, and subtract, without rounding
+_EXACT_INT = 2 ** 52
+
+
+def _exact_number(value: Any) -> bool:
+    """True if float64 arithmetic on value gives the same results as Python's"""
+    if type(value) is float:
+        return True
+    return type(value) is int and -_EXACT_INT <= value <= _EXACT_INT
+
 
 class RiskAssessmentService:
     def __init__(self):
@@ -114,6 +128,149 @@ class RiskAssessmentService:
             "abnormal_count": len(abnormal_values),
         }
 
+    def assess_batch(
+        self,
+        entities_list: Sequence[Dict],
+        patient_genders: Union[str, Sequence[str]] = "male",
+        patient_ages: Optional[Sequence[Optional[int]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        assess() for many reports at once (screening camps, dashboards).
+        Every lab value is packed into arrays of (range, value) and checked,
+        graded and counted per report with NumPy; each result equals what
+        assess() returns for that report. Reports whose values or ranges
+        float64 cannot reproduce exactly (non-numeric, huge integers, a zero
+        upper limit) go through assess(), as does everything without NumPy.
+        """
+        entities_list = list(entities_list)
+        count = len(entities_list)
+        genders = [patient_genders] * count if isinstance(patient_genders, str) else list(patient_genders)
+        ages = [None] * count if patient_ages is None else list(patient_ages)
+        if len(genders) != count or len(ages) != count:
+            raise ValueError("patient_genders and patient_ages must match entities_list in length")
+
+        try:
+            import numpy as np
+        except ImportError:
+            return [self.assess(e, g, a) for e, g, a in zip(entities_list, genders, ages)]
+
+        results: List[Optional[Dict[str, Any]]] = [None] * count
+        # gender -> test -> row of `table`, or -1 where only assess() gets it right
+        ranges: Dict[Any, Dict[Any, int]] = {}
+        table: List[tuple] = []  # (min, max, known, critical, unit, normal range)
+        packed: List[tuple] = []  # (report index, first row, end row)
+        rows: List[int] = []
+        tests: List[Any] = []
+        values: List[Any] = []
+
+        for index, (entities, gender) in enumerate(zip(entities_list, genders)):
+            try:
+                lab_values = entities.get("lab_values", [])
+                report_tests = [lab["test"] for lab in lab_values]
+                report_values = [lab["value"] for lab in lab_values]
+                gender_rows = ranges.setdefault(gender, {})
+                report_rows = list(map(gender_rows.get, report_tests))
+                if None in report_rows:
+                    for test in report_tests:
+                        if test not in gender_rows:
+                            gender_rows[test] = self._batch_range(test, gender, table)
+                    report_rows = [gender_rows[test] for test in report_tests]
+                vectorizable = -1 not in report_rows and (
+                    set(map(type, report_values)) <= {float} or all(map(_exact_number, report_values))
+                )
+            except Exception:
+                vectorizable = False
+            if not vectorizable:
+                # assess() gives the result, or raises the same error
+                results[index] = self.assess(entities, gender, ages[index])
+                continue
+            packed.append((index, len(rows), len(rows) + len(report_rows)))
+            rows += report_rows
+            tests += report_tests
+            values += report_values
+
+        if not packed:
+            return results
+
+        row = np.array(rows, dtype=np.intp)
+        mins, maxs, known, critical, units, normal_ranges = (
+            np.array([r[i] for r in table], dtype=dtype)[row]
+            for i, dtype in enumerate((np.float64, np.float64, bool, bool, object, object))
+        )
+        value = np.array(values, dtype=np.float64)
+        low = known & (value < mins)
+        high = known & ~low & (value > maxs)
+        abnormal = low | high
+        with np.errstate(divide="ignore", invalid="ignore"):
+            deviation = np.where(
+                low & (mins > 0), (mins - value) / mins,
+                np.where(high, (value - maxs) / maxs, 0.0),
+            )
+        severity = np.where(deviation > 0.5, 2, np.where(deviation > 0.2, 1, 0))
+
+        starts = np.array([start for _, start, _ in packed], dtype=np.intp)
+        sizes = np.diff(np.append(starts, len(rows)))
+        report = np.repeat(np.arange(len(packed)), sizes)
+        total = np.bincount(report, weights=abnormal, minlength=len(packed))
+        critical_count = np.bincount(report, weights=abnormal & critical, minlength=len(packed))
+        severe_count = np.bincount(report, weights=abnormal & (severity == 2), minlength=len(packed))
+        risk = np.where(
+            (severe_count >= 2) | (critical_count >= 2) | (total >= 4), 2,
+            np.where((severe_count >= 1) | (critical_count >= 1) | (total >= 2), 1, 0),
+        )
+
+        # Only abnormal values become dicts; their fields are gathered as lists first
+        flagged = np.flatnonzero(abnormal)
+        flagged_rows = flagged.tolist()
+        flagged_status = np.array(["low", "high"], dtype=object)[high[flagged].astype(np.intp)].tolist()
+        flagged_severity = np.array(SEVERITIES, dtype=object)[severity[flagged]].tolist()
+        flagged_units = units[flagged].tolist()
+        flagged_ranges = normal_ranges[flagged].tolist()
+        bounds = np.searchsorted(flagged, np.append(starts, len(rows))).tolist()
+        is_normal = (~abnormal).tolist()
+
+        for k, ((index, start, end), level) in enumerate(zip(packed, risk.tolist())):
+            first, last = bounds[k], bounds[k + 1]
+            results[index] = {
+                "risk_level": RISK_LEVELS[level],
+                "abnormal_values": [
+                    {
+                        "test": tests[i],
+                        "value": values[i],
+                        "unit": unit,
+                        "status": status,
+                        "severity": grade,
+                        "normal_range": normal_range,
+                    }
+                    for i, status, grade, unit, normal_range in zip(
+                        flagged_rows[first:last], flagged_status[first:last], flagged_severity[first:last],
+                        flagged_units[first:last], flagged_ranges[first:last],
+                    )
+                ],
+                "normal_values": list(compress(tests[start:end], is_normal[start:end])),
+                "total_tests": end - start,
+                "abnormal_count": last - first,
+            }
+
+        return results
+
+    def _batch_range(self, test_name: Any, gender: Any, table: List[tuple]) -> int:
+        """Append the (test, gender) reference row for assess_batch; -1 if only assess() gets it right"""
+        result = self._check_value(test_name, 0.0, gender)
+        if result["status"] == "unknown":
+            table.append((0.0, 0.0, False, False, "", ""))
+            return len(table) - 1
+        ranges = self.reference_ranges[test_name]
+        ref = ranges[gender] if gender in ranges else ranges["all"]
+        min_val, max_val = ref["min"], ref["max"]
+        if not (_exact_number(min_val) and _exact_number(max_val)) or max_val == 0:
+            return -1
+        table.append((
+            min_val, max_val, True, test_name in self.critical_tests,
+            ref.get("unit", ""), self._get_normal_range_str(test_name, gender),
+        ))
+        return len(table) - 1
+
     def _check_value(self, test_name: str, value: float, gender: str) -> Dict:
         """Check if a lab value is abnormal"""
         if test_name not in self.reference_ranges:
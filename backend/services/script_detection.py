@@ -0,0 +1,98 @@
+"""
+Script Detection - Pick the smallest Tesseract language set for each page
+Loading every Indic model for every page makes OCR several times slower, so
+each page is first run through Tesseract's orientation and script detection
+(OSD, which is cheap on the already downscaled page) and only the language
+pack for the detected script is loaded, plus English for test names and
+units.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+# Output-language codes (translation_service.LANGUAGE_NAMES) -> Tesseract packs
+TESSERACT_LANGUAGES = {
+    "en": "eng",
+    "hi": "hin",
+    "bn": "ben",
+    "ta": "tam",
+    "te": "tel",
+    "mr": "mar",
+}
+
+# OSD script name -> packs that read it, most preferred first. Hindi and
+# Marathi share Devanagari; only the first enabled one is used.
+SCRIPT_LANGUAGES = {
+    "Latin": ["eng"],
+    "Devanagari": ["hin", "mar"],
+    "Bengali": ["ben"],
+    "Tamil": ["tam"],
+    "Telugu": ["tel"],
+}
+
+# Below this OSD script confidence the page is read with every enabled pack
+MIN_SCRIPT_CONFIDENCE = 1.0
+
+
+def parse_languages(value: str) -> List[str]:
+    """
+    Parse OCR_LANGUAGES: "auto" for every supported pack, otherwise a
+    comma- or plus-separated list of Tesseract or output-language codes.
+    English is always included.
+    """
+    value = (value or "").strip()
+    if value == "auto":
+        return list(TESSERACT_LANGUAGES.values())
+    languages = []
+    for code in value.replace("+", ",").split(","):
+        code = code.strip()
+        if not code:
+            continue
+        code = TESSERACT_LANGUAGES.get(code, code)
+        if code not in languages:
+            languages.append(code)
+    if "eng" not in languages:
+        languages.insert(0, "eng")
+    return languages
+
+
+def languages_for_script(script: Optional[str], enabled: List[str]) -> Optional[str]:
+    """
+    Tesseract lang string for a detected script, or None when no enabled
+    pack reads it. The script's pack comes first so it takes priority.
+    """
+    if script == "Latin":
+        return "eng"
+    for lang in SCRIPT_LANGUAGES.get(script, []):
+        if lang in enabled:
+            return f"{lang}+eng"
+    return None
+
+
+def choose_languages(engine, image, enabled: List[str]) -> Tuple[str, Optional[str]]:
+    """
+    Returns (tesseract lang string, detected script or None). With only
+    English enabled no detection is run at all.
+    """
+    if enabled == ["eng"]:
+        return "eng", None
+    detected = detect_script(engine, image)
+    if detected is not None:
+        script, confidence = detected
+        lang = languages_for_script(script, enabled)
+        if lang is not None and confidence >= MIN_SCRIPT_CONFIDENCE:
+            return lang, script
+    # Unknown, unsupported or uncertain script: read with everything enabled
+    return "+".join(enabled), detected[0] if detected else None
+
+
+def detect_script(engine, image) -> Optional[Tuple[str, float]]:
+    """(script name, confidence) from Tesseract OSD, or None if it fails"""
+    try:
+        result: Dict[str, Any] = engine.detect_script(image)
+    except Exception as e:
+        # Usually osd.traineddata missing or too little text on the page
+        print(f"[OCR] Script detection failed: {e}")
+        return None
+    if not result or not result.get("script"):
+        return None
+    return result["script"], float(result.get("confidence") or 0.0)
@@ -0,0 +1,77 @@
+"""
+Stage Cache - Memoizes each analysis stage on its own inputs
+A report is analyzed as OCR -> NER -> risk -> simplify -> translate. Each
+stage's key chains the previous stage's key with the request parameters the
+stage itself reads, so changing the language only misses the translate
+stage, while changing the patient's gender re-runs risk and everything after
+it. Outputs are kept in a small in-memory LRU per stage.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class StageCache:
+    def __init__(self, max_items: int = 128):
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._entries: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_env(cls) -> "StageCache":
+        return cls(max_items=int(os.environ.get("ANALYSIS_STAGE_CACHE_ITEMS", "128")))
+
+    @staticmethod
+    def key(upstream: Optional[str], inputs: Dict[str, Any]) -> str:
+        """Key for a stage: the upstream stage's key plus this stage's own inputs"""
+        digest = hashlib.sha256((upstream or "").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(json.dumps(inputs, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, stage: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._entries.setdefault(stage, OrderedDict())
+            counters = self._counters.setdefault(stage, {"hits": 0, "misses": 0})
+            if key not in entries:
+                counters["misses"] += 1
+                return None
+            entries.move_to_end(key)
+            counters["hits"] += 1
+            value = entries[key]
+        # Callers extend and mutate run state; keep the stored copy pristine
+        return copy.deepcopy(value)
+
+    def put(self, stage: str, key: str, outputs: Dict[str, Any]) -> None:
+        if self.max_items <= 0:
+            return
+        value = copy.deepcopy(outputs)
+        with self._lock:
+            entries = self._entries.setdefault(stage, OrderedDict())
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_items:
+                entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-stage hits, misses, hit rate and entry count"""
+        with self._lock:
+            stats = {}
+            for stage, counters in self._counters.items():
+                lookups = counters["hits"] + counters["misses"]
+                stats[stage] = {
+                    **counters,
+                    "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0,
+                    "entries": len(self._entries.get(stage, ())),
+                }
+            return {"max_items_per_stage": self.max_items, "stages": stats}
@@ -5,6 +5,7 @@ Uses deep-translator (reliable) with graceful fallback.
 Install: pip install deep-translator
 """
 
+from functools import cached_property
 from typing import Dict, List
 
 
@@ -19,16 +20,18 @@ LANGUAGE_NAMES = {
 
 
 class TranslationService:
-    def __init__(self):
-        self._available = self._check_deep_translator()
+    @cached_property
+    def _available(self) -> bool:
+        # Checked on first translation, not at startup
+        return self._check_deep_translator()
 
     def _check_deep_translator(self) -> bool:
+        # Import check only: a live test translation blocks startup (and
+        # hangs offline), and translate() already falls back on network errors
         try:
             from deep_translator import GoogleTranslator
-            # Verify it actually works with a test call
-            GoogleTranslator(source="en", target="hi").translate("hello")
             return True
-        except Exception:
+        except ImportError:
             return False
 
     def translate(self, text: str, target_language: str, source_language: str = "en") -> str:
@@ -0,0 +1,119 @@
+"""
+Trend Engine - Incremental per-user, per-test lab value aggregates
+The dashboard used to rebuild trends from the whole report history on every
+view. A TrendState instead keeps running aggregates that a new value updates
+in O(1): last value, rolling mean over the last few values, min/max, a
+least-squares slope (from running sums) and the time spent out of range.
+Values are keyed by the test names NERService._normalize_test_name produces.
+"""
+
+import os
+from datetime import date
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+TREND_WINDOW = int(os.environ.get("TREND_WINDOW", "5"))
+
+
+class TrendState:
+    """Aggregates for one user's values of one test, serializable as a plain dict"""
+
+    def __init__(self, window: int = TREND_WINDOW):
+        self.window = max(1, window)
+        self.count = 0
+        self.unit = ""
+        self.first_day: Optional[int] = None  # date ordinal
+        self.last_day: Optional[int] = None
+        self.last_value: Optional[float] = None
+        self.last_status: Optional[str] = None
+        self.last_report_id: Optional[str] = None
+        self.min_value: Optional[float] = None
+        self.max_value: Optional[float] = None
+        # Running sums for the least-squares slope, x = days since first_day
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xx = 0.0
+        self.sum_xy = 0.0
+        self.out_of_range_days = 0
+        self.recent: list = []  # [(date ordinal, value)], at most `window` long
+
+    def accepts(self, day: date) -> bool:
+        """True if a value on this day can be added incrementally (not older than the last)"""
+        return self.last_day is None or day.toordinal() >= self.last_day
+
+    def add(self, day: date, value: float, status: str, unit: str = "", report_id: Optional[str] = None) -> None:
+        """Fold in the next value; days must not go backwards (see accepts)"""
+        ordinal = day.toordinal()
+        if self.first_day is None:
+            self.first_day = ordinal
+        elif self.last_status not in (None, "normal"):
+            # The previous reading stood until this one
+            self.out_of_range_days += ordinal - self.last_day
+
+        x = float(ordinal - self.first_day)
+        self.count += 1
+        self.sum_x += x
+        self.sum_y += value
+        self.sum_xx += x * x
+        self.sum_xy += x * value
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = value if self.max_value is None else max(self.max_value, value)
+        self.last_day = ordinal
+        self.last_value = value
+        self.last_status = status
+        self.last_report_id = report_id
+        self.unit = unit or self.unit
+        self.recent.append((ordinal, value))
+        if len(self.recent) > self.window:
+            self.recent.pop(0)
+
+    @classmethod
+    def rebuild(
+        cls, points: Iterable[Tuple[date, float, str, str, Optional[str]]], window: int = TREND_WINDOW
+    ) -> "TrendState":
+        """Full recomputation from (date, value, status, unit, report_id) points, for out-of-order data"""
+        state = cls(window)
+        for day, value, status, unit, report_id in sorted(points, key=lambda p: p[0]):
+            state.add(day, value, status, unit, report_id)
+        return state
+
+    def slope_per_day(self) -> Optional[float]:
+        denominator = self.count * self.sum_xx - self.sum_x ** 2
+        if self.count < 2 or denominator <= 0:
+            return None
+        return (self.count * self.sum_xy - self.sum_x * self.sum_y) / denominator
+
+    def summary(self, test: str) -> Dict[str, Any]:
+        """Dashboard view of the aggregates"""
+        slope = self.slope_per_day()
+        tracked_days = (self.last_day - self.first_day) if self.count else 0
+        return {
+            "test": test,
+            "unit": self.unit,
+            "count": self.count,
+            "first_date": date.fromordinal(self.first_day).isoformat() if self.count else None,
+            "last_date": date.fromordinal(self.last_day).isoformat() if self.count else None,
+            "last_value": self.last_value,
+            "last_status": self.last_status,
+            "rolling_mean": round(sum(v for _, v in self.recent) / len(self.recent), 4) if self.recent else None,
+            "rolling_window": self.window,
+            "mean": round(self.sum_y / self.count, 4) if self.count else None,
+            "min": self.min_value,
+            "max": self.max_value,
+            "slope_per_day": round(slope, 6) if slope is not None else None,
+            "slope_per_30_days": round(slope * 30, 4) if slope is not None else None,
+            "out_of_range_days": self.out_of_range_days,
+            "tracked_days": tracked_days,
+            "out_of_range_fraction": round(self.out_of_range_days / tracked_days, 4) if tracked_days else None,
+            "recent": [{"date": date.fromordinal(d).isoformat(), "value": v} for d, v in self.recent],
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TrendState":
+        state = cls(data.get("window", TREND_WINDOW))
+        for key, value in data.items():
+            setattr(state, key, value)
+        state.recent = [tuple(point) for point in state.recent]
+        return state
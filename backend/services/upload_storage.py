@@ -0,0 +1,54 @@
+"""
+Upload Storage - Writes uploaded reports to disk in chunks
+Uploads are streamed straight to a temporary file next to their final
+location while the SHA-256 is computed, so memory per upload stays constant
+and an oversized file is rejected as soon as it passes the limit.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Union
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class HashingWriter:
+    """Chunked writer to a temp file that hashes as it goes and enforces a size cap"""
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        fd, self.temp_path = tempfile.mkstemp(dir=self.directory, prefix=".upload-", suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        self._sha256.update(chunk)
+        self._file.write(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    def commit(self, final_path: Union[str, Path]) -> Path:
+        """Move the finished upload into place (atomic on the same filesystem)"""
+        self._file.close()
+        os.replace(self.temp_path, final_path)
+        return Path(final_path)
+
+    def abort(self) -> None:
+        self._file.close()
+        Path(self.temp_path).unlink(missing_ok=True)
@@ -26,7 +26,7 @@ export default function App() {
   }
 
   const pages = {
-    home:      <HomePage />,
+    home:      <HomePage user={user} />,
     dashboard: <DashboardPage />,
     knowledge: <KnowledgePage />,
     about:     <AboutPage />,
@@ -40,7 +40,7 @@ export default function App() {
         user={user}
         onLogout={() => { localStorage.removeItem('medi_user'); setUser(null); }}
       />
-      <main>{pages[page] || <HomePage />}</main>
+      <main>{pages[page] || <HomePage user={user} />}</main>
     </div>
   );
 }
\ No newline at end of file
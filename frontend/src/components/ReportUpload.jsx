@@ -1,5 +1,6 @@
 import React, { useState, useCallback } from 'react';
 import axios from 'axios';
+import { processReportJob, jobStageLabel } from '../utils/processJob';
 
 // const API_BASE_URL = 'http://localhost:8000';
 const API_BASE_URL = process.env.REACT_APP_API_URL;
@@ -17,6 +18,7 @@ export default function ReportUpload() {
   const [result, setResult] = useState(null);
   const [error, setError] = useState(null);
   const [dragOver, setDragOver] = useState(false);
+  const [job, setJob] = useState(null);
   const [patientInfo, setPatientInfo] = useState({
     age: '',
     gender: 'male',
@@ -37,7 +39,7 @@ export default function ReportUpload() {
 
   const handleUpload = async () => {
     if (!file) { setError('Please select a file first'); return; }
-    setLoading(true); setError(null); setResult(null);
+    setLoading(true); setError(null); setResult(null); setJob(null);
 
     try {
       const formData = new FormData();
@@ -46,20 +48,20 @@ export default function ReportUpload() {
         headers: { 'Content-Type': 'multipart/form-data' },
       });
 
+      // Runs as a background job so long PDFs don't hit proxy timeouts
       const { report_id, file_path } = uploadRes.data;
-      const processRes = await axios.post(`${API_BASE_URL}/process/report/${report_id}`, null, {
-        params: {
-          file_path,
-          patient_age: patientInfo.age || null,
-          patient_gender: patientInfo.gender,
-          language: patientInfo.language,
-        },
-      });
-      setResult(processRes.data);
+      const report = await processReportJob(API_BASE_URL, report_id, {
+        file_path,
+        patient_age: patientInfo.age || null,
+        patient_gender: patientInfo.gender,
+        language: patientInfo.language,
+      }, setJob);
+      setResult(report);
     } catch (err) {
-      setError(err.response?.data?.detail || 'Failed to process report. Please try again.');
+      setError(err.response?.data?.detail || (err.jobFailed && err.message) || 'Failed to process report. Please try again.');
     } finally {
       setLoading(false);
+      setJob(null);
     }
   };
 
@@ -137,7 +139,7 @@ export default function ReportUpload() {
         <button style={{ ...s.btn, ...(loading ? s.btnDisabled : {}) }}
           onClick={handleUpload} disabled={loading}>
           {loading ? (
-            <span>⏳ Analyzing your report...</span>
+            <span>⏳ {jobStageLabel(job)}</span>
           ) : (
             <span>🔍 Analyze Report</span>
           )}
@@ -1,5 +1,6 @@
 import React, { useState, useCallback } from 'react';
 import axios from 'axios';
+import { processReportJob, jobStageLabel } from '../utils/processJob';
 
 // const API = 'http://localhost:8000';
 // const API_BASE_URL = process.env.REACT_APP_API_URL;
@@ -20,7 +21,7 @@ function saveToHistory(result, filename) {
   } catch {}
 }
 
-export default function HomePage() {
+export default function HomePage({ user }) {
   const [file, setFile]    = useState(null);
   const [drag, setDrag]    = useState(false);
   const [loading, setLoad] = useState(false);
@@ -28,6 +29,7 @@ export default function HomePage() {
   const [error, setError]  = useState('');
   const [info, setInfo]    = useState({ age:'', gender:'male', language:'en' });
   const [saved, setSaved]  = useState(false);
+  const [job, setJob]      = useState(null);
 
   const onDrop = useCallback(e => {
     e.preventDefault(); setDrag(false);
@@ -37,19 +39,19 @@ export default function HomePage() {
 
   const analyze = async () => {
     if (!file) { setError('Please select a file first.'); return; }
-    setLoad(true); setError(''); setResult(null); setSaved(false);
+    setLoad(true); setError(''); setResult(null); setSaved(false); setJob(null);
     try {
       const fd = new FormData(); fd.append('file', file);
       const up = await axios.post(`${process.env.REACT_APP_API_URL}/upload/report`, fd, { headers:{'Content-Type':'multipart/form-data'} });
-      const pr = await axios.post(`${process.env.REACT_APP_API_URL}/process/report/${up.data.report_id}`, null, {
-        params:{ file_path:up.data.file_path, patient_age:info.age||null, patient_gender:info.gender, language:info.language },
-      });
-      setResult(pr.data);
-      saveToHistory(pr.data, file.name);
+      const report = await processReportJob(process.env.REACT_APP_API_URL, up.data.report_id,
+        { file_path:up.data.file_path, patient_age:info.age||null, patient_gender:info.gender, language:info.language, user_id:user?.email },
+        setJob);
+      setResult(report);
+      saveToHistory(report, file.name);
       setSaved(true);
     } catch (e) {
-      setError(e.response?.data?.detail || 'Failed to analyze. Make sure the backend is running on port 8000.');
-    } finally { setLoad(false); }
+      setError(e.response?.data?.detail || (e.jobFailed && e.message) || 'Failed to analyze. Make sure the backend is running on port 8000.');
+    } finally { setLoad(false); setJob(null); }
   };
 
   const rc = result ? (RC[result.risk_level] || RC.INFO) : null;
@@ -122,7 +124,7 @@ export default function HomePage() {
           </div>
           {error&&<div style={s.errBox} className="animate-up">⚠️ {error}</div>}
           <button onClick={analyze} disabled={loading||!file} style={{...s.abtn,...((!file||loading)?{opacity:0.5,cursor:'not-allowed'}:{})}}>
-            {loading?<span style={{display:'flex',alignItems:'center',justifyContent:'center',gap:10}}><span className="spinner"/>Analyzing your report...</span>:'🔍 Analyze Report'}
+            {loading?<span style={{display:'flex',alignItems:'center',justifyContent:'center',gap:10}}><span className="spinner"/>{jobStageLabel(job)}</span>:'🔍 Analyze Report'}
           </button>
           {saved&&<div style={{background:'rgba(34,197,94,0.08)',border:'1px solid rgba(34,197,94,0.22)',borderRadius:10,padding:'10px 16px',fontSize:13,color:'#16a34a',textAlign:'center'}}>✅ Result saved to your Dashboard</div>}
         </div>
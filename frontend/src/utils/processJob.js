@@ -0,0 +1,41 @@
+import axios from 'axios';
+
+const POLL_MS = 1000;
+
+// Values already found on the pages read so far (streamed while OCR runs)
+function foundSoFar(partial) {
+  const count = partial ? partial.lab_values.length : 0;
+  return count ? ` ${count} value${count === 1 ? '' : 's'} found so far` : '';
+}
+
+// Label for what the backend is working on, given the last stage it finished
+export function jobStageLabel(job) {
+  const p = (job && job.progress) || {};
+  switch (job && job.stage) {
+    case 'ocr':      return p.ocr && p.ocr.pages_total ? `Reading page ${Math.min(p.ocr.pages_done + 1, p.ocr.pages_total)} of ${p.ocr.pages_total}...${foundSoFar(p.ocr.partial)}` : 'Reading your report...';
+    case 'entities': return 'Checking values against normal ranges...';
+    case 'risk':     return 'Writing your explanation...';
+    case 'simplify':
+    case 'translate': return 'Finishing up...';
+    default:         return 'Analyzing your report...';
+  }
+}
+
+// Start a background processing job and poll until it finishes.
+// Resolves with the ProcessReportResponse; onProgress gets each job status.
+export async function processReportJob(apiUrl, reportId, params, onProgress) {
+  const { data: handle } = await axios.post(`${apiUrl}/process/report/${reportId}`, null, {
+    params: { ...params, mode: 'job' },
+  });
+  for (;;) {
+    await new Promise(resolve => setTimeout(resolve, POLL_MS));
+    const { data: job } = await axios.get(`${apiUrl}/process/jobs/${handle.job_id}`);
+    if (job.status === 'completed') return job.result;
+    if (job.status === 'failed') {
+      const err = new Error(job.error || 'Processing failed');
+      err.jobFailed = true;
+      throw err;
+    }
+    if (onProgress) onProgress(job);
+  }
+}
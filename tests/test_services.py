@@ -7,10 +7,28 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
+import socket
+import time
+from pathlib import Path
+
 import pytest
 from services.ner_service import NERService
+from services.lexicon_matcher import LexiconMatcher
 from services.risk_assessment import RiskAssessmentService
 from services.simplification_service import SimplificationService
+from services.ocr_cache import OCRCache
+from services.ocr_service import OCRService
+from services.pdf_backends import PDFBackend, open_pdf
+from services.blob_store import BlobStore
+from services.batch_pipeline import BatchPipeline, Stage
+from services.job_queue import JOB_HANDLERS, JobQueue, MemoryJobStore, SQLiteJobStore
+from services.pipeline_executor import ExecutorBusy, PipelineExecutor
+from services.registry import ServiceRegistry
+from services.report_store import ReportStore, parse_report_date
+from services.stage_cache import StageCache
+from services.trend_engine import TrendState
+from services.translation_service import TranslationService
+from services.script_detection import parse_languages
 
 
 # ===== NER Service Tests =====
@@ -40,6 +58,54 @@ def test_ner_extracts_medications():
     assert "Aspirin" in meds
 
 
+def test_ner_lexicon_matches_whole_words_and_synonyms():
+    ner = NERService()
+    text = "Rx: Glycomet 500, Ecosprin 75. H/o insulinoma, Type 2 Diabetes Mellitus; HTN."
+    result = ner.extract_entities(text)
+    assert result["medications"] == ["Metformin", "Aspirin"]
+    assert result["diagnoses"] == ["Diabetes", "Hypertension", "Diabetes Mellitus"]
+
+    matcher = LexiconMatcher({"Insulin": ["lantus"], "Insulinoma": []})
+    assert matcher.match("insulinoma") == ["Insulinoma"]
+    assert [hit[:2] for hit in matcher.find("LANTUS, insulin")] == [(0, 6), (8, 15)]
+
+
+def test_ner_lexicon_compiled_from_knowledge_base_and_hot_reloaded(tmp_path, monkeypatch):
+    import json
+    import services.lexicon_compiler as compiler
+
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "lab_tests.json").write_text(json.dumps({"Ferritin": {"all": {"min": 20, "max": 250, "unit": "ng/mL"}}}))
+    (kb / "medications.json").write_text(json.dumps({"Sitagliptin": {}}))
+    (kb / "aliases.json").write_text(json.dumps({"medications": {"Sitagliptin": ["januvia"]}}))
+
+    store = compiler.LexiconStore(kb, check_interval=0.001)
+    ner = NERService(store)
+    text = "Serum Ferritin: 18 ng/mL. Rx Januvia 100, Istavel 50"
+    first = ner.extract_entities(text)
+    assert [(l["test"], l["value"], l["unit"]) for l in first["lab_values"]] == [("Ferritin", 18.0, "ng/mL")]
+    assert first["medications"] == ["Sitagliptin"]
+    assert (kb / "lexicon.pkl").exists()
+
+    # A second worker loads the compiled file instead of compiling
+    monkeypatch.setattr(compiler, "compile_lexicon", lambda kb_dir=None: pytest.fail("recompiled"))
+    assert compiler.LexiconStore(kb).current().version == store.current().version
+    monkeypatch.undo()
+
+    old = store.current()
+    (kb / "aliases.json").write_text(json.dumps({
+        "lab_tests": {"Ferritin": {"aliases": ["Serum Ferritin", "Ferritin"], "units": ["ng/mL"]}},
+        "medications": {"Sitagliptin": ["januvia", "istavel"]},
+    }))
+    time.sleep(0.01)
+    second = ner.extract_entities(text)
+    assert store.reloads == 1 and store.current() is not old
+    assert second["lab_values"][0]["raw_name"] == "Serum Ferritin"
+    assert second["medications"] == ["Sitagliptin"]
+    assert old.medications.find("istavel") == []
+
+
 def test_ner_extracts_gender():
     ner = NERService()
     text = "Patient: Male, Age: 45"
@@ -47,6 +113,53 @@ def test_ner_extracts_gender():
     assert result["patient_info"].get("gender") == "male"
 
 
+def test_ner_stream_yields_page_entities_and_matches_across_page_breaks():
+    ner = NERService()
+    ner.stream_holdback = 16  # short pages; the default suits real page lengths
+    pages = ["Patient: Mrs. A, Age: 52\nHemoglobin:", "9.1 g/dL\nOn Glycomet 500", "", "FBS 150 mg/dL. Type 2 diabetes."]
+
+    events = list(ner.extract_entities_stream(pages))
+
+    assert [e["type"] for e in events] == ["page"] * 4 + ["final"]
+    assert events[0]["lab_values"] == []  # the value is on the next page
+    assert [lab["test"] for lab in events[1]["lab_values"]] == ["Hemoglobin"]
+    assert events[1]["medications"] == ["Metformin"]
+    assert [lab["test"] for lab in events[3]["lab_values"]] == ["FBS"]
+    assert events[3]["diagnoses"] == ["Diabetes"]
+    final = events[-1]["entities"]
+    assert final == ner.extract_entities("\n".join(p for p in pages if p))
+    assert final["patient_info"] == {"age": 52, "gender": "female"}
+
+    # The name waits for its value across more whitespace than the holdback
+    ner.stream_holdback = 64
+    pages = ["Report\nHemoglobin:" + " " * 80, "13.5 g/dL\nMetformin"]
+    events = list(ner.extract_entities_stream(pages))
+    assert [(lab["test"], lab["value"]) for lab in events[1]["lab_values"]] == [("Hemoglobin", 13.5)]
+    assert events[-1]["entities"] == ner.extract_entities("\n".join(pages))
+    assert [lab["test"] for lab in events[-1]["entities"]["lab_values"]] == ["Hemoglobin"]
+
+
+def test_ner_extract_entities_many_matches_single_text_path():
+    ner = NERService()
+    texts = [
+        f"Age: {40 + n}\nHemoglobin: {9 + n % 5}.5 g/dL\nFBS {90 + n * 7} mg/dL\n{'Glycomet, HTN' if n % 2 else 'Mrs. B'}"
+        for n in range(25)
+    ] + ["", "no values here"]
+    progress = []
+    try:
+        results = list(ner.extract_entities_many(
+            (t for t in texts), workers=2, chunk_size=4, on_progress=lambda done, rate: progress.append(done)
+        ))
+        serial = list(ner.extract_entities_many(texts, workers=1, chunk_size=5))
+    finally:
+        ner.close()
+
+    expected = [ner.extract_entities(t) for t in texts]
+    assert results == expected
+    assert serial == expected
+    assert progress == [4, 8, 12, 16, 20, 24, 27]
+
+
 # ===== Risk Assessment Tests =====
 
 def test_risk_low_all_normal():
@@ -99,6 +212,43 @@ def test_risk_low_hemoglobin_flagged():
     assert result["abnormal_values"][0]["status"] == "low"
 
 
+def test_risk_assess_batch_matches_assess():
+    import random
+
+    risk = RiskAssessmentService()
+    risk.reference_ranges["Zero"] = {"all": {"min": -1, "max": 0, "unit": "x"}}  # assess() divides by zero
+    rng = random.Random(5)
+    tests = list(risk.reference_ranges) + ["Unknown"]
+    reports, genders = [], []
+    for _ in range(400):
+        labs = [
+            {"test": rng.choice(tests), "value": rng.choice([
+                rng.uniform(0, 300), rng.randint(0, 500000), rng.uniform(0, 2), 0, float("nan"), float("inf"), True,
+            ])}
+            for _ in range(rng.randint(0, 8))
+        ]
+        reports.append({"lab_values": labs} if rng.random() < 0.95 else {})
+        genders.append(rng.choice(["male", "female", "other"]))
+
+    def assess(entities, gender):
+        try:
+            return risk.assess(entities, patient_gender=gender)
+        except ZeroDivisionError:
+            return None
+
+    expected = [assess(e, g) for e, g in zip(reports, genders)]
+    vectorizable = [i for i, result in enumerate(expected) if result is not None]
+    actual = risk.assess_batch([reports[i] for i in vectorizable], [genders[i] for i in vectorizable])
+    # repr tells nan from other values and True from 1
+    assert repr(actual) == repr([expected[i] for i in vectorizable])
+    assert {r["risk_level"] for r in actual} == {"LOW", "MEDIUM", "HIGH"}
+
+    with pytest.raises(ZeroDivisionError):
+        risk.assess_batch([{"lab_values": [{"test": "Zero", "value": 5}]}])
+    with pytest.raises(ValueError):
+        risk.assess_batch([{}, {}], patient_genders=["male"])
+
+
 # ===== Simplification Tests =====
 
 def test_simplify_text_replaces_medical_terms():
@@ -127,3 +277,1080 @@ def test_simplify_generates_recommendations():
     assert len(result["recommendations"]) > 0
     assert len(result["questions"]) > 0
     assert "URGENT" in result["recommendations"][0]
+
+
+# ===== OCR Service Tests =====
+
+def _fake_page_ocr(task):
+    page_number = task["page"]
+    time.sleep(0.02 * (6 - page_number))  # later pages finish first
+    return {"text": f"page {page_number}"}
+
+
+class _FakePDF(PDFBackend):
+    name = "fake"
+    can_extract_text = True
+    can_render = True
+
+    def __init__(self, layer_texts):
+        super().__init__("report.pdf")
+        self.layer_texts = layer_texts
+        self.rendered = []
+
+    def page_count(self):
+        return len(self.layer_texts)
+
+    def page_text(self, page_number):
+        return self.layer_texts[page_number - 1]
+
+    def render_page(self, page_number, dpi):
+        self.rendered.append(page_number)
+        return page_number
+
+
+def _ocr_service_with_layer(monkeypatch, layer_texts):
+    import services.ocr_service as ocr_module
+    fake_pdf = _FakePDF(layer_texts)
+    monkeypatch.setattr(ocr_module, "_ocr_pdf_page", _fake_page_ocr)
+    monkeypatch.setattr(ocr_module, "open_pdf", lambda path, backend: fake_pdf)
+    ocr = OCRService(cache=OCRCache(cache_dir=None))
+    ocr._tesseract_available = True
+    monkeypatch.setattr(ocr, "_preprocess_image", lambda img: (img, {}))
+    monkeypatch.setattr(ocr, "_ocr_image", lambda page_number, lang: f"page {page_number}")
+    return ocr, fake_pdf
+
+
+def test_pdf_ocr_parallel_keeps_page_order(monkeypatch):
+    ocr, _ = _ocr_service_with_layer(monkeypatch, [""] * 5)
+    ocr.pdf_workers, ocr.pdf_window = 3, 1
+    try:
+        pages = ocr._extract_from_pdf("bundle.pdf")
+    finally:
+        ocr.close()
+    assert [p["text"] for p in pages] == [f"page {n}" for n in range(1, 6)]
+
+
+def test_pdf_pages_released_in_order_as_they_become_final(monkeypatch):
+    typed = "Hemoglobin: 13.2 g/dL  WBC: 7000 /cumm  Platelet: 250000 /cumm"
+    ocr, _ = _ocr_service_with_layer(monkeypatch, [typed, "", "", typed])
+    ocr.pdf_workers = 1
+    released = []
+
+    def on_page(done, total):
+        released.append(("progress", done))
+
+    pages = ocr._extract_from_pdf("bundle.pdf", on_page, lambda page: released.append(("text", page["page"])))
+
+    assert [p["page"] for p in pages] == [1, 2, 3, 4]
+    # Page 1 goes out before any OCR; page 4 (text layer) waits for page 3
+    assert released == [
+        ("progress", 2), ("text", 1),
+        ("progress", 3), ("text", 2),
+        ("progress", 4), ("text", 3), ("text", 4),
+    ]
+
+
+def test_degraded_ocr_results_are_not_cached(monkeypatch, tmp_path):
+    typed = "Hemoglobin: 13.2 g/dL  WBC: 7000 /cumm  Platelet: 250000 /cumm"
+    ocr, _ = _ocr_service_with_layer(monkeypatch, [typed, ""])
+    ocr.pdf_workers = 1
+    ocr_pdf_pages = ocr._ocr_pdf_pages
+    attempts = []
+
+    def crash_once(*args, **kwargs):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("worker crashed")
+        return ocr_pdf_pages(*args, **kwargs)
+
+    monkeypatch.setattr(ocr, "_ocr_pdf_pages", crash_once)
+    report = tmp_path / "report.pdf"
+    report.write_bytes(b"%PDF scan")
+    try:
+        first = ocr.extract_document(str(report))
+        second = ocr.extract_document(str(report))
+        third = ocr.extract_document(str(report))
+    finally:
+        ocr.close()
+    assert [p["source"] for p in first["pages"]] == ["text_layer", "ocr_failed"]
+    assert [p["source"] for p in second["pages"]] == ["text_layer", "ocr"]
+    assert third == second and len(attempts) == 2  # only the good result was cached
+
+
+def test_pdf_ocr_serial_mode(monkeypatch):
+    ocr, _ = _ocr_service_with_layer(monkeypatch, [""] * 3)
+    ocr.pdf_workers = 1
+    pages = ocr._extract_from_pdf("bundle.pdf")
+    assert [p["text"] for p in pages] == ["page 1", "page 2", "page 3"]
+    assert ocr._pdf_pool is None
+
+
+def test_adaptive_dpi_reocrs_only_low_confidence_pages(monkeypatch):
+    ocr, fake_pdf = _ocr_service_with_layer(monkeypatch, [""] * 3)
+    ocr.pdf_workers = 1
+    ocr.dpi_mode, ocr.low_dpi, ocr.dpi, ocr.min_confidence = "adaptive", 150, 300, 80
+    rendered_dpi = []
+    fake_pdf.render_page = lambda n, dpi: rendered_dpi.append((n, dpi)) or (n, dpi)
+    confidences = {(1, 150): 95, (2, 150): 60, (3, 150): 70, (2, 300): 91, (3, 300): 65}
+    monkeypatch.setattr(ocr, "_ocr_image_data", lambda img, lang: {
+        "text": f"page {img[0]} @ {img[1]}",
+        "words": [{"text": "x", "conf": confidences[img]}],
+    })
+
+    pages = ocr._extract_from_pdf("scan.pdf")
+
+    assert rendered_dpi == [(1, 150), (2, 150), (3, 150), (2, 300), (3, 300)]
+    assert [(p["text"], p["dpi"], p["confidence"]) for p in pages] == [
+        ("page 1 @ 150", 150, 95),
+        ("page 2 @ 300", 300, 91),
+        ("page 3 @ 150", 150, 70),  # high-DPI read was worse, keep the first one
+    ]
+
+
+class _ScriptEngine:
+    """Pretends page n is written in scripts[n - 1]"""
+
+    def __init__(self, scripts):
+        self.scripts = scripts
+        self.detections = 0
+
+    def detect_script(self, page_number):
+        self.detections += 1
+        return {"script": self.scripts[page_number - 1], "confidence": 5.0}
+
+
+def test_script_detection_picks_minimal_languages_per_page(monkeypatch):
+    ocr, _ = _ocr_service_with_layer(monkeypatch, [""] * 4)
+    ocr.pdf_workers = 1
+    ocr.languages = parse_languages("en,hi,ta")
+    ocr.ocr_engine = _ScriptEngine(["Latin", "Devanagari", "Tamil", "Bengali"])
+    langs = []
+    monkeypatch.setattr(ocr, "_ocr_image", lambda page, lang: langs.append(lang) or f"page {page}")
+
+    pages = ocr._extract_from_pdf("mixed-script.pdf")
+
+    # Bengali is not enabled, so that page is read with everything that is
+    assert langs == ["eng", "hin+eng", "tam+eng", "eng+hin+tam"]
+    assert [p["script"] for p in pages] == ["Latin", "Devanagari", "Tamil", "Bengali"]
+
+
+def test_script_detection_skipped_for_english_only(monkeypatch):
+    ocr, _ = _ocr_service_with_layer(monkeypatch, [""] * 2)
+    ocr.pdf_workers = 1
+    ocr.ocr_engine = engine = _ScriptEngine(["Devanagari", "Devanagari"])
+    pages = ocr._extract_from_pdf("english.pdf")
+    assert engine.detections == 0
+    assert [p["lang"] for p in pages] == ["eng", "eng"]
+
+
+def test_parse_languages_accepts_output_language_codes():
+    assert parse_languages("hi+mr") == ["eng", "hin", "mar"]
+    assert parse_languages("auto") == ["eng", "hin", "ben", "tam", "tel", "mar"]
+
+
+def test_pdf_routing_only_ocrs_image_pages(monkeypatch):
+    typed = "Hemoglobin: 13.2 g/dL  WBC: 7000 /cumm  Platelet: 250000 /cumm"
+    ocr, fake_pdf = _ocr_service_with_layer(monkeypatch, [typed, "  \n", typed, "Page 4"])
+    ocr.pdf_workers = 1
+    pages = ocr._extract_from_pdf("mixed.pdf")
+    assert fake_pdf.rendered == [2, 4]
+    assert [p["source"] for p in pages] == ["text_layer", "ocr", "text_layer", "ocr"]
+    assert pages[0]["text"] == typed
+    assert pages[1]["text"] == "page 2" and pages[3]["text"] == "page 4"
+
+
+SAMPLE_PDF = os.path.join(
+    os.path.dirname(__file__), '..', 'backend', 'uploads',
+    '20260219_195015_31b0f669-998f-4006-b4cd-b6745d409997.pdf'
+)
+
+
+@pytest.mark.parametrize("backend", ["pymupdf", "pypdf2"])
+def test_pdf_backends_extract_same_text_layer(backend):
+    try:
+        doc = open_pdf(SAMPLE_PDF, backend, fallback=False)
+    except RuntimeError as e:
+        pytest.skip(str(e))
+    with doc:
+        assert doc.page_count() == 1
+        assert "Hemoglobin" in doc.page_text(1)
+
+
+def test_preprocessing_pipeline_reports_step_timings():
+    pytest.importorskip("cv2")
+    from PIL import Image, ImageDraw
+    from services.image_preprocessing import PreprocessingPipeline
+
+    img = Image.new("RGB", (800, 600), "white")
+    draw = ImageDraw.Draw(img)
+    for i in range(8):
+        draw.text((100, 100 + i * 40), "Hemoglobin 13.5 g/dL", fill="black")
+    out, timings = PreprocessingPipeline().run(img)
+
+    assert out.mode == "L"
+    assert out.size[0] < 800 and out.size[1] < 600   # whitespace cropped
+    assert set(timings) >= {"grayscale", "crop_borders", "downscale", "deskew", "binarize"}
+
+
+def test_preprocessing_downscales_large_text():
+    pytest.importorskip("cv2")
+    import numpy as np
+    from services.image_preprocessing import PreprocessingPipeline
+
+    page = np.full((2000, 2000), 255, dtype=np.uint8)
+    for row in range(10):
+        for col in range(20):
+            y, x = 100 + row * 180, 100 + col * 90
+            page[y:y + 120, x:x + 50] = 0          # 120px tall "glyphs"
+    pipeline = PreprocessingPipeline(steps=["downscale"], target_text_height=30)
+    out = pipeline._step_downscale(page)
+    assert out.shape[0] == pytest.approx(500, abs=5)
+
+
+def test_preprocessing_rejects_unknown_step():
+    from services.image_preprocessing import PreprocessingPipeline
+    with pytest.raises(ValueError):
+        PreprocessingPipeline(steps=["grayscale", "sparkle"])
+
+
+def test_decode_image_downscales_large_jpeg_and_applies_exif(tmp_path):
+    pytest.importorskip("cv2")
+    from PIL import Image, ImageDraw, ImageFont
+    from services.image_preprocessing import decode_image
+
+    photo = Image.new("RGB", (3000, 4000), "white")
+    draw = ImageDraw.Draw(photo)
+    font = ImageFont.load_default(size=160)
+    for i in range(12):
+        draw.text((200, 200 + i * 300), "Hb 13.5 g/dL", fill="black", font=font)
+    exif = Image.Exif()
+    exif[0x0112] = 6                                # rotate 90 degrees on display
+    path = tmp_path / "photo.jpg"
+    photo.save(path, quality=90, exif=exif)
+
+    img, info = decode_image(str(path), target_text_height=32, max_side=4000)
+    assert info["draft_scale"] >= 2
+    assert img.mode == "L"
+    assert img.size[0] > img.size[1]                # landscape after EXIF transpose
+    assert max(img.size) <= 2000
+
+
+def test_decode_image_keeps_small_images(tmp_path):
+    from PIL import Image
+    from services.image_preprocessing import decode_image
+
+    path = tmp_path / "small.png"
+    Image.new("RGB", (640, 480), "white").save(path)
+    img, info = decode_image(str(path))
+    assert img.size == (640, 480) and info["draft_scale"] == 1
+
+
+class _EchoEngine:
+    """Stand-in for tesserocr inside pool workers; crashes once if a marker file exists"""
+
+    name = "echo"
+
+    def image_to_string(self, image, lang):
+        if lang.startswith("crash:") and os.path.exists(lang[6:]):
+            os.remove(lang[6:])
+            os._exit(1)
+        return f"{image.mode} {image.size[0]}x{image.size[1]} {os.getpid()}"
+
+    def health(self):
+        return {"engine": self.name}
+
+    def close(self):
+        pass
+
+
+def test_tesseract_pool_restarts_crashed_worker(tmp_path):
+    from PIL import Image
+    from services.ocr_engines import TesseractPoolEngine
+
+    pool = TesseractPoolEngine(size=1, timeout=30, engine_factory=_EchoEngine)
+    try:
+        first = pool.image_to_string(Image.new("L", (40, 20)), "eng")
+        assert first.startswith("L 40x20")
+
+        marker = tmp_path / "crash"
+        marker.write_text("x")
+        retried = pool.image_to_string(Image.new("L", (40, 20)), f"crash:{marker}")
+        assert retried.startswith("L 40x20")
+        assert retried.split()[-1] != first.split()[-1]      # served by a new process
+
+        health = pool.health()
+        assert health["workers"][0]["alive"] and health["workers"][0]["restarts"] == 1
+    finally:
+        pool.close()
+
+
+def test_create_engine_falls_back_to_pytesseract():
+    from services.ocr_engines import TesserocrEngine, create_engine
+    engine = create_engine("pool")
+    expected = "pool" if TesserocrEngine.is_available() else "pytesseract"
+    assert engine.name == expected
+    engine.close()
+
+
+# ===== OCR Cache Tests =====
+
+def test_ocr_cache_hit_skips_ocr(tmp_path, monkeypatch):
+    report = tmp_path / "report.png"
+    report.write_bytes(b"fake image bytes")
+    ocr = OCRService(cache=OCRCache(cache_dir=str(tmp_path / "cache")))
+    calls = []
+    monkeypatch.setattr(ocr, "_extract_from_image",
+                        lambda path: calls.append(path) or {"text": "Hemoglobin: 10.5 g/dL"})
+
+    first = ocr.extract_text(str(report))
+    copy = tmp_path / "reupload.png"
+    copy.write_bytes(report.read_bytes())
+    second = ocr.extract_text(str(copy))
+
+    assert first == second
+    assert len(calls) == 1
+    stats = ocr.cache_stats()
+    assert stats["misses"] == 1 and stats["memory_hits"] == 1
+
+
+def test_ocr_cache_key_includes_settings(tmp_path):
+    report = tmp_path / "report.png"
+    report.write_bytes(b"same bytes")
+    cache = OCRCache(cache_dir=None)
+    assert cache.make_key(str(report), {"lang": "eng"}) != cache.make_key(str(report), {"lang": "hin"})
+
+
+def test_ocr_cache_dir_does_not_depend_on_working_directory(tmp_path, monkeypatch):
+    from services.ocr_cache import BACKEND_DIR
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OCR_CACHE_MAX_MB", "0")  # resolve paths without creating them
+    monkeypatch.delenv("OCR_CACHE_DIR", raising=False)
+    assert OCRCache.from_env().cache_dir == BACKEND_DIR / "ocr_cache"
+    monkeypatch.setenv("OCR_CACHE_DIR", "cache/ocr")
+    assert OCRCache.from_env().cache_dir == BACKEND_DIR / "cache" / "ocr"
+    monkeypatch.setenv("OCR_CACHE_DIR", str(tmp_path / "ocr"))
+    assert OCRCache.from_env().cache_dir == tmp_path / "ocr"
+    monkeypatch.setenv("OCR_CACHE_DIR", "")
+    assert OCRCache.from_env().cache_dir is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_ocr_cache_disk_tier_evicts_lru(tmp_path):
+    cache = OCRCache(cache_dir=str(tmp_path), max_bytes=200, memory_items=0)
+    cache.put("a", {"text": "x" * 60})
+    cache.put("b", {"text": "y" * 60})
+    assert cache.get("a") is not None          # "a" becomes most recently used
+    cache.put("c", {"text": "z" * 60})
+
+    reopened = OCRCache(cache_dir=str(tmp_path), max_bytes=200, memory_items=0)
+    assert reopened.get("a") is not None
+    assert reopened.get("b") is None
+    assert cache.stats()["disk_evictions"] == 1
+
+
+# ===== Service Registry Tests =====
+
+def test_registry_creates_services_lazily_and_shares_them():
+    created = []
+    registry = ServiceRegistry({"ner": lambda: created.append("ner") or object()})
+    assert registry.initialized() == []
+    first = registry.ner
+    assert registry.ner is first
+    assert created == ["ner"]
+    assert registry.stats()["initialized"] == ["ner"]
+
+
+def test_registry_builds_each_service_once_across_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    created = []
+
+    def slow_factory():
+        created.append(1)
+        time.sleep(0.05)
+        return object()
+
+    registry = ServiceRegistry({"ocr": slow_factory})
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        instances = list(pool.map(lambda _: registry.ocr, range(8)))
+    assert len(created) == 1
+    assert all(i is instances[0] for i in instances)
+
+
+def test_translation_service_construction_does_not_probe():
+    from services.translation_service import TranslationService
+    service = TranslationService()
+    assert "_available" not in vars(service)
+
+
+# ===== Pipeline Executor Tests =====
+
+def test_pipeline_executor_rejects_when_queue_full():
+    import asyncio
+    import threading
+    executor = PipelineExecutor(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: "done"))
+        await asyncio.sleep(0.05)
+        assert executor.stats()["running"] == 1
+        assert executor.stats()["queue_depth"] == 1
+        with pytest.raises(ExecutorBusy) as busy:
+            await executor.run(lambda: None)
+        assert busy.value.retry_after >= 1
+        release.set()
+        return await running, await queued
+
+    try:
+        assert asyncio.run(scenario()) == (True, "done")
+    finally:
+        executor.close()
+    stats = executor.stats()
+    assert (stats["completed"], stats["rejected"], stats["queue_depth"]) == (2, 1, 0)
+    assert stats["wait_ms_p95"] > 0
+
+
+def test_process_route_returns_503_with_retry_after_when_busy(monkeypatch, tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import api.routes.process as process_route
+
+    class _FullExecutor:
+        async def run(self, fn, *args, **kwargs):
+            raise ExecutorBusy(retry_after=7)
+
+    monkeypatch.setattr(process_route, "registry", ServiceRegistry({
+        "pipeline": _FullExecutor,
+        "ner": NERService,
+        "uploads": lambda: BlobStore(tmp_path / "uploads"),
+    }))
+    app = FastAPI()
+    app.include_router(process_route.router, prefix="/process")
+    report = tmp_path / "report.pdf"
+    report.write_bytes(b"%PDF-1.4")
+
+    response = TestClient(app).post("/process/report/r1", params={"file_path": str(report)})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+
+
+# ===== Job Queue Tests =====
+
+def _wait_for_job(get, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = get(job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def _count_pages(params, progress):
+    for page in range(1, params["pages"] + 1):
+        progress("ocr", pages_done=page, pages_total=params["pages"])
+    return {"pages": params["pages"]}
+
+
+def test_job_queue_runs_job_and_records_progress(monkeypatch):
+    monkeypatch.setitem(JOB_HANDLERS, "count_pages", _count_pages)
+    queue = JobQueue(MemoryJobStore(), workers=1)
+    try:
+        job = queue.submit("count_pages", {"pages": 3})
+        assert job["status"] == "queued"
+        done = _wait_for_job(queue.get, job["job_id"])
+    finally:
+        queue.close()
+    assert done["status"] == "completed"
+    assert done["result"] == {"pages": 3}
+    assert done["progress"]["ocr"] == {"pages_done": 3, "pages_total": 3}
+
+
+def test_sqlite_job_store_resumes_unfinished_jobs(monkeypatch, tmp_path):
+    monkeypatch.setitem(JOB_HANDLERS, "count_pages", _count_pages)
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    now = time.time()
+    for job_id, status, owner in [("queued", "queued", None), ("orphan", "running", f"{socket.gethostname()}:999999999")]:
+        store.create({
+            "job_id": job_id, "kind": "count_pages", "params": {"pages": 2}, "status": status,
+            "stage": None, "progress": {}, "result": None, "error": None, "owner": owner,
+            "created_at": now, "updated_at": now,
+        })
+
+    # A fresh queue on the same database stands in for a restarted worker
+    queue = JobQueue(SQLiteJobStore(str(tmp_path / "jobs.db")), workers=2)
+    try:
+        for job_id in ("queued", "orphan"):
+            assert _wait_for_job(queue.get, job_id)["result"] == {"pages": 2}
+    finally:
+        queue.close()
+
+
+def test_process_route_job_mode_returns_handle_then_result(monkeypatch, tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import api.routes.process as process_route
+
+    pages = [{"page": 1, "source": "ocr", "text": "Hemoglobin: 9.1 g/dL"}, {"page": 2, "source": "ocr", "text": "FBS: 150 mg/dL"}]
+
+    class _FakeOCR:
+        def extract_document(self, file_path, on_page=None, on_page_text=None):
+            for page in pages:
+                on_page(page["page"], len(pages))
+                on_page_text(page)
+            return {"text": "\n".join(p["text"] for p in pages), "pages": pages}
+
+    monkeypatch.setenv("NER_STREAM_HOLDBACK", "8")  # short pages
+    monkeypatch.setattr(process_route, "registry", ServiceRegistry({
+        "ocr": _FakeOCR,
+        "ner": NERService,
+        "risk": RiskAssessmentService,
+        "simplification": SimplificationService,
+        "jobs": lambda: JobQueue(MemoryJobStore(), workers=1, resume=False),
+        "pipeline": lambda: PipelineExecutor(workers=1),
+        "translation": TranslationService,
+        "stage_cache": StageCache,
+        "reports": lambda: ReportStore(f"sqlite:///{tmp_path / 'reports.db'}"),
+        "uploads": lambda: BlobStore(tmp_path / "uploads"),
+    }))
+    app = FastAPI()
+    app.include_router(process_route.router, prefix="/process")
+    client = TestClient(app)
+    report = tmp_path / "report.png"
+    report.write_bytes(b"png")
+
+    response = client.post("/process/report/r1", params={"file_path": str(report), "mode": "job"})
+    assert response.status_code == 202
+    handle = response.json()
+    assert handle["status_url"] == f"/process/jobs/{handle['job_id']}"
+
+    job = _wait_for_job(lambda job_id: client.get(f"/process/jobs/{job_id}").json(), handle["job_id"])
+    assert job["status"] == "completed"
+    assert job["result"]["report_id"] == "r1"
+    ocr_progress = job["progress"]["ocr"]
+    assert (ocr_progress["pages_done"], ocr_progress["pages_total"]) == (2, 2)
+    # Entities and risk flags were published page by page while OCR ran
+    assert [lab["test"] for lab in ocr_progress["partial"]["lab_values"]] == ["Hemoglobin", "FBS"]
+    assert [flag["test"] for flag in ocr_progress["partial"]["abnormal_values"]] == ["Hemoglobin", "FBS"]
+    assert job["progress"]["entities"]["lab_values"] == 2
+    # The job ran in one of the pipeline's slots, under the same cap as sync requests
+    assert process_route.registry.pipeline.stats()["completed"] == 1
+
+    events = client.get(handle["events_url"]).text
+    assert events.startswith("event: done")
+
+
+# ===== Batch Pipeline Tests =====
+
+def test_batch_pipeline_overlaps_stages_and_reports_failures():
+    def slow_ocr(item):
+        time.sleep(0.05)
+        if item["n"] == 2:
+            raise RuntimeError("unreadable scan")
+        item["text"] = f"report {item['n']}"
+
+    def ner(item):
+        time.sleep(0.05)
+        item["entities"] = item["text"].upper()
+
+    pipeline = BatchPipeline([Stage("ocr", slow_ocr, workers=2), Stage("ner", ner)])
+    start = time.perf_counter()
+    results = {item["n"]: item for item in pipeline.run({"n": n} for n in range(6))}
+    elapsed = time.perf_counter() - start
+
+    assert results[2]["failed_stage"] == "ocr"
+    assert results[2]["error"] == "unreadable scan"
+    assert results[5]["entities"] == "REPORT 5"
+    # Serial would be 6 * 0.05 + 5 * 0.05; stages overlapping keeps it near the NER stage time
+    assert elapsed < 0.45
+    stats = pipeline.stats()
+    assert (stats["completed"], stats["failed"]) == (5, 1)
+    assert stats["stages"]["ner"]["processed"] == 5
+    assert 0 < stats["stages"]["ner"]["utilization"] <= 1
+
+
+def test_process_batch_streams_ndjson(monkeypatch, tmp_path):
+    import json
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import api.routes.process as process_route
+    import api.routes.upload as upload_route
+
+    running, active = [], []
+
+    class _FakeOCR:
+        def extract_document(self, file_path, on_page=None, on_page_text=None):
+            running.append(file_path)
+            time.sleep(0.05)
+            active.append(len(running))
+            running.remove(file_path)
+            text = Path(file_path).read_text()
+            return {"text": text, "pages": [{"page": 1, "source": "ocr", "text": text}]}
+
+    monkeypatch.setattr(process_route, "BATCH_STAGE_WORKERS", {"ocr": 2})
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads").mkdir()
+    report_id = "0f8fad5b-d9cb-469f-a165-70867728950e"
+    (tmp_path / "uploads" / f"20240101_000000_{report_id}.png").write_text("Hemoglobin: 9.1 g/dL")
+    services = ServiceRegistry({
+        "ocr": _FakeOCR,
+        "ner": NERService,
+        "risk": RiskAssessmentService,
+        "simplification": SimplificationService,
+        "translation": TranslationService,
+        "stage_cache": StageCache,
+        "reports": lambda: ReportStore(f"sqlite:///{tmp_path / 'reports.db'}"),
+        "uploads": lambda: BlobStore(tmp_path / "uploads"),
+        "pipeline": lambda: PipelineExecutor(workers=1),
+    })
+    monkeypatch.setattr(process_route, "registry", services)
+    monkeypatch.setattr(upload_route, "registry", services)
+    app = FastAPI()
+    app.include_router(process_route.router, prefix="/process")
+
+    response = TestClient(app).post(
+        "/process/batch",
+        data={"report_ids": f"{report_id},not-a-report"},
+        files=[("files", ("scan.png", b"Clinical letter: patient is stable and well.", "image/png"))],
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    reports = sorted((l for l in lines if l["type"] == "report"), key=lambda l: l["index"])
+    assert [r["status"] for r in reports] == ["completed", "failed", "completed"]
+    assert reports[0]["result"]["abnormal_values"][0]["test"] == "Hemoglobin"
+    assert reports[1]["error"] == "Report not found"
+    assert reports[2]["file_name"] == "scan.png"
+    assert reports[2]["result"]["risk_level"] == "INFO"
+    assert lines[-1]["type"] == "stats"
+    assert lines[-1]["completed"] == 2
+    # Two batch OCR threads, but one pipeline slot: OCR never ran twice at once
+    assert active == [1, 1]
+    assert services.pipeline.stats()["completed"] == 2
+
+
+# ===== Upload Tests =====
+
+def _upload_client(monkeypatch, tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import api.routes.upload as upload_route
+    monkeypatch.setattr(upload_route, "registry", ServiceRegistry({"uploads": lambda: BlobStore(tmp_path / "uploads")}))
+    app = FastAPI()
+    app.include_router(upload_route.router, prefix="/upload")
+    return TestClient(app), tmp_path / "uploads" / "blobs"
+
+
+def test_upload_streams_to_disk_and_returns_hash(monkeypatch, tmp_path):
+    import hashlib
+    client, uploads = _upload_client(monkeypatch, tmp_path)
+    content = os.urandom(300 * 1024)
+
+    response = client.post("/upload/report", files={"file": ("lab.pdf", content, "application/pdf")})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["content_hash"] == hashlib.sha256(content).hexdigest()
+    assert body["file_size"] == len(content)
+    assert Path(body["file_path"]).read_bytes() == content
+    assert [p.name for p in uploads.iterdir()] == [Path(body["file_path"]).name]
+
+
+def test_blob_store_is_not_served_under_uploads(monkeypatch, tmp_path):
+    import importlib
+    from fastapi.testclient import TestClient
+    import api.routes.upload as upload_route
+    from services import blob_store
+
+    monkeypatch.setenv("UPLOADS_DIR", str(tmp_path / "uploads"))
+    monkeypatch.delenv("BLOB_STORE_DIR", raising=False)
+    monkeypatch.setattr(blob_store, "DEFAULT_BLOB_DIR", tmp_path / "blob_store")
+    import api.main as main
+    main = importlib.reload(main)
+    monkeypatch.setattr(upload_route, "registry", ServiceRegistry({"uploads": BlobStore.from_env}))
+    (tmp_path / "uploads" / "old_report.pdf").write_bytes(b"%PDF legacy")
+    client = TestClient(main.app)
+
+    stored = Path(client.post("/upload/report", files={"file": ("lab.pdf", b"%PDF new", "application/pdf")}).json()["file_path"])
+    assert stored.parent == tmp_path / "blob_store" / "blobs"
+    assert client.get("/uploads/blobs.db").status_code == 404
+    assert client.get(f"/uploads/blobs/{stored.name}").status_code == 404
+    assert client.get("/uploads/old_report.pdf").status_code == 200
+
+    monkeypatch.setenv("BLOB_STORE_DIR", str(tmp_path / "uploads" / "store"))
+    with pytest.raises(RuntimeError, match="BLOB_STORE_DIR"):
+        importlib.reload(main)
+    monkeypatch.delenv("BLOB_STORE_DIR")
+    importlib.reload(main)
+
+
+def test_upload_rejects_oversized_file_without_leftovers(monkeypatch, tmp_path):
+    import api.routes.upload as upload_route
+    client, uploads = _upload_client(monkeypatch, tmp_path)
+    monkeypatch.setattr(upload_route, "MAX_FILE_SIZE", 100 * 1024)
+
+    response = client.post("/upload/report", files={"file": ("big.png", b"x" * (150 * 1024), "image/png")})
+
+    assert response.status_code == 400
+    assert "too large" in response.json()["detail"]
+    assert list(uploads.iterdir()) == []
+
+
+def test_upload_rejects_disallowed_extension(monkeypatch, tmp_path):
+    client, _ = _upload_client(monkeypatch, tmp_path)
+    response = client.post("/upload/report", files={"file": ("notes.exe", b"MZ", "application/octet-stream")})
+    assert response.status_code == 400
+    assert "Invalid file type" in response.json()["detail"]
+
+
+def test_upload_deduplicates_identical_bytes_with_refcount(monkeypatch, tmp_path):
+    client, blobs = _upload_client(monkeypatch, tmp_path)
+    content = b"%PDF-1.4 same report"
+
+    first = client.post("/upload/report", files={"file": ("a.pdf", content, "application/pdf")}).json()
+    second = client.post("/upload/report", files={"file": ("retry.pdf", content, "application/pdf")}).json()
+
+    assert first["report_id"] != second["report_id"]
+    assert first["file_path"] == second["file_path"]
+    assert (first["deduplicated"], second["deduplicated"]) == (False, True)
+    assert len(list(blobs.iterdir())) == 1
+    assert client.get("/upload/stats").json()["bytes_saved"] == len(content)
+
+    assert client.delete(f"/upload/report/{first['report_id']}").json()["file_deleted"] is False
+    assert Path(second["file_path"]).exists()
+    assert client.delete(f"/upload/report/{second['report_id']}").json()["file_deleted"] is True
+    assert list(blobs.iterdir()) == []
+    assert client.delete(f"/upload/report/{second['report_id']}").status_code == 404
+
+
+def test_process_reuses_stored_analysis_for_same_bytes_and_context(monkeypatch, tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import api.routes.process as process_route
+    import api.routes.upload as upload_route
+
+    ocr_calls = []
+
+    class _FakeOCR:
+        def extract_document(self, file_path, on_page=None, on_page_text=None):
+            ocr_calls.append(file_path)
+            text = Path(file_path).read_text()
+            return {"text": text, "pages": [{"page": 1, "source": "ocr", "text": text}]}
+
+    services = ServiceRegistry({
+        "ocr": _FakeOCR,
+        "ner": NERService,
+        "risk": RiskAssessmentService,
+        "simplification": SimplificationService,
+        "pipeline": PipelineExecutor,
+        "translation": TranslationService,
+        "stage_cache": StageCache,
+        "reports": lambda: ReportStore(f"sqlite:///{tmp_path / 'reports.db'}"),
+        "uploads": lambda: BlobStore(tmp_path / "uploads"),
+    })
+    monkeypatch.setattr(process_route, "registry", services)
+    monkeypatch.setattr(upload_route, "registry", services)
+    app = FastAPI()
+    app.include_router(upload_route.router, prefix="/upload")
+    app.include_router(process_route.router, prefix="/process")
+    client = TestClient(app)
+
+    def upload_and_process(**params):
+        upload = client.post("/upload/report", files={"file": ("r.png", b"Hemoglobin: 9.1 g/dL", "image/png")}).json()
+        return client.post(
+            f"/process/report/{upload['report_id']}", params={"file_path": upload["file_path"], **params}
+        ).json(), upload["report_id"]
+
+    try:
+        first, _ = upload_and_process(patient_gender="female")
+        repeat, repeat_id = upload_and_process(patient_gender="female")
+        upload_and_process(patient_gender="male")
+        # The repeat was served from the stored analysis; the gender change
+        # missed it but still reused the OCR stage
+        assert services.uploads.stats()["analysis_hits"] == 1
+        assert services.stage_cache.stats()["stages"]["risk"]["misses"] == 2
+    finally:
+        services.close()
+
+    assert len(ocr_calls) == 1
+    assert repeat["report_id"] == repeat_id
+    assert {**repeat, "report_id": None} == {**first, "report_id": None}
+
+
+def test_analysis_stages_rerun_only_what_changed(monkeypatch, tmp_path):
+    import api.routes.process as process_route
+
+    calls = []
+    text = "Hemoglobin: 9.1 g/dL\nFBS: 150 mg/dL"
+
+    class _FakeOCR:
+        def extract_document(self, file_path, on_page=None, on_page_text=None):
+            calls.append("ocr")
+            return {"text": text, "pages": [{"page": 1, "source": "ocr", "text": text}]}
+
+    class _FakeTranslation:
+        def translate_report_output(self, result, target_language):
+            calls.append("translate")
+            if target_language != "en":
+                result["recommendations"] = [f"[{target_language}] {r}" for r in result["recommendations"]]
+            return result
+
+    services = ServiceRegistry({
+        "ocr": _FakeOCR,
+        "ner": NERService,
+        "risk": RiskAssessmentService,
+        "simplification": SimplificationService,
+        "translation": _FakeTranslation,
+        "stage_cache": StageCache,
+        "reports": lambda: ReportStore(f"sqlite:///{tmp_path / 'reports.db'}"),
+        "uploads": lambda: BlobStore(tmp_path / "uploads"),
+    })
+    monkeypatch.setattr(process_route, "registry", services)
+    report = tmp_path / "report.png"
+    report.write_bytes(b"png")
+
+    def analyze(**patient):
+        params = {"patient_age": 40, "patient_gender": "male", "language": "en", **patient}
+        return process_route._analyze_report("r1", str(report), **params)
+
+    english = analyze()
+    hindi = analyze(language="hi")
+    female = analyze(language="hi", patient_gender="female")
+
+    assert calls == ["ocr", "translate", "translate", "translate"]
+    assert hindi.recommendations[0].startswith("[hi] ")
+    assert hindi.simplified_explanation == english.simplified_explanation
+    assert female.language == "hi"
+    stages = services.stage_cache.stats()["stages"]
+    assert {name: stages[name]["hits"] for name in stages} == {
+        "ocr": 2, "ner": 2, "risk": 1, "simplify": 1, "translate": 0,
+    }
+    assert stages["ocr"]["hit_rate"] == round(2 / 3, 4)
+
+
+def test_degraded_ocr_run_is_not_cached_and_recovers_on_reupload(monkeypatch, tmp_path):
+    import api.routes.process as process_route
+
+    text = "Hemoglobin: 9.1 g/dL"
+    documents = [
+        {"text": text, "pages": [{"page": 1, "source": "text_layer", "text": text},
+                                 {"page": 2, "source": "ocr_failed", "text": ""}]},
+        {"text": text + "\nFBS: 150 mg/dL", "pages": [{"page": 1, "source": "text_layer", "text": text},
+                                                      {"page": 2, "source": "ocr", "text": "FBS: 150 mg/dL"}]},
+    ]
+
+    class _FlakyOCR:
+        def extract_document(self, file_path, on_page=None, on_page_text=None):
+            return documents.pop(0)
+
+    services = ServiceRegistry({
+        "ocr": _FlakyOCR,
+        "ner": NERService,
+        "risk": RiskAssessmentService,
+        "simplification": SimplificationService,
+        "translation": TranslationService,
+        "stage_cache": StageCache,
+        "reports": lambda: ReportStore(f"sqlite:///{tmp_path / 'reports.db'}"),
+        "uploads": lambda: BlobStore(tmp_path / "uploads"),
+    })
+    monkeypatch.setattr(process_route, "registry", services)
+    report = tmp_path / "report.pdf"
+    report.write_bytes(b"%PDF scan")
+    params = {"patient_age": 40, "patient_gender": "male", "language": "en"}
+
+    first = process_route._analyze_report("r1", str(report), **params)
+    second = process_route._analyze_report("r2", str(report), **params)
+
+    assert documents == []  # OCR ran again for the same bytes
+    assert [v.test for v in first.abnormal_values] == ["Hemoglobin"]
+    assert [v.test for v in second.abnormal_values] == ["Hemoglobin", "FBS"]
+    assert services.stage_cache.stats()["stages"]["ocr"]["hits"] == 0
+
+
+def test_parse_report_date_prefers_day_first():
+    from datetime import date
+    assert parse_report_date("05/03/2024") == date(2024, 3, 5)
+    assert parse_report_date("12/25/2024") == date(2024, 12, 25)
+    assert parse_report_date("2024-03-05") == date(2024, 3, 5)
+    assert parse_report_date("yesterday") is None
+
+
+def test_processed_reports_are_stored_and_fetched_without_rerun(monkeypatch, tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import api.routes.process as process_route
+
+    ocr_calls = []
+
+    class _FakeOCR:
+        def extract_document(self, file_path, on_page=None, on_page_text=None):
+            ocr_calls.append(file_path)
+            text = Path(file_path).read_text()
+            return {"text": text, "pages": [{"page": 1, "source": "ocr", "text": text}]}
+
+    services = ServiceRegistry({
+        "ocr": _FakeOCR,
+        "ner": NERService,
+        "risk": RiskAssessmentService,
+        "simplification": SimplificationService,
+        "translation": TranslationService,
+        "stage_cache": StageCache,
+        "pipeline": PipelineExecutor,
+        "uploads": lambda: BlobStore(tmp_path / "uploads"),
+        "reports": lambda: ReportStore(f"sqlite:///{tmp_path / 'reports.db'}"),
+    })
+    monkeypatch.setattr(process_route, "registry", services)
+    app = FastAPI()
+    app.include_router(process_route.router, prefix="/process")
+    client = TestClient(app)
+    march, june = tmp_path / "march.png", tmp_path / "june.png"
+    march.write_text("Date: 05/03/2024\nHemoglobin: 9.1 g/dL\nFBS: 90 mg/dL")
+    june.write_text("Date: 10/06/2024\nHemoglobin: 12.4 g/dL")
+
+    try:
+        processed = client.post(
+            "/process/report/r-march", params={"file_path": str(march), "user_id": "asha@example.com"}
+        ).json()
+        client.post("/process/report/r-june", params={"file_path": str(june), "user_id": "asha@example.com"})
+        client.post("/process/report/r-other", params={"file_path": str(june), "user_id": "ravi@example.com"})
+
+        assert client.get("/process/report/r-march").json() == processed
+        assert client.get("/process/report/unknown").status_code == 404
+        reports = client.get(
+            "/process/reports", params={"user_id": "asha@example.com", "test": "FBS"}
+        ).json()["reports"]
+        history = services.reports.lab_history("asha@example.com", "Hemoglobin")
+    finally:
+        services.close()
+
+    assert len(ocr_calls) == 2
+    assert [r["report_id"] for r in reports] == ["r-march"]
+    assert reports[0]["report_date"] == "2024-03-05"
+    assert {(l["test"], l["status"]) for l in reports[0]["lab_values"]} == {("Hemoglobin", "low"), ("FBS", "normal")}
+    assert [(h["report_date"], h["value"]) for h in history] == [("2024-03-05", 9.1), ("2024-06-10", 12.4)]
+
+
+# ===== Trend Tests =====
+
+def test_trend_state_incremental_matches_rebuild():
+    from datetime import date
+    points = [
+        (date(2024, 1, 1), 9.0, "low", "g/dL", "r1"),
+        (date(2024, 1, 31), 11.0, "low", "g/dL", "r2"),
+        (date(2024, 3, 1), 13.0, "normal", "g/dL", "r3"),
+        (date(2024, 3, 31), 14.0, "normal", "g/dL", "r4"),
+    ]
+    state = TrendState(window=2)
+    for point in points:
+        state.add(*point)
+    trend = state.summary("Hemoglobin")
+
+    assert trend == TrendState.rebuild(reversed(points), window=2).summary("Hemoglobin")
+    assert (trend["last_value"], trend["min"], trend["max"]) == (14.0, 9.0, 14.0)
+    assert trend["rolling_mean"] == 13.5
+    # Low from Jan 1 until the normal reading on Mar 1
+    assert (trend["out_of_range_days"], trend["tracked_days"]) == (60, 90)
+    assert trend["slope_per_day"] > 0
+    assert not state.accepts(date(2023, 12, 31))
+
+
+def test_report_store_trends_update_per_report_and_handle_out_of_order(tmp_path):
+    from datetime import date
+    store = ReportStore(f"sqlite:///{tmp_path / 'reports.db'}")
+
+    def save(report_id, day, value, status):
+        store.save(
+            report_id, {"risk_level": "LOW"},
+            [{"test": "FBS", "value": value, "unit": "mg/dL", "status": status}],
+            user_id="u1", report_date=day,
+        )
+
+    try:
+        save("r2", date(2024, 2, 1), 130.0, "high")
+        save("r3", date(2024, 3, 1), 110.0, "high")
+        save("r1", date(2024, 1, 1), 95.0, "normal")  # arrives late: rebuilt
+        save("r3", date(2024, 3, 1), 99.0, "normal")  # re-processed: replaced
+        trend = store.trends("u1", "FBS")[0]
+        assert store.trends("someone-else") == []
+    finally:
+        store.close()
+
+    assert trend["count"] == 3
+    assert (trend["first_date"], trend["last_value"]) == ("2024-01-01", 99.0)
+    assert trend["out_of_range_days"] == 29  # high from Feb 1 to Mar 1
+    assert [p["value"] for p in trend["recent"]] == [95.0, 130.0, 99.0]
+
+
+# ===== Lab Extraction Tests =====
+
+def test_single_pass_lab_extractor_matches_per_pattern_loop():
+    import random
+    from benchmarks.lab_extraction import _loop_extract
+
+    ner = NERService()
+    samples = [
+        "Hemoglobin: 9.1 g/dL\nHbA1c: 7.2 %\nHDL Cholesterol: 45 mg/dL\nTotal Cholesterol 210 mg/dl",
+        "WBC 11,500 /cumm  Platelet: 1,50,000\nNa+: 140 mEq/L K+ 3.2 mmol/L Week: 3",
+        "hb 12.0 HB: 13 hgb:11.5 Glycated Hemoglobin: 6.1",
+        "\u017fodium: 139 \u212a: 4.1 \u0131nvalid TSH:2.2 uIU/mL",
+    ]
+    rng = random.Random(1)
+    fragments = [
+        "Hb", "HbA1c", "HGB", "hdl", "LDL Cholesterol", "Cholesterol", "Na+", "K", "TG", "ALT", "AST",
+        "Sodium", "Urea", "Blood Urea", "Serum Creatinine", "\u017f", "\u212a", ": ", " ", ":", "\n",
+        "12", "1,200", "4.5", "5.", "mg/dL", "U/L", "%", "x", "patient", "-",
+    ]
+    samples += ["".join(rng.choice(fragments) for _ in range(60)) for _ in range(300)]
+
+    for text in samples:
+        assert ner._extract_lab_values(text) == _loop_extract(ner.lab_patterns, ner._normalize_test_name, text), text
+
+
+# ===== Synthetic Corpus Tests =====
+
+def test_synthetic_reports_are_seeded_cover_all_tests_and_label_ner_output(tmp_path):
+    import json
+    from benchmarks.synthetic_reports import SyntheticReportGenerator, evaluate, write_corpus
+
+    generator = SyntheticReportGenerator(seed=7)
+    reports = list(generator.reports(17))
+    assert [r["text"] for r in reports] == [r["text"] for r in SyntheticReportGenerator(seed=7).reports(17)]
+    assert reports[5]["entities"] == generator.report(5)["entities"]  # any report regenerates alone
+    assert reports[0]["text"] != SyntheticReportGenerator(seed=8).report(0)["text"]
+
+    covered = {lab["test"] for r in reports for lab in r["entities"]["lab_values"]}
+    assert covered == set(RiskAssessmentService().reference_ranges)
+    risk = RiskAssessmentService()
+    for r in reports:
+        gender = r["entities"]["patient_info"]["gender"]
+        for lab in r["entities"]["lab_values"]:
+            assert lab["status"] == risk._check_value(lab["test"], lab["reference_value"], gender)["status"]
+
+    # Diagnosis labels cover everything printed, not just the clinical history line
+    for r in reports:
+        assert set(r["clinical_history"]) <= set(r["entities"]["diagnoses"])
+    assert any("Cholesterol" in r["entities"]["diagnoses"] and "Cholesterol" not in r["clinical_history"]
+               for r in reports)
+
+    # Without noise, other units or unusual layouts NER must find every labeled value, and
+    # everything but lab values must be exact ("LDL Cholesterol" also reads as Cholesterol)
+    clean = SyntheticReportGenerator(
+        seed=3, noise=0, alt_unit_rate=0, indian_grouping_rate=0, layouts=("colon", "table", "flagged"),
+    )
+    ner = NERService()
+    result = evaluate(clean.reports(60), lambda texts: ner.extract_entities_many(texts, workers=1))
+    assert result["reports"] == 60
+    for kind in ("lab_values", "medications", "diagnoses", "patient_info"):
+        assert result["scores"][kind]["recall"] == 1.0, kind
+    for kind in ("medications", "diagnoses", "patient_info"):
+        assert result["scores"][kind]["precision"] == 1.0, kind
+
+    assert write_corpus(SyntheticReportGenerator(seed=7, max_pages=3), 4, tmp_path, ["txt", "png", "pdf"]) == 4
+    labels = [json.loads(line) for line in (tmp_path / "labels.jsonl").read_text().splitlines()]
+    for label, report in zip(labels, reports):
+        assert label["entities"] == report["entities"]
+        assert label["clinical_history"] == report["clinical_history"]
+        assert (tmp_path / label["files"]["txt"]).read_text(encoding="utf-8") == report["text"]
+        with open_pdf(str(tmp_path / label["files"]["pdf"])) as pdf:
+            assert len(label["files"]["png"]) == label["pages"] == pdf.page_count()